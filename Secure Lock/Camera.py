@@ -1,8 +1,8 @@
 import boto3
-import time
-from picamera2 import Picamera2
 from botocore.exceptions import ClientError
 
+from camera_service import CameraService, Picamera2Source
+
 AWS_ACCESS_KEY = ''
 AWS_SECRET_KEY = ''
 AWS_REGION = 'ap-south-1'  # Change if necessary
@@ -16,26 +16,24 @@ rekognition = boto3.client(
     aws_secret_access_key=AWS_SECRET_KEY
 )
 
-def capture_live_image(filename='live.jpg'):
-    picam2 = Picamera2()
-    config = picam2.create_still_configuration()
-    picam2.configure(config)
-    picam2.start()
-    time.sleep(2)  # wait for camera to adjust
-    picam2.capture_file(filename)
-    picam2.close()
-    print(f"Live image captured: {filename}")
-    return filename
-
-def identify_person(image_path):
+camera = CameraService(Picamera2Source(), warmup=2)  # wait for camera to adjust, once
+
+def capture_live_image():
+    image = camera.capture_jpeg()
+    if image is None:
+        print("Camera capture failed: no frame")
+        return None
+    print(f"Live image captured: {len(image)} bytes")
+    return image
+
+def identify_person(image_bytes):
     try:
-        with open(image_path, 'rb') as image_file:
-            response = rekognition.search_faces_by_image(
-                CollectionId=COLLECTION_ID,
-                Image={'Bytes': image_file.read()},
-                MaxFaces=1,
-                FaceMatchThreshold=SIMILARITY_THRESHOLD
-            )
+        response = rekognition.search_faces_by_image(
+            CollectionId=COLLECTION_ID,
+            Image={'Bytes': image_bytes},
+            MaxFaces=1,
+            FaceMatchThreshold=SIMILARITY_THRESHOLD
+        )
         print("Rekognition response:", response)
 
         matches = response.get('FaceMatches', [])
@@ -56,5 +54,10 @@ def identify_person(image_path):
             raise e
 
 if __name__ == '__main__':
-    image = capture_live_image()
-    identify_person(image)
+    camera.start()
+    try:
+        image = capture_live_image()
+        if image is not None:
+            identify_person(image)
+    finally:
+        camera.stop()
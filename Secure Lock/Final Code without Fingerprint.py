@@ -1,31 +1,33 @@
 import os
-import sys
 import time
-import json
-import uuid
-import serial
-import threading
-from datetime import datetime, timezone, timedelta
-
-import RPi.GPIO as GPIO
-
-sys.path.append('/home/techsharks/MFRC522-python')
-from mfrc522 import MFRC522
-
-from luma.core.interface.serial import i2c
-from luma.oled.device import ssd1306
-from PIL import Image, ImageDraw, ImageFont
-
-sys.path.append('/home/techsharks/firebase_lib')
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-import boto3
-from botocore.exceptions import ClientError
-from picamera2 import Picamera2
-
-ser = serial.Serial('/dev/serial0', baudrate=57600, timeout=1)
-serial_lock = threading.Lock()
+import asyncio
+
+from hal import hw
+from access_log import AccessLog
+from alert_spool import AlertPipeline
+from camera_service import CameraService
+from credential_store import CredentialStore
+from face_index import FaceMatcher, MATCH, UNSURE
+from face_prefilter import FacePrefilter, format_timings
+from display_cache import DisplayRenderer
+from display_queue import DisplayQueue
+from doors import Door, DoorConfig, load_doors
+from oled_pages import PageDisplay
+from firestore_listener import LockEventWatcher
+from otp_store import OtpStore, OTP_VALID
+from r503 import R503
+from relay_actuator import RelayActuator, PRIORITY_REMOTE
+from rfid_frontend import CardPoller
+from vibration_detector import TamperDetector, VibrationSampler
+from gpio_events import EdgeEventEngine
+from keypad_scanner import KeypadScanner
+from lock_runtime import LockRuntime
+from metrics import Registry
+
+GPIO = hw.GPIO
+ClientError = hw.ClientError
+
+sensor = R503(hw.serial_port('/dev/serial0'), baudrate=57600, timeout=1)
 
 def set_led(mode=0x02, speed=0x00, color=0x02, count=0x00):
     """
@@ -34,31 +36,22 @@ def set_led(mode=0x02, speed=0x00, color=0x02, count=0x00):
     color: 1=red, 2=blue, 3=purple, 4=green
     speed: 0-15 (higher slower)
     count: times to flash (0=continuous)
+    Returns a Future; the caller does not wait for the sensor.
     """
-    payload = b'\x35' + bytes([mode, speed, color, count])
-    send_cmd(payload)
-    
-def packet_header(packet_type, payload):
-    header = b'\xEF\x01\xFF\xFF\xFF\xFF'
-    length = len(payload) + 2
-    packet = header + bytes([packet_type]) + length.to_bytes(2, 'big') + payload
-    checksum = sum(packet[6:])
-    packet += checksum.to_bytes(2, 'big')
-    return packet
-    
-def send_cmd(payload, response_len=12):
-    with serial_lock:  # thread-safe serial access
-        packet = packet_header(0x01, payload)
-        ser.write(packet)
-        response = ser.read(response_len)
-    return response
+    return sensor.set_led(mode, speed, color, count)
+
+def send_cmd(payload, timeout=None):
+    # Raw acknowledge packet (confirmation code at [9]), b'' on timeout
+    return sensor.send(payload, timeout)
 
 # ---------------------------
 # ========== CONFIG =========
 # ---------------------------
 
-CRED_FILE = "/home/techsharks/credentials.json"
+DATA_DIR = os.getenv("SECURE_LOCK_DATA_DIR", "/home/techsharks")
+CRED_FILE = os.path.join(DATA_DIR, "credentials.json")
 FIREBASE_SA_PATH = "/home/techsharks/dlp-0712-firebase-adminsdk-fbsvc-39b92e3a37.json"
+ALERT_SPOOL_FILE = os.path.join(DATA_DIR, "alert_spool", "door_alerts.jsonl")
 
 RELAY_PIN = 27
 BUZZER_PIN = 17
@@ -84,10 +77,55 @@ AWS_REGION = "ap-south-1"
 COLLECTION_ID = "dlpbucketfaces"
 SIMILARITY_THRESHOLD = 75
 
+# Face payload sent to Rekognition: the face crop, shrunk to at most
+# FACE_MAX_SIDE px and re-encoded (sweep: python face_prefilter.py --sweep)
+FACE_MAX_SIDE = 480
+FACE_JPEG_QUALITY = 80
+FACE_GRAYSCALE = False
+
+# Optional on-device face matching (see face_index.py): with an enrolled
+# FACE_INDEX_FILE and the SFace model in FACE_MODEL_DIR, cosine scores at
+# or above FACE_LOCAL_ACCEPT unlock without a cloud call; the rest go to
+# Rekognition. Set FACE_INDEX_COMPLETE only once everybody in
+# COLLECTION_ID is enrolled locally too: then scores below
+# FACE_LOCAL_REJECT refuse without a cloud call as well, and anyone
+# enrolled in Rekognition only would be turned away
+FACE_INDEX_FILE = os.path.join(DATA_DIR, "faces.npz")
+FACE_MODEL_DIR = os.path.join(DATA_DIR, "models")
+FACE_LOCAL_ACCEPT = 0.50
+FACE_LOCAL_REJECT = 0.30
+FACE_INDEX_COMPLETE = False
+
+# Doors driven by this controller: SECURE_LOCK_DOORS=<json file> lists
+# them (see doors.py); without it there is one door on RELAY_PIN, SPI CE0
+# and the OLED at I2C_ADDR
+DOORS_FILE = os.getenv("SECURE_LOCK_DOORS")
+
 OTP_MAX_MINUTES = 10
 
-VIBRATION_HIT_THRESHOLD = 3
+# "listen" = Firestore on_snapshot push (falls back to polling on its own),
+# "poll" = query lockEvents every LOCK_EVENTS_POLL_SECONDS
+LOCK_EVENTS_MODE = os.getenv("LOCK_EVENTS_MODE", "listen")
+LOCK_EVENTS_POLL_SECONDS = 1
+
+VIBRATION_HIT_THRESHOLD = 3        # knocks (bursts) per window
 VIBRATION_WINDOW_SECONDS = 5
+VIBRATION_ENERGY_THRESHOLD = 1.0   # seconds of sensor activity per window
+VIBRATION_ALERT_COOLDOWN = 30      # min seconds between alerts while it keeps shaking
+
+# Per-pin debounce for edge events (ms)
+BUTTON_DEBOUNCE_MS = 300
+VIBRATION_DEBOUNCE_MS = 1
+
+# Prometheus metrics on 127.0.0.1:METRICS_PORT (0 = off) and/or a textfile
+# for node_exporter's textfile collector
+METRICS_PORT = int(os.getenv("SECURE_LOCK_METRICS_PORT", "9105"))
+METRICS_TEXTFILE = os.getenv("SECURE_LOCK_METRICS_TEXTFILE")
+
+# Every access decision is kept in a local SQLite file; paginated queries
+# on 127.0.0.1:HISTORY_PORT/access (0 = off)
+ACCESS_DB_FILE = os.path.join(DATA_DIR, "access.db")
+HISTORY_PORT = int(os.getenv("SECURE_LOCK_HISTORY_PORT", "9106"))
 
 # ---------------------------
 # ========== SETUP ==========
@@ -99,14 +137,17 @@ GPIO.setmode(GPIO.BCM)  # Pin numbering mode
 
 # Setup keypad pins
 for row_pin in ROW_PINS:
-    GPIO.setup(row_pin, GPIO.OUT)
-    GPIO.output(row_pin, GPIO.HIGH)  # rows idle high
+    GPIO.setup(row_pin, GPIO.OUT, initial=GPIO.LOW)  # rows idle low so a key press pulls its column low
 
 for col_pin in COL_PINS:
     GPIO.setup(col_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
+DOORS = load_doors(DOORS_FILE, DoorConfig("main", RELAY_PIN, display_address=I2C_ADDR),
+                   reserved_pins=[BUZZER_PIN, BUTTON_PIN, VIBRATION_PIN] + ROW_PINS + COL_PINS)
+
 # Setup relay, buzzer, button, vibration sensor pins
-GPIO.setup(RELAY_PIN, GPIO.OUT, initial=GPIO.LOW)  # Relay off
+for door_config in DOORS:
+    GPIO.setup(door_config.relay_pin, GPIO.OUT, initial=GPIO.LOW)  # Relay off
 GPIO.setup(BUZZER_PIN, GPIO.OUT, initial=GPIO.LOW)
 GPIO.setup(BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 GPIO.setup(VIBRATION_PIN, GPIO.IN)
@@ -115,92 +156,133 @@ GPIO.setup(VIBRATION_PIN, GPIO.IN)
 buzzer_pwm = GPIO.PWM(BUZZER_PIN, 1000)
 buzzer_pwm.start(0)  # off initially
 
-reader = MFRC522()
-# ? List of authorized card IDs
-AUTHORIZED_IDS = [3555744237,3279957986]
+# Authorized card IDs (first four UID bytes as an int) -> name, for every door
 AUTHORIZED_CARDS = {
     3555744237: "SSG",
     3279957986: "Ashen",
 }
 
-i2c_serial = i2c(port=1, address=I2C_ADDR)
-oled = ssd1306(i2c_serial)
-font_default = FONT_PATH
-
-if not os.path.exists(FIREBASE_SA_PATH):
-    raise FileNotFoundError(f"Firebase service account JSON not found at {FIREBASE_SA_PATH}")
-cred = credentials.Certificate(FIREBASE_SA_PATH)
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-rekognition = boto3.client(
-    'rekognition',
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY
-)
+# One renderer (fonts + frame cache) for all the door displays
+display_renderer = DisplayRenderer((128, 64), FONT_PATH)
+display_renderer.preload(["Hello..", "Incorrect"] + ["*" * n for n in range(1, 7)])
+
+db = hw.firestore(FIREBASE_SA_PATH)
+
+# Camera stays open with a low-res stream running; frames go to
+# Rekognition as in-memory JPEG bytes
+camera = CameraService(hw.camera_source())
+face_prefilter = FacePrefilter(max_side=FACE_MAX_SIDE, jpeg_quality=FACE_JPEG_QUALITY,
+                               grayscale=FACE_GRAYSCALE)
+
+rekognition = hw.rekognition(AWS_REGION, AWS_ACCESS_KEY, AWS_SECRET_KEY)
+# None when nobody is enrolled locally or the model is missing
+face_matcher = FaceMatcher.from_files(FACE_INDEX_FILE, FACE_MODEL_DIR, accept=FACE_LOCAL_ACCEPT,
+                                      reject=FACE_LOCAL_REJECT, complete=FACE_INDEX_COMPLETE)
 
 # ---------------------------
 # ========== STATE ==========
 # ---------------------------
 
+# Only touched from the event loop (see lock_runtime.py)
 mode = "normal"
 input_buffer = ""
 pw1_verified = False
 new_password_stage = 0
 new_password_temp = ""
 
-hit_count = 0
-start_time_vib = time.time()
+runtime = LockRuntime(loop_factory=hw.loop_factory)
+
+# Stage timings and input-to-unlock latency per method (pin, otp, face,
+# rfid, button, remote)
+metrics = Registry(clock=hw.clock.monotonic)
+STAGE = "lock_stage_seconds"
+metrics.describe(STAGE, "Time spent in each stage of the unlock paths")
+metrics.describe("lock_unlock_seconds", "From the input that authenticated to the relay command")
+metrics.describe("lock_auth_refused_total", "Authentication attempts that did not unlock")
+metrics.describe("lock_face_upload_bytes_total", "JPEG bytes sent to Rekognition")
+metrics.describe("lock_face_decisions_total", "Face checks decided on the device or by Rekognition")
+key_event_time = None  # press time of the key being handled
+keypad_events = None  # asyncio.Queue, made on the running loop in start()
 
-def ensure_credentials_file():
-    default = {"users": [{"username": "Admin", "password": "1234"}], "count": 1}
-    if not os.path.exists(CRED_FILE):
-        with open(CRED_FILE, "w") as f:
-            json.dump(default, f)
+credential_store = CredentialStore(CRED_FILE)
+credential_store.ensure_file()
 
-ensure_credentials_file()
+# Decisions are queued in memory and written in batches by its own thread
+access_log = AccessLog(ACCESS_DB_FILE, clock=hw.clock.time)
 
 # ---------------------------
 # ========== UTIL ===========
 # ---------------------------
 
-def update_display(message):
-    try:
-        img = Image.new("1", oled.size)
-        draw = ImageDraw.Draw(img)
-        lines = message.split("\n") if message else [""]
-        for size in range(24, 6, -1):
-            try:
-                font = ImageFont.truetype(font_default, size)
-            except Exception:
-                font = ImageFont.load_default()
-            max_w = max(draw.textlength(line, font=font) for line in lines)
-            total_h = sum(font.getbbox(line)[3] for line in lines) + (len(lines)-1)*2
-            if max_w <= oled.width and total_h <= oled.height:
-                break
-        y = (oled.height - total_h) // 2
-        draw.rectangle((0, 0, oled.width, oled.height), fill=0)
-        for line in lines:
-            w = draw.textlength(line, font=font)
-            draw.text(((oled.width - w) // 2, y), line, font=font, fill=255)
-            y += font.getbbox(line)[3] + 2
-        oled.display(img)
-    except Exception as e:
-        print("OLED update error:", e)
+def make_door(config):
+    oled = hw.oled(port=config.display_port, address=config.display_address)
+    screen = PageDisplay(oled)  # sends only the pages that changed
 
-def relay_on(duration=5):
-    print("Relay ON")
-    GPIO.output(RELAY_PIN, GPIO.HIGH)  # Relay ON
-    time.sleep(duration)
-    GPIO.output(RELAY_PIN, GPIO.LOW)  # Relay OFF
-    print("Relay OFF")
+    @metrics.span(STAGE, stage="update_display")
+    def draw(message):
+        try:
+            screen.display(display_renderer.render(message))
+        except Exception as e:
+            print(f"OLED update error ({config.name}):", e)
+
+    # One worker per display draws only the newest message, so callers
+    # (loop or driver threads) never wait for the bus
+    display = DisplayQueue(draw, idle="Hello..", clock=hw.clock.monotonic)
+
+    def relay_changed(energised):
+        if not energised:
+            display.show("Hello..")
+
+    # Owns the door's relay pin; every unlock source posts a window to it
+    relay = RelayActuator(GPIO, config.relay_pin, clock=hw.clock.monotonic, on_change=relay_changed)
+    # Each card is handled once per presentation; polls speed up for a few
+    # seconds after a card has been seen (retries, the next person)
+    reader = hw.rfid_reader(config.reader_bus, config.reader_cs)
+    poller = CardPoller(reader, AUTHORIZED_CARDS, clock=hw.clock.monotonic)
+    door = Door(config, relay, display, screen, poller)
+    door.watcher = LockEventWatcher(
+        db, lambda locked_value, doc_id: runtime.post(lock_event_changed, door, locked_value, doc_id,
+                                                      hw.clock.monotonic()),
+        collection=config.lock_events,
+        mode=LOCK_EVENTS_MODE,
+        poll_interval=LOCK_EVENTS_POLL_SECONDS
+    )
+    return door
+
+# The keypad, camera, exit button and buzzer act on the first door; its
+# devices keep their single-door names
+doors = [make_door(config) for config in DOORS]
+primary = doors[0]
+relay, display, screen = primary.relay, primary.display, primary.screen
+
+def update_display(message, hold=None, door=None):
+    # hold: seconds before the idle screen comes back
+    (door or primary).show(message, hold)
+
+def relay_on(duration=5, source="local", method=None, started=None, door=None):
+    # Returns immediately; re-auth from the same source extends the window
+    door = door or primary
+    with metrics.span(STAGE, stage="relay_command"):
+        door.relay.unlock(source, duration)
+    if started is not None:
+        metrics.observe("lock_unlock_seconds", hw.clock.monotonic() - started,
+                        method=method or source, door=door.name)
+
+def log_access(outcome, method, user=None, detail=None, door=None):
+    # outcome: granted, denied, expired, locked, error
+    access_log.record(outcome, method, (door or primary).name, user, detail)
+
+def buzzer_off():
+    try:
+        buzzer_pwm.ChangeDutyCycle(0)   # OFF
+    except Exception:
+        pass
 
 def buzzer_beep(duration=0.12):
+    # Loop thread only: switches off via a timer instead of sleeping
     try:
         buzzer_pwm.ChangeDutyCycle(50)  # 50% duty cycle ON
-        time.sleep(duration)
-        buzzer_pwm.ChangeDutyCycle(0)   # OFF
+        runtime.call_later(duration, buzzer_off)
     except Exception:
         pass
 
@@ -208,164 +290,173 @@ def buzzer_beep(duration=0.12):
 # ========== CREDENTIALS ==========
 # ---------------------------
 
+# Salted KDF hashes behind a keyed lookup index; parsed once and re-read
+# only if the file changes on disk
+@metrics.span(STAGE, stage="load_credentials")
 def load_credentials():
-    global credentials
-    try:
-        with open(CRED_FILE, "r") as f:
-            credentials = json.load(f)
-    except Exception:
-        credentials = {"users":[{"username":"Admin","password":"1234"}], "count":1}
-        save_credentials()
-    return credentials
-
-def save_credentials():
-    with open(CRED_FILE, "w") as f:
-        json.dump(credentials, f, indent=2)
+    return credential_store.load()
 
 # ---------------------------
 # ========== FIRESTORE OTP ==========
 # ---------------------------
 
-def get_latest_otp(db_client):
-    try:
-        otps_ref = db_client.collection("otps")
-        query = otps_ref.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(1)
-        docs = list(query.stream())
-        if not docs:
-            return None, None
-        data = docs[0].to_dict()
-        return data.get("code"), data.get("createdAt")
-    except Exception as e:
-        print("get_latest_otp error:", e)
-        return None, None
+# Kept warm in the background; checking a code never touches the network
+otp_store = OtpStore(db, max_minutes=OTP_MAX_MINUTES, clock=hw.clock.time)
 
-def is_otp_valid(otp_created_at, max_minutes=OTP_MAX_MINUTES):
-    if not otp_created_at:
-        return False
-    try:
-        if hasattr(otp_created_at, "to_datetime"):
-            dt = otp_created_at.to_datetime()
-        else:
-            dt = otp_created_at
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return (datetime.now(timezone.utc) - dt) <= timedelta(minutes=max_minutes)
-    except Exception as e:
-        print("is_otp_valid error:", e)
-        return False
+def is_otp_valid(code):
+    return otp_store.is_valid(code)
 
 # ---------------------------
 # ========== REKOGNITION ==========
 # ---------------------------
 
-def capture_live_image(filename='live.jpg'):
+@metrics.span(STAGE, stage="capture_live_image")
+def capture_live_image(timings):
+    # Returns (JPEG bytes of the face crop, local Match or None); the bytes
+    # are None with timings["faces"] == 0 when nobody is in frame
     try:
-        picam2 = Picamera2()
-        config = picam2.create_still_configuration()
-        picam2.configure(config)
-        picam2.start()
-        time.sleep(1.2)
-        picam2.capture_file(filename)
-        picam2.close()
-        return filename
+        t0 = time.perf_counter()
+        frame = camera.capture_frame()
+        timings["capture"] = (time.perf_counter() - t0) * 1000
+        if frame is None:
+            return None, None
+        image_bytes = face_prefilter.prepare(frame, timings)
+        local = None
+        if face_matcher is not None and (image_bytes is not None or not face_prefilter.enabled):
+            box = timings.get("box")
+            if box:
+                local = face_matcher.match(face_prefilter.crop(frame, box), face_prefilter.margin, timings)
+            else:
+                local = face_matcher.match(frame, timings=timings)
+        return image_bytes, local
     except Exception as e:
         print("Camera capture error:", e)
-        return None
+        return None, None
 
-def identify_person(image_path):
-    if not image_path or not os.path.exists(image_path):
+def face_granted(name, detail, started):
+    update_display(f"Hello\n{name}")
+    buzzer_beep()
+    relay_on(5, source="face", started=started)
+    log_access("granted", "face", name, detail)
+
+def face_refused(detail):
+    metrics.inc("lock_auth_refused_total", method="face")
+    update_display("No match")
+    log_access("denied", "face", detail=detail)
+
+@metrics.span(STAGE, stage="identify_person")
+async def identify_person(image_bytes, timings, started=None, local=None):
+    if local is not None and local.decision != UNSURE:
+        # Clear enough on the device: no cloud call
+        print("Face timings:", format_timings(timings))
+        metrics.inc("lock_face_decisions_total", source="local")
+        if local.decision == MATCH:
+            face_granted(local.name, f"local {local.score:.2f}", started)
+        else:
+            face_refused(f"local {local.score:.2f}")
+        return
+    if not image_bytes:
         update_display("Image\nFailed")
         return
+    metrics.inc("lock_face_decisions_total", source="rekognition")
+    metrics.inc("lock_face_upload_bytes_total", len(image_bytes))
     try:
-        with open(image_path, 'rb') as f:
-            response = rekognition.search_faces_by_image(
+        t0 = time.perf_counter()
+        try:
+            response = await runtime.blocking(
+                rekognition.search_faces_by_image,
                 CollectionId=COLLECTION_ID,
-                Image={'Bytes': f.read()},
+                Image={'Bytes': image_bytes},
                 MaxFaces=1,
                 FaceMatchThreshold=SIMILARITY_THRESHOLD
             )
+        finally:
+            timings["search"] = (time.perf_counter() - t0) * 1000
+            print("Face timings:", format_timings(timings))
         matches = response.get('FaceMatches', [])
         if matches:
             m = matches[0]
             name = m.get('Face', {}).get('ExternalImageId', 'Unknown')
             sim = m.get('Similarity', 0.0)
-            update_display(f"Hello\n{name}")
-            buzzer_beep()
-            relay_on(5)
-            update_display("Hello..")
+            face_granted(name, f"similarity {sim:.1f}", started)
         else:
-            update_display("No match")
+            face_refused("no match")
     except ClientError as e:
         print("AWS ClientError:", e)
         update_display("AWS Error")
+        log_access("error", "face", detail=str(e))
     except Exception as e:
         print("Recognition error:", e)
         update_display("Recog Error")
+        log_access("error", "face", detail=str(e))
 
 # ---------------------------
 # ========== KEYPAD HANDLING ==========
 # ---------------------------
 
-def scan_keypad():
-    for row_num, row_pin in enumerate(ROW_PINS):
-        GPIO.output(row_pin, GPIO.LOW)
-        for col_num, col_pin in enumerate(COL_PINS):
-            if GPIO.input(col_pin) == 0:
-                time.sleep(0.02)  # debounce
-                if GPIO.input(col_pin) == 0:
-                    GPIO.output(row_pin, GPIO.HIGH)
-                    return KEYPAD[row_num][col_num]
-        GPIO.output(row_pin, GPIO.HIGH)
-    return None
-
-def handle_submit():
-    global input_buffer, mode, pw1_verified, new_password_stage, new_password_temp, credentials
+# The scanner thread debounces and reports presses in order; they queue
+# here while a submit or face check is still being handled
+keypad = KeypadScanner(GPIO, ROW_PINS, COL_PINS, KEYPAD, clock=hw.clock.monotonic,
+                       on_key=lambda event: runtime.post(keypad_events.put_nowait, event))
+
+async def keypad_loop():
+    global key_event_time
+    while True:
+        event = await keypad_events.get()
+        key_event_time = event.timestamp
+        metrics.observe(STAGE, hw.clock.monotonic() - event.timestamp, stage="keypad_queue")
+        hw.record("key", event.key)
+        await print_key(event.key)
+
+@metrics.span(STAGE, stage="handle_submit")
+async def handle_submit():
+    global input_buffer, mode, pw1_verified, new_password_stage, new_password_temp
 
     if mode == "normal":
-        creds = load_credentials()
-        match = next((u for u in creds["users"] if u["password"] == input_buffer), None)
+        with metrics.span(STAGE, stage="credential_lookup"):
+            # One HMAC and at most one KDF run, on the I/O pool
+            match = await runtime.blocking(credential_store.lookup, input_buffer)
         if match:
             update_display(f"Welcome\n{match['username']}")
             buzzer_beep()
-            relay_on(5)
+            relay_on(5, source="keypad", method="pin", started=key_event_time)
+            log_access("granted", "pin", match["username"])
             input_buffer = ""
-            update_display("Hello..")
             return
 
-        otp_code, otp_time = get_latest_otp(db)
-        if otp_code and input_buffer == str(otp_code):
-            if is_otp_valid(otp_time):
+        with metrics.span(STAGE, stage="otp_check"):
+            otp_status = otp_store.check(input_buffer)
+        if otp_status is not None:
+            if otp_status == OTP_VALID:
                 update_display("Welcome\nOTP user")
                 buzzer_beep()
-                relay_on(5)
-                update_display("Hello..")
+                relay_on(5, source="keypad", method="otp", started=key_event_time)
+                log_access("granted", "otp")
             else:
-                update_display("OTP Expired")
-                time.sleep(2)
-                update_display("Hello..")
+                metrics.inc("lock_auth_refused_total", method="otp")
+                update_display("OTP Expired", hold=2)
+                log_access("expired", "otp")
             input_buffer = ""
             return
 
-        update_display("Incorrect")
+        metrics.inc("lock_auth_refused_total", method="pin")
+        update_display("Incorrect", hold=1.5)
+        log_access("denied", "pin")
         buzzer_beep(0.2)
-        time.sleep(1.5)
-        update_display("Hello..")
         input_buffer = ""
 
     elif mode == "add":
-        creds = load_credentials()
         if not pw1_verified:
-            if creds["users"] and input_buffer == creds["users"][0]["password"]:
+            if await runtime.blocking(credential_store.is_admin, input_buffer):
                 pw1_verified = True
                 input_buffer = ""
                 update_display("Enter New\nPassword:")
                 return
             else:
-                update_display("Need Admin\nPassword")
-                time.sleep(2)
+                update_display("Need Admin\nPassword", hold=2)
+                log_access("denied", "admin")
                 input_buffer = ""
                 mode = "normal"
-                update_display("Hello..")
                 return
 
         if new_password_stage == 0:
@@ -376,51 +467,50 @@ def handle_submit():
             return
         elif new_password_stage == 1:
             if input_buffer == new_password_temp:
-                if any(u["password"] == input_buffer for u in creds["users"]):
-                    update_display("Already exists")
-                    time.sleep(2)
+                new_user = await runtime.blocking(credential_store.add_user, input_buffer)
+                if new_user is None:
+                    update_display("Already exists", hold=2)
                     mode = "normal"
                     pw1_verified = False
                     new_password_stage = 0
                     input_buffer = ""
-                    update_display("Hello..")
                     return
-                creds["count"] = creds.get("count", len(creds["users"]))
-                creds["count"] += 1
-                new_user = {"username": f"PW{creds['count']}", "password": input_buffer}
-                creds["users"].append(new_user)
-                with open(CRED_FILE, "w") as f:
-                    json.dump(creds, f, indent=2)
-                update_display(f"Saved as\n{new_user['username']}")
+                update_display(f"Saved as\n{new_user['username']}", hold=2)
                 buzzer_beep(0.2)
-                time.sleep(2)
             else:
-                update_display("Mismatch\nTry again")
+                update_display("Mismatch\nTry again", hold=2)
                 buzzer_beep(0.2)
-                time.sleep(2)
             mode = "normal"
             pw1_verified = False
             new_password_stage = 0
             input_buffer = ""
-            update_display("Hello..")
             return
 
-def print_key(key):
+async def print_key(key):
     global input_buffer, mode
     if key == "*":
         input_buffer = input_buffer[:-1]
         update_display("*" * len(input_buffer))
     elif key == "D":
-        handle_submit()
+        await handle_submit()
     elif key == "A":
         mode = "add"
         input_buffer = ""
         update_display("Enter Admin\nPassword to add")
     elif key == "B":
+        started = key_event_time
         update_display("Capturing\nImage...")
-        fname = capture_live_image()
+        timings = {}
+        image, local = await runtime.blocking(capture_live_image, timings)
+        if image is None and timings.get("faces") == 0:
+            # Rejected on-device, nothing uploaded
+            print("Face timings:", format_timings(timings))
+            metrics.inc("lock_auth_refused_total", method="face")
+            update_display("No face")
+            log_access("denied", "face", detail="no face")
+            return
         update_display("Identifying...")
-        identify_person(fname)
+        await identify_person(image, timings, started, local)
     elif key in ["C", "#"]:
         pass
     else:
@@ -428,157 +518,178 @@ def print_key(key):
         update_display("*" * len(input_buffer))
 
 # ---------------------------
-# ========== RFID THREAD ==========
+# ========== RFID TASK ==========
 # ---------------------------
 
-def rfid_read_loop():
-    print("RFID reader started")
+# One task per door reader, all on the shared loop and I/O pool
+async def rfid_read_loop(door):
+    print(f"RFID reader started ({door.name})")
+    card_poller = door.poller
     while True:
-        status, TagType = reader.MFRC522_Request(reader.PICC_REQIDL)
-        if status == reader.MI_OK:
-            print("Card detected")
-            status, uid = reader.MFRC522_Anticoll()
-            if status == reader.MI_OK:
-                uid_str = "".join(f"{i:02X}" for i in uid)
-                print(f"Card UID: {uid_str}")
+        started = hw.clock.monotonic()
+        card = await runtime.blocking(card_poller.poll)  # SPI, on the I/O pool
+        if card:
+            card_id, name = card
+            hw.record("card", card_id, door.name)
+            if name:
+                print(f"Card {card_id} at {door.name}: {name}")
+                update_display(f"Hello {name}\nWelcome !", door=door)
                 buzzer_beep()
-                relay_on(5)
-                time.sleep(1)  # Prevent repeated reads
-        time.sleep(0.1)
+                relay_on(5, source="rfid", started=started, door=door)
+                log_access("granted", "rfid", name, str(card_id), door=door)
+            else:
+                print(f"Card {card_id} at {door.name}: unauthorized")
+                metrics.inc("lock_auth_refused_total", method="rfid")
+                update_display("Unauthorized", door=door)
+                log_access("denied", "rfid", detail=str(card_id), door=door)
+                buzzer_beep(0.2)
+        await asyncio.sleep(card_poller.interval())
 
 # ---------------------------
 # ========== BUTTON CALLBACK ==========
 # ---------------------------
 
-def button_pressed_callback():
+def button_pressed_callback(event=None):
+    hw.record("button")
     print("Button pressed - manual unlock")
     update_display("Manually\nUnlocked")
     buzzer_beep(0.08)
-    relay_on(5)
-    update_display("Hello..")
-    
-# Remove any existing event detect on BUTTON_PIN before adding
-try:
-    GPIO.remove_event_detect(BUTTON_PIN)
-except RuntimeError:
-    pass  # no event detect previously
+    relay_on(5, source="button", started=None if event is None else event.timestamp_ns / 1e9)
+    log_access("granted", "button")
 
-#GPIO.add_event_detect(BUTTON_PIN, GPIO.FALLING, callback=button_pressed_callback, bouncetime=300)
+# ---------------------------
+# ========== GPIO EVENTS ==========
+# ---------------------------
+
+# The button is on the "main" lane, vibration has its own; both are
+# bound to the event loop in start()
+gpio_events = EdgeEventEngine(GPIO, clock=hw.clock.monotonic_ns)
+gpio_events.watch(BUTTON_PIN, GPIO.FALLING, button_pressed_callback, debounce_ms=BUTTON_DEBOUNCE_MS)
 
 # ---------------------------
 # ========== VIBRATION MONITOR ==========
 # ---------------------------
 
+# Alerts are spooled to disk and sent in batches by a background thread,
+# so the sensor callback never waits on the network
+alert_pipeline = AlertPipeline(db, ALERT_SPOOL_FILE)
+
 def send_alert_to_firestore(alert_message="Hard vibration detected"):
-    try:
-        alert_data = {"alert": alert_message, "timestamp": firestore.SERVER_TIMESTAMP}
-        ts = datetime.now(timezone.utc).strftime("%Y_%m_%d_%H_%M_%S_%f")
-        docid = f"alert_{ts}_{uuid.uuid4().hex[:6]}"
-        db.collection("door_alerts").document(docid).set(alert_data)
-        print("Sent alert", docid)
-    except Exception as e:
-        print("Failed to send alert:", e)
+    docid = alert_pipeline.emit(alert_message)
+    print("Queued alert", docid)
+
+def vibration_alarm(hits, energy):
+    print(f"Vibration alarm: {hits} knocks, {energy:.2f} s active")
+    send_alert_to_firestore()
+
+# Every edge goes into the detector's ring buffer; it alerts once per
+# attack instead of every few hits
+tamper_detector = TamperDetector(
+    window_s=VIBRATION_WINDOW_SECONDS,
+    hit_threshold=VIBRATION_HIT_THRESHOLD,
+    energy_threshold=VIBRATION_ENERGY_THRESHOLD,
+    cooldown_s=VIBRATION_ALERT_COOLDOWN,
+    on_alarm=vibration_alarm
+)
+vibration_sampler = VibrationSampler(tamper_detector)
 
-def vibration_monitor():
-    global hit_count, start_time_vib
-    hit_count = 0
-    start_time_vib = time.time()
-    while True:
-        if GPIO.input(VIBRATION_PIN) == 1:
-            now = time.time()
-            if now - start_time_vib > VIBRATION_WINDOW_SECONDS:
-                hit_count = 0
-                start_time_vib = now
-            hit_count += 1
-            print("Vibration:", hit_count)
-            if hit_count >= VIBRATION_HIT_THRESHOLD:
-                send_alert_to_firestore()
-                hit_count = 0
-            time.sleep(0.5)
-        else:
-            time.sleep(0.12)
+def vibration_edge(event):
+    hw.record("vib", event.level)
+    vibration_sampler(event)
+
+gpio_events.watch(VIBRATION_PIN, GPIO.BOTH, vibration_edge, debounce_ms=VIBRATION_DEBOUNCE_MS, lane="vibration")
 
 # ---------------------------
 # ========== FIRESTORE RELAY CONTROL ==========
 # ---------------------------
 
-def firestore_relay_control_loop():
-    while True:
-        try:
-            docs = db.collection('lockEvents') \
-                 .order_by('timestamp', direction=firestore.Query.DESCENDING) \
-                 .limit(1) \
-                 .stream()
-
-            locked_value = None
-            for doc in docs:
-                data = doc.to_dict()
-                locked_value = data.get('locked')
-
-            if locked_value is False:
-                GPIO.output(RELAY_PIN, GPIO.HIGH)  # Relay ON
-                print("Locked is False, Relay ON")
-            else:
-                GPIO.output(RELAY_PIN, GPIO.LOW)   # Relay OFF
-        except Exception as e:
-            print("firestore_relay_control_loop error:", e)
-        time.sleep(1)
+def lock_event_changed(door, locked_value, doc_id, started=None):
+    # Called only when the door's newest lockEvents document changes
+    # A remote "locked" only drops the remote hold, so it cannot cut a
+    # local unlock window short
+    if locked_value is False:
+        with metrics.span(STAGE, stage="relay_command"):
+            door.relay.unlock("remote", None, PRIORITY_REMOTE)
+        if started is not None:
+            metrics.observe("lock_unlock_seconds", hw.clock.monotonic() - started, method="remote", door=door.name)
+        print(f"Locked is False, Relay ON ({door.name})")
+        log_access("granted", "remote", detail=doc_id, door=door)
+    else:
+        door.relay.release("remote")
+        log_access("locked", "remote", detail=doc_id, door=door)
 
 # ---------------------------
 # ========== IDLE DISPLAY LOOP ==========
 # ---------------------------
 
-def idle_display_loop():
+async def idle_display_loop():
     idle_msg = "Hello.."
     idle_interval = 8
     while True:
-        update_display(idle_msg)
-        time.sleep(idle_interval)
+        for door in doors:
+            update_display(idle_msg, door=door)
+        await asyncio.sleep(idle_interval)
 
 # ---------------------------
 # ========== MAIN ==========
 # ---------------------------
 
-def main():
-    global credentials
-    credentials = load_credentials()
-    update_display("Hello..")
-
-    threading.Thread(target=rfid_read_loop, daemon=True).start()
-    threading.Thread(target=vibration_monitor, daemon=True).start()
-    threading.Thread(target=idle_display_loop, daemon=True).start()
-    threading.Thread(target=firestore_relay_control_loop, daemon=True).start()
+def shutdown_report():
+    print("OTP store:", otp_store.stats())
+    print(metrics.summary())
+
+async def start(rt):
+    global keypad_events
+    # Before Python 3.10 a Queue binds to the loop current when it is made
+    keypad_events = asyncio.Queue()
+    load_credentials()
+
+    # Cleanups run in reverse order of registration
+    rt.on_shutdown(GPIO.cleanup)
+    rt.on_shutdown(buzzer_pwm.stop)
+    rt.on_shutdown(shutdown_report)
+
+    # Relay, display and remote-control watcher of every door
+    for door in doors:
+        door.start()
+        rt.on_shutdown(door.stop)
+        update_display("Hello..", door=door)
+
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    if METRICS_TEXTFILE:
+        metrics.start_textfile(METRICS_TEXTFILE)
+    rt.on_shutdown(metrics.stop)
+
+    access_log.start()
+    if HISTORY_PORT:
+        access_log.serve(HISTORY_PORT)
+    rt.on_shutdown(access_log.stop)
+
+    alert_pipeline.start()
+    rt.on_shutdown(alert_pipeline.stop)
+    camera.start()
+    rt.on_shutdown(camera.stop)
+    otp_store.start()
+    rt.on_shutdown(otp_store.stop)
+
+    # Edge events are delivered straight onto the event loop
+    gpio_events.bind_lane("main", rt.post)
+    gpio_events.bind_lane("vibration", rt.post)
+    gpio_events.start()
+    rt.on_shutdown(gpio_events.stop)
+    keypad.start()
+    rt.on_shutdown(keypad.stop)
+
+    rt.spawn(keypad_loop(), name="keypad")
+    for door in doors:
+        rt.spawn(rfid_read_loop(door), name=f"rfid-{door.name}")
+    rt.spawn(idle_display_loop(), name="idle-display")
+
+    print(f"System ready, {len(doors)} door(s): {', '.join(d.name for d in doors)}. Waiting for keypad / events.")
 
-    print("System ready. Waiting for keypad / events.")
-
-    last_key = None
-    last_button_state = GPIO.input(BUTTON_PIN)
-
-    try:
-        while True:
-            # Keypad scanning
-            key = scan_keypad()
-            if key and key != last_key:
-                print_key(key)
-                last_key = key
-            elif key is None:
-                last_key = None
-
-            # Button polling (detect falling edge)
-            current_button_state = GPIO.input(BUTTON_PIN)
-            if last_button_state == GPIO.HIGH and current_button_state == GPIO.LOW:
-                # Button pressed detected (falling edge)
-                button_pressed_callback()
-            last_button_state = current_button_state
-
-            time.sleep(0.1)
-            
-    except KeyboardInterrupt:
-        print("Exiting, cleaning up...")
-    finally:
-        buzzer_pwm.stop()
-        GPIO.cleanup()
-        sys.exit(0)
+def main():
+    runtime.run(start)
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
@@ -1,31 +1,22 @@
-import serial
 import threading
 import time
 import os
 
-ser = serial.Serial('/dev/serial0', baudrate=57600, timeout=1)
-serial_lock = threading.Lock()
-DB_FILE = "finger_db.txt"
+from finger_store import FingerprintStore
+from r503 import R503
 
-def packet_header(packet_type, payload):
-    header = b'\xEF\x01\xFF\xFF\xFF\xFF'
-    length = len(payload) + 2
-    packet = (
-        header +
-        bytes([packet_type]) +
-        length.to_bytes(2, 'big') +
-        payload
-    )
-    checksum = sum(packet[6:])
-    packet += checksum.to_bytes(2, 'big')
-    return packet
+# Framed driver: replies are parsed as they arrive instead of waiting for
+# a fixed byte count, and commands from both threads are serialised
+sensor = R503('/dev/serial0', baudrate=57600, timeout=1)
+DB_FILE = "finger_db.txt"  # legacy name:id file, imported into the journal once
+JOURNAL_FILE = "finger_db.journal"
 
-def send_cmd(payload, response_len=12):
-    with serial_lock:
-        packet = packet_header(0x01, payload)
-        ser.write(packet)
-        response = ser.read(response_len)
-    return response
+# Loaded once; matches resolve names from memory
+finger_db = FingerprintStore(JOURNAL_FILE, legacy_path=DB_FILE)
+
+def send_cmd(payload, timeout=None):
+    # Raw acknowledge packet (confirmation code at [9]), b'' on timeout
+    return sensor.send(payload, timeout)
 
 def set_led(mode=0x01, speed=0x03, color=0x01, count=0x00):
     # mode: 0x00=off, 0x01=on, 0x02=breathing, 0x03=flashing
@@ -33,31 +24,8 @@ def set_led(mode=0x01, speed=0x03, color=0x01, count=0x00):
     payload = b'\x35' + bytes([mode, speed, color, count])
     send_cmd(payload)
 
-def load_database():
-    db = {}
-    if os.path.exists(DB_FILE):
-        with open(DB_FILE, "r") as f:
-            for line in f:
-                if ':' in line:
-                    name, id_str = line.strip().split(":")
-                    db[int(id_str)] = name
-    return db
-
-def save_to_database(name, fid):
-    with open(DB_FILE, "a") as f:
-        f.write(f"{name}:{fid}\n")
-
-def write_full_database(db):
-    with open(DB_FILE, "w") as f:
-        for fid in sorted(db):
-            f.write(f"{db[fid]}:{fid}\n")
-
 def get_next_available_id():
-    db = load_database()
-    for i in range(1, 256):
-        if i not in db:
-            return i
-    return -1
+    return finger_db.next_free_id()
 
 def enroll_fingerprint():
     name = input("Enter user name to enroll: ").strip()
@@ -65,8 +33,7 @@ def enroll_fingerprint():
         print("Name cannot be empty.")
         return
 
-    db = load_database()
-    if name in db.values():
+    if finger_db.id_of(name) is not None:
         print("Name already exists.")
         return
 
@@ -123,7 +90,7 @@ def enroll_fingerprint():
     store_cmd = b'\x06\x01' + fid_bytes
     resp = send_cmd(store_cmd)
     if resp and len(resp) > 9 and resp[9] == 0x00:
-        save_to_database(name, fid)
+        finger_db.add(name, fid)
         print(f"'{name}' enrolled successfully with ID {fid}")
         set_led(mode=0x01, speed=0x01, color=0x04, count=0x00)  # Green LED success
         time.sleep(2)
@@ -135,35 +102,26 @@ def enroll_fingerprint():
         set_led(mode=0x00)
 
 def list_database():
-    db = load_database()
     print("\nEnrolled Users:")
-    if db:
-        for fid in sorted(db):
-            print(f"  ID {fid:03d} : {db[fid]}")
+    if len(finger_db):
+        for fid, name in finger_db.items():
+            print(f"  ID {fid:03d} : {name}")
     else:
         print("  (No users enrolled yet)")
     print()
 
 def remove_fingerprint_with_confirmation():
-    db = load_database()
-    if not db:
+    if not len(finger_db):
         print("No fingerprints to remove.")
         return
     list_database()
     val = input("Enter the ID or Name to remove: ").strip()
-    fid = None
-    name = None
     try:
         fid = int(val)
-        name = db.get(fid, None)
     except ValueError:
-        for k, v in db.items():
-            if v.lower() == val.lower():
-                fid = k
-                name = v
-                break
+        fid = finger_db.id_of(val)
 
-    if fid is None or fid not in db:
+    if fid is None or fid not in finger_db:
         print("Not found in database.")
         return
 
@@ -181,7 +139,7 @@ def remove_fingerprint_with_confirmation():
         resp = send_cmd(b'\x02\x01')
         if resp and len(resp) > 9 and resp[9] == 0x00:
             search_cmd = b'\x04\x01\x00\x00\x01\x00'
-            resp2 = send_cmd(search_cmd, response_len=16)
+            resp2 = send_cmd(search_cmd)
             if resp2 and len(resp2) > 13 and resp2[9] == 0x00:
                 confirmed_id = (resp2[10] << 8) | resp2[11]
                 if confirmed_id == fid:
@@ -195,8 +153,7 @@ def remove_fingerprint_with_confirmation():
                     resp3 = send_cmd(del_cmd)
                     if resp3 and len(resp3)>9 and resp3[9] == 0x00:
                         print("Fingerprint deleted.")
-                        db.pop(fid)
-                        write_full_database(db)
+                        finger_db.remove(fid)
                     else:
                         print(f"Error deleting from sensor: code {resp3[9] if resp3 and len(resp3)>9 else 'unknown'}")
                 else:
@@ -244,11 +201,10 @@ def background_search_loop():
 
             # Search fingerprint
             search_cmd = b'\x04\x01\x00\x00\x01\x00'
-            resp2 = send_cmd(search_cmd, response_len=16)
+            resp2 = send_cmd(search_cmd)
             if resp2 and len(resp2) > 13 and resp2[9] == 0x00:
                 matched_id = (resp2[10] << 8) | resp2[11]
-                db = load_database()
-                name = db.get(matched_id, "Unknown User")
+                name = finger_db.name_of(matched_id, "Unknown User")
                 print(f"\nDetected: {name} (ID {matched_id})")
                 set_led(mode=0x01, speed=0x01, color=0x04)
                 time.sleep(1)
@@ -266,8 +222,8 @@ def background_search_loop():
                     break
                 time.sleep(0.2)
 
-        except serial.serialutil.SerialException as e:
-            print(f"Serial error in background thread: {e}")
+        except Exception as e:
+            print(f"Error in background thread: {e}")
             time.sleep(2)
 
 def menu_loop():
@@ -286,7 +242,8 @@ def menu_loop():
             remove_fingerprint_with_confirmation()
         elif choice == 'q':
             print("Goodbye!")
-            ser.close()
+            sensor.close()
+            finger_db.close()
             os._exit(0)
         else:
             print("Invalid option.")
@@ -6,13 +6,13 @@ from mfrc522 import MFRC522
 import time
 from luma.core.interface.serial import i2c
 from luma.oled.device import ssd1306
-from PIL import Image, ImageDraw, ImageFont
+from display_cache import DisplayRenderer
 from datetime import datetime, timezone, timedelta
-import serial
-import threading
+from r503 import R503
+from rfid_frontend import CardPoller
+from mfrc522_fast import FastMFRC522
 
-ser = serial.Serial('/dev/serial0', baudrate=57600, timeout=1)
-serial_lock = threading.Lock()
+sensor = R503('/dev/serial0', baudrate=57600, timeout=1)
 
 def set_led(mode=0x02, speed=0x00, color=0x02, count=0x00):
     """
@@ -21,24 +21,13 @@ def set_led(mode=0x02, speed=0x00, color=0x02, count=0x00):
     color: 1=red, 2=blue, 3=purple, 4=green
     speed: 0-15 (higher slower)
     count: times to flash (0=continuous)
+    Returns a Future; the caller does not wait for the sensor.
     """
-    payload = b'\x35' + bytes([mode, speed, color, count])
-    send_cmd(payload)
-    
-def packet_header(packet_type, payload):
-    header = b'\xEF\x01\xFF\xFF\xFF\xFF'
-    length = len(payload) + 2
-    packet = header + bytes([packet_type]) + length.to_bytes(2, 'big') + payload
-    checksum = sum(packet[6:])
-    packet += checksum.to_bytes(2, 'big')
-    return packet
-    
-def send_cmd(payload, response_len=12):
-    with serial_lock:  # thread-safe serial access
-        packet = packet_header(0x01, payload)
-        ser.write(packet)
-        response = ser.read(response_len)
-    return response
+    return sensor.set_led(mode, speed, color, count)
+
+def send_cmd(payload, timeout=None):
+    # Raw acknowledge packet (confirmation code at [9]), b'' on timeout
+    return sensor.send(payload, timeout)
 
 RELAY_PIN = 27  # GPIO27 (physical pin 13)
 
@@ -52,10 +41,9 @@ GPIO.setmode(GPIO.BCM)
 GPIO.setup(buzzer_pin, GPIO.OUT)
 pwm = GPIO.PWM(buzzer_pin, 1000)  # 440 Hz = A4 note
 
-reader = MFRC522()
+reader = FastMFRC522.from_reader(MFRC522())
 
-# ? List of authorized card IDs
-AUTHORIZED_IDS = [3555744237,3279957986]
+# Authorized card IDs (first four UID bytes as an int) -> name
 AUTHORIZED_CARDS = {
     3555744237: "SSG",
     3279957986: "Ashen",
@@ -65,56 +53,44 @@ AUTHORIZED_CARDS = {
 serial = i2c(port=1, address=0x3C)
 device = ssd1306(serial)
 FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+renderer = DisplayRenderer(device.size, FONT_PATH, sizes=range(20, 7, -1))
 def update_display(message):
-    image = Image.new("1", device.size)
-    draw = ImageDraw.Draw(image)
-    lines = message.split('\n')
-    for size in range(20, 7, -1):
-        font = ImageFont.truetype(FONT_PATH, size)
-        max_w = max(draw.textlength(line, font=font) for line in lines)
-        total_h = sum(font.getbbox(line)[3] for line in lines) + (len(lines) - 1) * 2
-        if max_w <= device.width and total_h <= device.height:
-            break
-    y = (device.height - total_h) // 2
-    draw.rectangle((0, 0, device.width, device.height), fill=0)
-    for line in lines:
-        w = draw.textlength(line, font=font)
-        draw.text(((device.width - w) // 2, y), line, font=font, fill=255)
-        y += font.getbbox(line)[3] + 2
-    device.display(image)
+    device.display(renderer.render(message))
     
+poller = CardPoller(reader, AUTHORIZED_CARDS)
+relay_off_at = None
+
 print("Place your card near the reader...")
+set_led(mode=0x02, speed=0x00, color=0x02, count=0x00)  # Blue LED - waiting
 
 try:
     while True:
-        set_led(mode=0x02, speed=0x00, color=0x02, count=0x00)  # Blue LED - waiting
-        (status, TagType) = reader.MFRC522_Request(reader.PICC_REQIDL)
-
-        if status == reader.MI_OK:
-            (status, uid) = reader.MFRC522_Anticoll()
-
-            if status == reader.MI_OK:
-                card_id = (uid[0] << 24) | (uid[1] << 16) | (uid[2] << 8) | uid[3]
-
-                if card_id in AUTHORIZED_CARDS:
-                    print(f"Hello {AUTHORIZED_CARDS[card_id]}, Welcome !")
-                    update_display(f"Hello {AUTHORIZED_CARDS[card_id]}\nWelcome !")
-                    pwm.start(50)  # 50% duty cycle
-                    time.sleep(0.1)
-                    pwm.stop()
-                    GPIO.output(RELAY_PIN, GPIO.HIGH)
-                    print("Relay ON")
-                    time.sleep(5)
-                    GPIO.output(RELAY_PIN, GPIO.LOW)
-                  
-                else:
-                    print("Unauthorized card")
-                    update_display("Unauthorized")
-
-                # Wait a moment so it doesn't print multiple times for the same card
-                time.sleep(2)
-    time.sleep(0.1)
+        # The LED only changes with the state, so the loop itself is SPI only
+        if relay_off_at and time.monotonic() >= relay_off_at:
+            GPIO.output(RELAY_PIN, GPIO.LOW)
+            relay_off_at = None
+            set_led(mode=0x02, speed=0x00, color=0x02, count=0x00)  # back to blue
+
+        card = poller.poll()
+        if card:
+            card_id, name = card
+            if name:
+                print(f"Hello {name}, Welcome !")
+                update_display(f"Hello {name}\nWelcome !")
+                set_led(mode=0x02, speed=0x00, color=0x04, count=0x00)  # green
+                pwm.start(50)  # 50% duty cycle
+                time.sleep(0.1)
+                pwm.stop()
+                GPIO.output(RELAY_PIN, GPIO.HIGH)
+                print("Relay ON")
+                relay_off_at = time.monotonic() + 5
+            else:
+                print("Unauthorized card")
+                update_display("Unauthorized")
+                set_led(mode=0x03, speed=0x02, color=0x01, count=0x02)  # flash red twice
+
+        time.sleep(poller.interval())
 
 
 finally:
-    GPIO.cleanup()
\ No newline at end of file
+    GPIO.cleanup()
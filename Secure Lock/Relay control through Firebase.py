@@ -1,7 +1,10 @@
+import os
 import sys
 import time
 import RPi.GPIO as GPIO
 
+from firestore_listener import LockEventWatcher
+
 sys.path.append('/home/techsharks/firebase_lib')
 from firebase_admin import credentials, firestore
 import firebase_admin
@@ -15,32 +18,28 @@ GPIO.setwarnings(False)
 GPIO.setmode(GPIO.BCM)
 GPIO.setup(RELAY_PIN, GPIO.OUT)
 
+def on_lock_event(locked_value, doc_id):
+    if locked_value is False:
+        GPIO.output(RELAY_PIN, GPIO.HIGH)  # Relay ON (active LOW)
+        print("Locked is False, Relay ON")
+    else:
+        GPIO.output(RELAY_PIN, GPIO.LOW)  # Relay OFF (active HIGH)
+        # no print here
+
+# LOCK_EVENTS_MODE=poll restores the old 6 s polling
+watcher = LockEventWatcher(db, on_lock_event, mode=os.getenv("LOCK_EVENTS_MODE", "listen"), poll_interval=6)
+
 print("Starting relay control based on Firestore 'locked' value. Press Ctrl+C to stop.")
 
 try:
+    watcher.start()
     while True:
-        docs = db.collection('lockEvents') \
-                 .order_by('timestamp', direction=firestore.Query.DESCENDING) \
-                 .limit(1) \
-                 .stream()
-
-        locked_value = None
-        for doc in docs:
-            data = doc.to_dict()
-            locked_value = data.get('locked')
-
-        if locked_value is False:
-            GPIO.output(RELAY_PIN, GPIO.HIGH)  # Relay ON (active LOW)
-            print("Locked is False, Relay ON")
-        else:
-            GPIO.output(RELAY_PIN, GPIO.LOW)  # Relay OFF (active HIGH)
-            # no print here
-
-        time.sleep(6)
+        time.sleep(1)
 
 except KeyboardInterrupt:
     print("Program stopped by user.")
 
 finally:
+    watcher.stop()
     GPIO.cleanup()
     print("GPIO cleaned up.")
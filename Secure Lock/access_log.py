@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local access history.
+#
+# Every access decision (who, which door, which method, granted/denied)
+# goes into a SQLite database in WAL mode. record() only appends to an
+# in-memory queue; a writer thread drains it in batches, one transaction
+# per batch, so the unlock paths never wait for the SD card. Nothing is
+# dropped when the writer falls behind: past `max_pending` queued rows the
+# queue is appended to a spill file (<db>.spill, JSON lines) that the
+# writer loads back ahead of newer rows, and a batch that fails to commit
+# goes back to the front of the queue to be retried. What is still only
+# in memory - at most one flush interval of decisions - is spilled on
+# stop() and lost only if the process dies. Reads use
+# their own connections (WAL lets them run alongside the writer) and page
+# newest-first by id, with `before` as the cursor, so deep pages cost the
+# same as the first. serve() exposes the query on a local HTTP port:
+#   GET /access?door=&user=&method=&outcome=&since=&until=&limit=&before=
+# since/until are Unix times; the reply is {"items": [...], "next": <id>|null}.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS access (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    door TEXT,
+    method TEXT NOT NULL,
+    user TEXT,
+    outcome TEXT NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS access_ts ON access (ts);
+CREATE INDEX IF NOT EXISTS access_door ON access (door, id);
+CREATE INDEX IF NOT EXISTS access_user ON access (user, id);
+CREATE INDEX IF NOT EXISTS access_method ON access (method, id);
+"""
+
+COLUMNS = ("id", "ts", "door", "method", "user", "outcome", "detail")
+FILTERS = ("door", "user", "method", "outcome")
+MAX_PAGE = 500
+
+
+def _connect(path):
+    db = sqlite3.connect(path, timeout=5)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; a power cut loses at most the last batch
+    return db
+
+
+class AccessLog:
+    def __init__(self, path, clock=time.time, batch_size=256, flush_interval=0.5, max_pending=10000):
+        self.path = path
+        self.clock = clock
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spill_path = path + ".spill"
+        self._pending = []
+        self._spilled = os.path.exists(self.spill_path)  # left over from a previous run
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+        self._server = None
+        self._local = threading.local()
+        with _connect(path) as db:
+            db.executescript(SCHEMA)
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.retries = 0
+        self.dropped = 0  # only if the spill file cannot be written either
+
+    # --- writing ---
+
+    def record(self, outcome, method, door=None, user=None, detail=None, ts=None):
+        """Queue one access decision; only touches the disk if the writer is far behind."""
+        row = (self.clock() if ts is None else ts, door, method, user, outcome, detail)
+        with self._cond:
+            self._pending.append(row)
+            if len(self._pending) >= self.max_pending:
+                self._spill()
+                self._cond.notify()
+            elif len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def _spill(self):
+        # Lock held: move the queue to the spill file, oldest first
+        rows, self._pending = self._pending, []
+        try:
+            with open(self.spill_path, "a") as f:
+                f.writelines(json.dumps(row) + "\n" for row in rows)
+                f.flush()
+                os.fsync(f.fileno())
+            self._spilled = True
+            self.spilled += len(rows)
+        except OSError as e:
+            self.dropped += len(rows)
+            print(f"Access log spill failed, {len(rows)} decisions lost:", e)
+
+    def _take(self):
+        # Lock held: spilled rows, then the queue
+        rows = []
+        if self._spilled:
+            try:
+                with open(self.spill_path) as f:
+                    for line in f:
+                        try:
+                            rows.append(tuple(json.loads(line)))
+                        except ValueError:
+                            pass  # torn last line from a crash mid-spill
+                os.remove(self.spill_path)
+                self._spilled = False
+            except FileNotFoundError:
+                self._spilled = False
+            except OSError as e:
+                print("Access log spill read error:", e)
+                rows = []
+        rows += self._pending
+        self._pending = []
+        return rows
+
+    def _restore(self, rows):
+        # Lock held: put a failed batch back in front of newer rows
+        self._pending[:0] = rows
+        if len(self._pending) >= self.max_pending:
+            self._spill()
+
+    def _write(self, db, rows):
+        with db:
+            db.executemany("INSERT INTO access (ts, door, method, user, outcome, detail) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.written += len(rows)
+        self.batches += 1
+
+    def _run(self):
+        db = None
+        failed = False
+        while True:
+            with self._cond:
+                if not self._stop and (failed or not (self._pending or self._spilled)):
+                    self._cond.wait(self.flush_interval)  # after a failure: retry at this pace
+                rows = self._take()
+                stopping = self._stop
+            if rows:
+                try:
+                    if db is None:
+                        db = _connect(self.path)
+                    self._write(db, rows)
+                    failed = False
+                except sqlite3.Error as e:
+                    print(f"Access log write error, {len(rows)} decisions kept for retry:", e)
+                    failed = True
+                    self.retries += 1
+                    with self._cond:
+                        self._restore(rows)
+            if stopping:
+                with self._cond:
+                    if self._pending:
+                        self._spill()  # picked up on the next start
+                if db is not None:
+                    db.close()
+                return
+
+    def flush(self):
+        """Write everything queued or spilled so far from the calling thread."""
+        with self._cond:
+            rows = self._take()
+        if rows:
+            try:
+                self._write(self._reader(), rows)
+            except sqlite3.Error:
+                with self._cond:
+                    self._restore(rows)
+                raise
+
+    # --- reading ---
+
+    def _reader(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = _connect(self.path)
+        return db
+
+    def query(self, door=None, user=None, method=None, outcome=None, since=None, until=None,
+              limit=50, before=None):
+        """Newest-first page of decisions: (rows as dicts, cursor for the next page or None)."""
+        where, args = [], []
+        for column, value in zip(FILTERS, (door, user, method, outcome)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(float(since))
+        if until is not None:
+            where.append("ts < ?")
+            args.append(float(until))
+        if before is not None:
+            where.append("id < ?")
+            args.append(int(before))
+        limit = max(1, min(int(limit), MAX_PAGE))
+        sql = "SELECT id, ts, door, method, user, outcome, detail FROM access"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        rows = self._reader().execute(sql, args + [limit + 1]).fetchall()
+        items = [dict(zip(COLUMNS, row)) for row in rows[:limit]]
+        return items, (items[-1]["id"] if len(rows) > limit else None)
+
+    # --- HTTP ---
+
+    def serve(self, port, address="127.0.0.1"):
+        log = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/access":
+                    self.send_error(404)
+                    return
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                unknown = set(params) - set(FILTERS) - {"since", "until", "limit", "before"}
+                try:
+                    if unknown:
+                        raise ValueError(f"unknown parameters: {', '.join(sorted(unknown))}")
+                    items, cursor = log.query(**params)
+                except (ValueError, TypeError) as e:
+                    self.send_error(400, str(e))
+                    return
+                body = json.dumps({"items": items, "next": cursor}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((address, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="access-http", daemon=True).start()
+        return self._server.server_address[1]
+
+    # --- lifecycle ---
+
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+def _record_per_commit(path, row):
+    # One connection, insert and commit per decision, on the caller's thread
+    db = sqlite3.connect(path)
+    with db:
+        db.execute("INSERT INTO access (ts, door, method, user, outcome, detail) VALUES (?, ?, ?, ?, ?, ?)", row)
+    db.close()
+
+
+def benchmark(events=20000):
+    import random
+    import tempfile
+    import urllib.request
+
+    methods = ["pin", "otp", "face", "rfid", "button", "remote"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "access.db")
+        log = AccessLog(path)
+        log.start()
+        t0 = time.perf_counter()
+        for i in range(events):
+            log.record(random.choice(["granted", "denied"]), random.choice(methods),
+                       door=f"door{i % 4 + 1}", user=f"user{i % 50}", ts=1.7e9 + i)
+        queued = (time.perf_counter() - t0) / events
+        log.stop()
+        print(f"record(): {queued * 1e6:.1f} us per decision on the caller's thread, "
+              f"{log.written} rows in {log.batches} transactions, {log.spilled} via the spill file, "
+              f"{log.retries} retried, {log.dropped} dropped")
+        with sqlite3.connect(path) as db:
+            stored = [ts for (ts,) in db.execute("SELECT ts FROM access ORDER BY id")]
+        assert stored == [1.7e9 + i for i in range(events)], "decisions lost or out of order"
+
+        # A disk that rejects every commit: decisions are retried, spilled
+        # at stop() and written on the next start
+        def disk_error(db, rows):
+            raise sqlite3.OperationalError("disk I/O error (simulated)")
+        log = AccessLog(path, flush_interval=0.05)
+        log._write = disk_error
+        log.start()
+        for i in range(100):
+            log.record("granted", "pin", door="door1", user="late", ts=1.8e9 + i)
+            time.sleep(0.002)
+        log.stop()
+        retries, spilled = log.retries, log.spilled
+        log = AccessLog(path)
+        log.flush()
+        print(f"failing disk: {retries} failed commits, {spilled} decisions spilled at stop; "
+              f"after restart {len(log.query(user='late', limit=500)[0])} of 100 are in the database")
+
+        row = (1.7e9, "door1", "pin", "user1", "granted", None)
+        n = 200
+        t0 = time.perf_counter()
+        for _ in range(n):
+            _record_per_commit(path, row)
+        print(f"commit per decision: {(time.perf_counter() - t0) / n * 1e6:.0f} us on the caller's thread")
+
+        for label, kwargs in (("newest 50", {}), ("user7 denied", {"user": "user7", "outcome": "denied"}),
+                              ("door3 face, 1 h", {"door": "door3", "method": "face", "since": 1.7e9 + 10000,
+                                                   "until": 1.7e9 + 13600})):
+            t0 = time.perf_counter()
+            items, cursor = log.query(**kwargs)
+            page2 = log.query(**kwargs, before=cursor)[0] if cursor else []
+            print(f"{label:<16} {len(items)}+{len(page2)} rows in {(time.perf_counter() - t0) * 1e3:.2f} ms (2 pages)")
+
+        port = log.serve(0)
+        body = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/access?method=rfid&limit=2").read())
+        print("HTTP:", body["items"][0], "next:", body["next"])
+        log.stop()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import uuid
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+# Store-and-forward pipeline for door_alerts.
+#
+# emit() only puts the alert on a bounded in-memory queue (or, if that is
+# full, appends it straight to the spool) and returns. A flusher thread
+# moves queued alerts into an fsync'd JSON-lines spool file, then sends
+# the spool to Firestore in WriteBatch commits. On failure it retries with
+# exponential backoff plus jitter. Alerts only leave the spool once their
+# batch has been committed, so nothing is lost across network outages or
+# reboots. Document IDs are fixed when the alert is raised, so a batch
+# that is retried after a partial failure just overwrites the same docs.
+# The spool is sent front to back: a committed batch only moves the read
+# offset (kept in <spool>.offset), and the file is emptied once all of it
+# is sent, so a delivery never rewrites the spool. A line torn by a power
+# cut is cut off before the next append.
+
+MAX_BATCH = 500  # Firestore limit per WriteBatch
+
+
+class AlertPipeline:
+    def __init__(self, db, spool_path, collection="door_alerts", queue_size=256,
+                 batch_size=100, base_backoff=1.0, max_backoff=300.0):
+        self.db = db
+        self.spool_path = spool_path
+        self.collection = collection
+        self.batch_size = min(batch_size, MAX_BATCH)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spool_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self._next_attempt = 0.0
+        self.emitted = 0
+        self.sent = 0
+        self.failed_commits = 0
+        self.overflowed = 0
+        self.offset_path = spool_path + ".offset"
+        os.makedirs(os.path.dirname(os.path.abspath(spool_path)), exist_ok=True)
+        self._offset = self._load_offset()
+
+    # --- producer side ---
+
+    def emit(self, alert_message, **fields):
+        ts = datetime.now(timezone.utc)
+        record = {
+            "id": f"alert_{ts.strftime('%Y_%m_%d_%H_%M_%S_%f')}_{uuid.uuid4().hex[:6]}",
+            "alert": alert_message,
+            "timestamp": ts.isoformat(),
+            **fields,
+        }
+        self.emitted += 1
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.overflowed += 1
+            self._spool_append([record])
+        self._wake.set()
+        return record["id"]
+
+    # --- spool ---
+
+    def _load_offset(self):
+        try:
+            with open(self.offset_path) as f:
+                offset = int(f.read())
+            size = os.path.getsize(self.spool_path)
+        except (OSError, ValueError):
+            return 0
+        return offset if 0 <= offset <= size else 0
+
+    def _save_offset(self):
+        tmp = self.offset_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(self._offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.offset_path)
+
+    def _cut_torn_line(self, f):
+        # Spool open for append: drop a last line left without its newline
+        end = f.seek(0, os.SEEK_END)
+        cut = end
+        while cut > 0:
+            start = max(0, cut - 4096)
+            f.seek(start)
+            newline = f.read(cut - start).rfind(b"\n")
+            if newline >= 0:
+                cut = start + newline + 1
+                break
+            cut = start
+        if cut < end:
+            f.truncate(cut)
+            print(f"Alert spool: cut off {end - cut} bytes of a torn record")
+
+    def _spool_append(self, records):
+        data = "".join(json.dumps(r) + "\n" for r in records).encode()
+        with self._spool_lock:
+            with open(self.spool_path, "a+b") as f:
+                self._cut_torn_line(f)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _spool_read(self, limit):
+        """Up to `limit` unsent records and the offset just past them."""
+        with self._spool_lock:
+            records = []
+            end = self._offset
+            try:
+                f = open(self.spool_path, "rb")
+            except FileNotFoundError:
+                return records, end
+            with f:
+                f.seek(end)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn tail, cut off by the next append
+                    end += len(line)
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+                    if len(records) >= limit:
+                        break
+            return records, end
+
+    def _spool_drop(self, end):
+        # Everything before `end` is committed
+        with self._spool_lock:
+            try:
+                size = os.path.getsize(self.spool_path)
+            except FileNotFoundError:
+                size = 0
+            if end >= size:
+                # All sent: start the spool over
+                with open(self.spool_path, "wb") as f:
+                    os.fsync(f.fileno())
+                self._offset = 0
+            else:
+                self._offset = end
+            self._save_offset()
+
+    def pending(self):
+        with self._spool_lock:
+            try:
+                with open(self.spool_path, "rb") as f:
+                    f.seek(self._offset)
+                    spooled = sum(1 for line in f if line.endswith(b"\n"))
+            except FileNotFoundError:
+                spooled = 0
+        return spooled + self._queue.qsize()
+
+    # --- flusher ---
+
+    def _drain_queue(self):
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if records:
+            self._spool_append(records)
+
+    def _send_batch(self, records):
+        batch = self.db.batch()
+        col = self.db.collection(self.collection)
+        for r in records:
+            data = {k: v for k, v in r.items() if k != "id"}
+            data["timestamp"] = datetime.fromisoformat(r["timestamp"])
+            batch.set(col.document(r["id"]), data)
+        batch.commit()
+
+    def flush_once(self):
+        """Send spooled alerts until the spool is empty or a commit fails."""
+        self._drain_queue()
+        while True:
+            records, end = self._spool_read(self.batch_size)
+            if not records:
+                self._failures = 0
+                return True
+            try:
+                self._send_batch(records)
+            except Exception as e:
+                self.failed_commits += 1
+                self._failures += 1
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (self._failures - 1))
+                delay *= random.uniform(0.8, 1.2)
+                self._next_attempt = time.monotonic() + delay
+                print(f"Alert flush failed ({len(records)} pending, retry in {delay:.1f} s):", e)
+                return False
+            self._spool_drop(end)
+            self.sent += len(records)
+            self._failures = 0
+            for r in records:
+                print("Sent alert", r["id"])
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = max(0.0, self._next_attempt - time.monotonic())
+            self._wake.wait(wait if wait > 0 else None)
+            self._wake.clear()
+            self._drain_queue()  # get new alerts onto disk right away
+            if time.monotonic() >= self._next_attempt:
+                self.flush_once()
+        self._drain_queue()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+        self._thread.start()
+        self._wake.set()  # send anything left in the spool from before a reboot
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+# ---------------------------
+# ========== DEMO ==========
+# ---------------------------
+
+if __name__ == "__main__":
+    import tempfile
+    from sim_firestore import FakeFirestore
+
+    db = FakeFirestore()
+    with tempfile.TemporaryDirectory() as tmp:
+        alerts = AlertPipeline(db, os.path.join(tmp, "alerts.spool"), base_backoff=0.2)
+        alerts.start()
+        db.fail_writes = True  # network down
+        t0 = time.perf_counter()
+        for i in range(20):
+            alerts.emit("Hard vibration detected")
+        print(f"20 x emit(): {(time.perf_counter() - t0) * 1e6 / 20:.1f} us each")
+        time.sleep(1.0)
+        print(f"outage: sent={alerts.sent} pending={alerts.pending()} failed commits={alerts.failed_commits}")
+
+        alerts.stop()  # "reboot" with alerts still spooled
+        with open(os.path.join(tmp, "alerts.spool"), "a") as f:
+            f.write('{"id": "alert_torn", "al')  # power cut mid-append
+        alerts = AlertPipeline(db, os.path.join(tmp, "alerts.spool"), base_backoff=0.2)
+        db.fail_writes = False
+        alerts.start()
+        alerts.emit("Door forced")
+        time.sleep(0.5)
+        print(f"after restart: sent={alerts.sent} pending={alerts.pending()} "
+              f"docs={len(db.collection('door_alerts')._docs)} batches={db.batches} "
+              f"spool={os.path.getsize(os.path.join(tmp, 'alerts.spool'))} bytes")
+        assert alerts.sent == 21 and alerts.pending() == 0
+        alerts.stop()
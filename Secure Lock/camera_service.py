@@ -0,0 +1,129 @@
+import io
+import time
+import threading
+from collections import deque, namedtuple
+
+from PIL import Image
+
+# Long-lived camera pipeline.
+# The camera is opened once and a low-resolution stream is kept running,
+# so auto-exposure has already converged when someone presses "B". A
+# grabber thread keeps the last few frames in a ring buffer and
+# capture_jpeg() encodes the newest one straight to bytes for Rekognition,
+# with no file written to the SD card.
+
+Frame = namedtuple("Frame", ["timestamp", "array"])
+
+PREVIEW_SIZE = (640, 480)
+
+
+class Picamera2Source:
+    def __init__(self, size=PREVIEW_SIZE):
+        from picamera2 import Picamera2
+        self.picam2 = Picamera2()
+        # "BGR888" gives pixels in R, G, B order, which is what PIL expects
+        config = self.picam2.create_video_configuration(main={"size": size, "format": "BGR888"})
+        self.picam2.configure(config)
+
+    def start(self):
+        self.picam2.start()
+
+    def capture_array(self):
+        return self.picam2.capture_array("main")
+
+    def stop(self):
+        self.picam2.stop()
+        self.picam2.close()
+
+
+class CameraService:
+    def __init__(self, source, ring_size=4, jpeg_quality=85, warmup=1.2):
+        self.source = source
+        self.ring = deque(maxlen=ring_size)
+        self.jpeg_quality = jpeg_quality
+        self.warmup = warmup
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._ready_at = None
+        self.errors = 0
+
+    def start(self):
+        self.source.start()
+        self._ready_at = time.monotonic() + self.warmup  # AE/AWB settle once, at start-up
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._grab_loop, name="camera", daemon=True)
+        self._thread.start()
+
+    def _grab_loop(self):
+        while not self._stop.is_set():
+            try:
+                array = self.source.capture_array()
+            except Exception as e:
+                self.errors += 1
+                print("Camera grab error:", e)
+                self._stop.wait(0.5)
+                continue
+            with self._cond:
+                self.ring.append(Frame(time.monotonic(), array))
+                self._cond.notify_all()
+
+    def latest_frame(self, newer_than=None, timeout=1.0):
+        """Newest frame, optionally waiting for one captured after `newer_than`."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self.ring and (newer_than is None or self.ring[-1].timestamp > newer_than):
+                    return self.ring[-1]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self.ring[-1] if self.ring else None
+                self._cond.wait(remaining)
+
+    def encode_jpeg(self, array, quality=None):
+        buf = io.BytesIO()
+        Image.fromarray(array).save(buf, format="JPEG", quality=quality or self.jpeg_quality)
+        return buf.getvalue()
+
+    def capture_frame(self, timeout=1.0):
+        """Pixel array of a frame taken after this call was made, or None."""
+        requested = time.monotonic()
+        if self._ready_at and requested < self._ready_at:
+            time.sleep(self._ready_at - requested)
+        frame = self.latest_frame(newer_than=requested, timeout=timeout)
+        return frame.array if frame is not None else None
+
+    def capture_jpeg(self, timeout=1.0):
+        """JPEG bytes of a frame taken after this call was made, or None."""
+        array = self.capture_frame(timeout)
+        return self.encode_jpeg(array) if array is not None else None
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        try:
+            self.source.stop()
+        except Exception as e:
+            print("Camera stop error:", e)
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+if __name__ == "__main__":
+    from sim_camera import FakeFrameSource
+
+    service = CameraService(FakeFrameSource(PREVIEW_SIZE, fps=30), warmup=0)
+    service.start()
+    times, sizes = [], []
+    for _ in range(50):
+        t0 = time.perf_counter()
+        jpeg = service.capture_jpeg()
+        times.append(time.perf_counter() - t0)
+        sizes.append(len(jpeg))
+    service.stop()
+    times.sort()
+    print(f"capture_jpeg at {PREVIEW_SIZE[0]}x{PREVIEW_SIZE[1]}: p50={times[25] * 1e3:.1f} ms  "
+          f"max={times[-1] * 1e3:.1f} ms  ~{sum(sizes) // len(sizes) // 1024} KB/frame")
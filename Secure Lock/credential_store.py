@@ -0,0 +1,315 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+# Keypad credentials (credentials.json) held in memory.
+#
+# PINs are never stored. Each user has a salted PBKDF2-SHA256 hash plus
+# a lookup tag, HMAC-SHA256(key, PIN), where the key lives in a separate
+# 0600 file (credentials.key). lookup() computes the tag, finds the one
+# candidate it names in a dict and runs the slow hash once for it, so a
+# submit costs one KDF however many users there are; a wrong PIN costs
+# only the HMAC. Without the key file the tags are useless to someone who
+# copied credentials.json, so the KDF is all they can attack.
+# The KDF cost is picked by calibrate() on the device itself, aiming at
+# VERIFY_TARGET_S per verify; hashes made with a lower cost are redone on
+# the next successful login. Plaintext "password" entries from older
+# files are hashed on load. If the key file is lost, users are found by
+# verifying each one in turn and re-tagged as they log in.
+#
+# The file is parsed once; lookup() only stats the file and re-reads it
+# when its mtime/inode/size changed (e.g. edited by hand). Writes go to a
+# temp file in the same directory which is fsync'd and renamed over the
+# original, so a power cut never leaves a half-written file behind.
+
+DEFAULT_CREDENTIALS = {"users": [{"username": "Admin", "password": "1234"}], "count": 1}
+
+KDF = "pbkdf2_sha256"
+VERIFY_TARGET_S = 0.05
+MIN_ITERATIONS = 10000
+
+
+def calibrate(target_s=VERIFY_TARGET_S, probe=20000):
+    """PBKDF2 iterations that take about `target_s` on this machine."""
+    salt = os.urandom(16)
+    best = min(_timed(hashlib.pbkdf2_hmac, "sha256", b"000000", salt, probe) for _ in range(3))
+    return max(MIN_ITERATIONS, int(probe * target_s / best))
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def _kdf(pin, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", pin.encode(), salt, iterations)
+
+
+class CredentialStore:
+    def __init__(self, path, default=DEFAULT_CREDENTIALS, key_path=None, target_s=VERIFY_TARGET_S):
+        self.path = path
+        self.default = default
+        self.key_path = key_path or os.path.splitext(path)[0] + ".key"
+        self.target_s = target_s
+        self._lock = threading.RLock()
+        self._key = None
+        self._data = None
+        self._by_tag = {}
+        self._untagged = []   # users whose tag was made with another key
+        self._stamp = None
+        self.reloads = 0
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    # --- keys and hashes ---
+
+    def _load_key(self):
+        if self._key is not None:
+            return self._key
+        try:
+            with open(self.key_path, "rb") as f:
+                self._key = bytes.fromhex(f.read().decode().strip())
+        except FileNotFoundError:
+            key = os.urandom(32)
+            fd = os.open(self.key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(key.hex() + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._key = key
+        return self._key
+
+    def _key_id(self):
+        return hashlib.sha256(b"key-id" + self._load_key()).hexdigest()[:16]
+
+    def _tag(self, pin):
+        return hmac.new(self._load_key(), pin.encode(), hashlib.sha256).hexdigest()
+
+    def _set_pin(self, user, pin, iterations):
+        salt = os.urandom(16)
+        user.pop("password", None)
+        user["tag"] = self._tag(pin)
+        user["salt"] = salt.hex()
+        user["iterations"] = iterations
+        user["hash"] = _kdf(pin, salt, iterations).hex()
+
+    def _verify(self, user, pin):
+        digest = _kdf(pin, bytes.fromhex(user["salt"]), user["iterations"])
+        return hmac.compare_digest(digest.hex(), user["hash"])
+
+    # --- file ---
+
+    def _index(self, data):
+        """Index by tag; hashes plaintext PINs. Returns True if `data` changed."""
+        changed = False
+        kdf = data.get("kdf")
+        if not kdf or kdf.get("name") != KDF:
+            data["kdf"] = kdf = {"name": KDF, "iterations": calibrate(self.target_s)}
+            changed = True
+        key_id = self._key_id()
+        if data.get("key_id") != key_id:
+            # Tags made with another key are useless; drop them so the
+            # users are found by a full verify until they log in again
+            for user in data.get("users", []):
+                user.pop("tag", None)
+            data["key_id"] = key_id
+            changed = True
+        self._data = data
+        self._by_tag = {}
+        self._untagged = []
+        for user in data.get("users", []):
+            if "password" in user:
+                self._set_pin(user, str(user["password"]), kdf["iterations"])
+                changed = True
+            if "tag" in user:
+                # First user with a PIN wins, as with the old linear scan
+                self._by_tag.setdefault(user["tag"], user)
+            else:
+                self._untagged.append(user)
+        return changed
+
+    def load(self):
+        with self._lock:
+            stamp = self._file_stamp()
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except Exception:
+                data = json.loads(json.dumps(self.default))
+                self._index(data)
+                self.save()
+                return self._data
+            self._stamp = stamp
+            if self._index(data):
+                self.save()
+            self.reloads += 1
+            return self._data
+
+    def ensure_file(self):
+        if not os.path.exists(self.path):
+            with self._lock:
+                self._index(json.loads(json.dumps(self.default)))
+                self.save()
+
+    def _fresh(self):
+        # One stat() per call; the file is only re-parsed if it changed
+        if self._data is None or self._file_stamp() != self._stamp:
+            self.load()
+
+    @property
+    def data(self):
+        with self._lock:
+            self._fresh()
+            return self._data
+
+    # --- queries ---
+
+    def lookup(self, pin):
+        """The user with this PIN, or None. One KDF run at most (unless the key was replaced)."""
+        with self._lock:
+            self._fresh()
+            user = self._by_tag.get(self._tag(pin))
+            if user is not None:
+                if not self._verify(user, pin):
+                    return None
+            else:
+                user = next((u for u in self._untagged if self._verify(u, pin)), None)
+                if user is None:
+                    return None
+                self._untagged.remove(user)
+                user["tag"] = self._tag(pin)
+                self._by_tag.setdefault(user["tag"], user)
+                self.save()
+            if user["iterations"] < self._data["kdf"]["iterations"]:
+                self._set_pin(user, pin, self._data["kdf"]["iterations"])
+                self.save()
+            return user
+
+    def admin(self):
+        with self._lock:
+            self._fresh()
+            users = self._data.get("users", [])
+            return users[0] if users else None
+
+    def is_admin(self, pin):
+        user = self.lookup(pin)
+        return user is not None and user is self.admin()
+
+    def add_user(self, pin):
+        """Append a PW<n> user and persist. Returns the new user, or None if the PIN exists."""
+        with self._lock:
+            self._fresh()
+            if self.lookup(pin) is not None:
+                return None
+            data = self._data
+            data["count"] = data.get("count", len(data["users"])) + 1
+            user = {"username": f"PW{data['count']}"}
+            self._set_pin(user, pin, data["kdf"]["iterations"])
+            data["users"].append(user)
+            self._by_tag[user["tag"]] = user
+            self.save()
+            return user
+
+    def recalibrate(self):
+        """Re-measure the KDF cost; users are rehashed at the new cost as they log in."""
+        with self._lock:
+            self._fresh()
+            self._data["kdf"]["iterations"] = calibrate(self.target_s)
+            self.save()
+            return self._data["kdf"]["iterations"]
+
+    def save(self):
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(prefix=".credentials.", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self._data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except Exception:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+            try:
+                dir_fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            except OSError:
+                pass
+            self._stamp = self._file_stamp()
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+def _scan_verify(users, pin):
+    # What a salted store without the index has to do: run the KDF per user
+    for user in users:
+        digest = _kdf(pin, bytes.fromhex(user["salt"]), user["iterations"])
+        if hmac.compare_digest(digest.hex(), user["hash"]):
+            return user
+    return None
+
+
+def benchmark(sizes=(10, 1000, 10000), iterations=1000, lookups=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "credentials.json")
+        store = CredentialStore(path)
+        store.ensure_file()
+        target = store.data["kdf"]["iterations"]
+        t = min(_timed(store.lookup, "1234") for _ in range(5))
+        print(f"calibrated: {target} iterations, verify {t * 1e3:.1f} ms (target {VERIFY_TARGET_S * 1e3:.0f} ms)")
+
+        # Only the matching user is ever verified, so the others get filler
+        # hashes; the scan column is measured up to 1000 users, then scaled
+        print(f"at {iterations} iterations per hash:")
+        print(f"{'users':>6}{'indexed ms':>12}{'miss ms':>10}{'scan ms':>12}")
+        per_user = None
+        for n in sizes:
+            users = [{"username": f"PW{i}", "tag": store._tag(f"{i:06d}"), "salt": os.urandom(16).hex(),
+                      "iterations": iterations, "hash": os.urandom(32).hex()} for i in range(n)]
+            store._set_pin(users[-1], f"{n - 1:06d}", iterations)
+            data = {"kdf": {"name": KDF, "iterations": iterations}, "key_id": store._key_id(),
+                    "users": users, "count": n}
+            with open(path, "w") as f:
+                json.dump(data, f)
+            store.load()
+            worst = f"{n - 1:06d}"
+            assert store.lookup(worst)["username"] == f"PW{n - 1}"
+            indexed = min(_timed(store.lookup, worst) for _ in range(lookups))
+            miss = min(_timed(store.lookup, "999999x") for _ in range(lookups))
+            if n <= 1000:
+                scan = _timed(_scan_verify, users, worst)
+                per_user = scan / n
+                note = ""
+            else:
+                scan = per_user * n
+                note = " (est.)"
+            print(f"{n:>6}{indexed * 1e3:>12.2f}{miss * 1e3:>10.3f}{scan * 1e3:>12.0f}{note}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["calibrate"]:
+        # python credential_store.py calibrate /path/to/credentials.json
+        print("iterations:", CredentialStore(sys.argv[2]).recalibrate())
+    else:
+        benchmark()
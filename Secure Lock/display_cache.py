@@ -0,0 +1,132 @@
+import time
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Cached renderer for the OLED.
+# Fonts are loaded once at start-up; the fitted layout and the finished
+# 1-bit frame are kept in an LRU keyed by the message text, so repeated
+# screens ("Hello..", "Incorrect", "*".."******") never touch FreeType.
+# render() is thread-safe, so several displays can share one renderer.
+
+DEFAULT_SIZES = range(24, 6, -1)
+
+
+class DisplayRenderer:
+    def __init__(self, size, font_path, sizes=DEFAULT_SIZES, cache_size=64, line_gap=2):
+        self.size = size
+        self.width, self.height = size
+        self.line_gap = line_gap
+        self.cache_size = cache_size
+        self.fonts = []
+        for s in sizes:
+            try:
+                font = ImageFont.truetype(font_path, s)
+            except Exception:
+                font = ImageFont.load_default()
+            self.fonts.append(font)
+        # Scratch surface used only for text measurement
+        self._measure = ImageDraw.Draw(Image.new("1", (1, 1)))
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def layout(self, message):
+        """Pick the largest font that fits and return (font, [(x, y, line), ...])."""
+        lines = message.split("\n") if message else [""]
+        for font in self.fonts:
+            widths = [self._measure.textlength(line, font=font) for line in lines]
+            heights = [font.getbbox(line)[3] for line in lines]
+            total_h = sum(heights) + (len(lines) - 1) * self.line_gap
+            if max(widths) <= self.width and total_h <= self.height:
+                break
+        y = (self.height - total_h) // 2
+        placed = []
+        for line, w, h in zip(lines, widths, heights):
+            placed.append(((self.width - w) // 2, y, line))
+            y += h + self.line_gap
+        return font, placed
+
+    def render(self, message):
+        with self._lock:
+            frame = self._frames.get(message)
+            if frame is not None:
+                self._frames.move_to_end(message)
+                self.hits += 1
+                return frame
+            self.misses += 1
+            font, placed = self.layout(message)
+            frame = Image.new("1", self.size)
+            draw = ImageDraw.Draw(frame)
+            for x, y, line in placed:
+                draw.text((x, y), line, font=font, fill=255)
+            self._frames[message] = frame
+            if len(self._frames) > self.cache_size:
+                self._frames.popitem(last=False)
+            return frame
+
+    def preload(self, messages):
+        for message in messages:
+            self.render(message)
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+def _render_uncached(message, size, font_path):
+    # The original update_display() body, minus the I2C write
+    img = Image.new("1", size)
+    draw = ImageDraw.Draw(img)
+    width, height = size
+    lines = message.split("\n") if message else [""]
+    for s in range(24, 6, -1):
+        try:
+            font = ImageFont.truetype(font_path, s)
+        except Exception:
+            font = ImageFont.load_default()
+        max_w = max(draw.textlength(line, font=font) for line in lines)
+        total_h = sum(font.getbbox(line)[3] for line in lines) + (len(lines) - 1) * 2
+        if max_w <= width and total_h <= height:
+            break
+    y = (height - total_h) // 2
+    draw.rectangle((0, 0, width, height), fill=0)
+    for line in lines:
+        w = draw.textlength(line, font=font)
+        draw.text(((width - w) // 2, y), line, font=font, fill=255)
+        y += font.getbbox(line)[3] + 2
+    return img
+
+
+def benchmark(font_path="/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", rounds=20):
+    size = (128, 64)
+    # A typical session: PIN typed, wrong, retyped, welcome, idle
+    session = ["Hello.."] + ["*" * n for n in range(1, 7)] + ["Incorrect", "Hello.."] \
+        + ["*" * n for n in range(1, 5)] + ["Welcome\nAdmin", "Hello.."]
+    calls = len(session) * rounds
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for message in session:
+            _render_uncached(message, size, font_path)
+    before = (time.perf_counter() - t0) / calls
+
+    t0 = time.perf_counter()
+    renderer = DisplayRenderer(size, font_path)
+    startup = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for message in session:
+            renderer.render(message)
+    after = (time.perf_counter() - t0) / calls
+
+    print(f"uncached: {before * 1e3:.3f} ms/call")
+    print(f"cached:   {after * 1e3:.3f} ms/call  (font preload {startup * 1e3:.1f} ms once, "
+          f"{renderer.hits} hits / {renderer.misses} misses)")
+    print(f"speed-up: {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
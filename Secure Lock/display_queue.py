@@ -0,0 +1,129 @@
+import time
+import threading
+
+# Single owner of the OLED.
+#
+# show() never blocks: it replaces whatever message is still waiting, and
+# one worker thread draws the newest message when it gets to it, so fast
+# typing ("*", "**", "***") costs one draw of the last state instead of
+# three queued ones, and two callers can never draw at the same time.
+# A message can be shown for `hold` seconds, after which the worker puts
+# up `then` (the idle screen by default) - unless something else has been
+# shown in the meantime, which cancels the revert.
+
+
+class DisplayQueue:
+    def __init__(self, draw, idle=None, clock=time.monotonic):
+        self.draw = draw
+        self.idle = idle
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._pending = None      # (message, hold, then)
+        self._revert = None       # (at, message)
+        self._drawing = False
+        self._stop = False
+        self._thread = None
+        self.drawn = 0
+        self.dropped = 0
+
+    # --- commands (never block) ---
+
+    def show(self, message, hold=None, then=None):
+        """Draw `message` next; after `hold` seconds revert to `then` (default: idle)."""
+        with self._cond:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (message, hold, then)
+            self._cond.notify()
+
+    def recheck(self):
+        """Re-evaluate the revert timer now, e.g. after a simulated clock jumped ahead."""
+        with self._cond:
+            self._cond.notify()
+
+    def busy(self):
+        """A message is waiting or being drawn (a pending revert does not count)."""
+        with self._cond:
+            return self._pending is not None or self._drawing
+
+    # --- worker thread ---
+
+    def _next(self):
+        # Called with the lock held; returns the message to draw, or None to stop
+        while not self._stop:
+            if self._pending is not None:
+                message, hold, then = self._pending
+                self._pending = None
+                if hold is None:
+                    self._revert = None
+                else:
+                    self._revert = (self.clock() + hold, self.idle if then is None else then)
+                return message
+            if self._revert is not None:
+                at, message = self._revert
+                now = self.clock()
+                if now >= at:
+                    self._revert = None
+                    if message is not None:
+                        return message
+                    continue
+                self._cond.wait(at - now)
+            else:
+                self._cond.wait()
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._drawing = False
+                message = self._next()
+                if message is None:
+                    return
+                self._drawing = True
+            try:
+                self.draw(message)
+            except Exception as e:
+                print("Display draw error:", e)
+            self.drawn += 1
+
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="oled", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+
+# ---------------------------
+# ========== DEMO ==========
+# ---------------------------
+
+if __name__ == "__main__":
+    shown = []
+
+    def slow_draw(message):
+        time.sleep(0.025)  # one full SSD1306 frame over I2C
+        shown.append(message)
+
+    display = DisplayQueue(slow_draw, idle="Hello..")
+    display.start()
+    t0 = time.perf_counter()
+    for n in range(1, 7):
+        display.show("*" * n)
+        time.sleep(0.005)  # typing faster than the panel can keep up
+    print(f"6 show() calls returned in {(time.perf_counter() - t0) * 1e3:.1f} ms total")
+    time.sleep(0.1)
+    display.show("Incorrect", hold=0.2)
+    time.sleep(0.3)
+    display.show("Welcome\nAdmin", hold=0.2)
+    time.sleep(0.05)
+    display.show("*")  # cancels the Welcome revert
+    time.sleep(0.3)
+    display.stop()
+    print("drawn:", shown)
+    print(f"drawn={display.drawn} dropped={display.dropped}")
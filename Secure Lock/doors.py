@@ -0,0 +1,98 @@
+import json
+from collections import namedtuple
+
+# Door configuration for one controller driving several doors.
+#
+# Each door has its own relay pin, MFRC522 (SPI bus + chip select), SSD1306
+# (I2C port + address) and Firestore collection for remote lock/unlock.
+# Everything else - credentials, card list, OTP cache, Firestore and
+# Rekognition clients, the event loop and its I/O pool - is shared by all
+# doors in the one process. The keypad, camera, exit button, buzzer and
+# vibration sensor belong to the first door.
+# A doors file is a JSON list of objects with the DoorConfig fields;
+# missing fields take the defaults below, addresses may be "0x3D" strings.
+
+DoorConfig = namedtuple("DoorConfig", ["name", "relay_pin", "reader_bus", "reader_cs",
+                                       "display_port", "display_address", "lock_events"])
+DoorConfig.__new__.__defaults__ = (0, 0, 1, 0x3C, "lockEvents")
+
+# BCM pins of the buses the readers and displays hang off; never a relay.
+# SPI0 and I2C1 are always wired, SPI1 only if a reader is on bus 1.
+SPI_PINS = {0: (7, 8, 9, 10, 11), 1: (16, 17, 18, 19, 20, 21)}
+I2C_PINS = (2, 3)
+
+
+def _int(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def load_doors(path, default, reserved_pins=()):
+    """DoorConfigs from a JSON file, or [default] when path is empty. Raises ValueError on clashes."""
+    if not path:
+        return [default]
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path}: expected a non-empty list of doors")
+    doors = []
+    for i, entry in enumerate(entries):
+        fields = {**default._asdict(), "name": f"door{i + 1}", **entry}
+        unknown = set(fields) - set(DoorConfig._fields)
+        if unknown:
+            raise ValueError(f"{path}: door {i + 1} has unknown fields {sorted(unknown)}")
+        for key in ("relay_pin", "reader_bus", "reader_cs", "display_port", "display_address"):
+            fields[key] = _int(fields[key])
+        doors.append(DoorConfig(**fields))
+    check_doors(doors, reserved_pins)
+    return doors
+
+
+def check_doors(doors, reserved_pins=()):
+    bus_pins = set(I2C_PINS) | set(SPI_PINS[0])
+    for door in doors:
+        bus_pins.update(SPI_PINS.get(door.reader_bus, ()))
+    seen = {}
+    for i, door in enumerate(doors):
+        for what, key in (("name", door.name),
+                          ("relay pin", door.relay_pin),
+                          ("reader", (door.reader_bus, door.reader_cs)),
+                          ("display", (door.display_port, door.display_address)),
+                          ("lock events", door.lock_events)):
+            other = seen.setdefault((what, key), i)
+            if other != i:
+                raise ValueError(f"doors {doors[other].name!r} and {door.name!r} share the same {what} {key}")
+        if door.relay_pin in reserved_pins:
+            raise ValueError(f"door {door.name!r}: relay pin {door.relay_pin} is already in use")
+        if door.relay_pin in bus_pins:
+            raise ValueError(f"door {door.name!r}: relay pin {door.relay_pin} is an SPI/I2C bus pin")
+
+
+class Door:
+    """One door's devices, as built by the controller."""
+
+    def __init__(self, config, relay, display, screen, poller):
+        self.config = config
+        self.name = config.name
+        self.relay = relay
+        self.display = display
+        self.screen = screen
+        self.poller = poller
+        self.watcher = None
+
+    def show(self, message, hold=None):
+        self.display.show(message, hold)
+
+    def start(self):
+        self.display.start()
+        self.relay.start()
+        if self.watcher:
+            self.watcher.start()
+
+    def stop(self):
+        if self.watcher:
+            self.watcher.stop()
+        self.relay.stop()
+        self.display.stop()
+
+    def __repr__(self):
+        return f"<Door {self.name} relay={self.config.relay_pin}>"
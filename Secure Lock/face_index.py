@@ -0,0 +1,316 @@
+import os
+import time
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # no local matching; every face goes to Rekognition
+    cv2 = None
+
+# On-device face matching in front of Rekognition.
+#
+# An SFace model (OpenCV FaceRecognizerSF, 128-d embeddings, CPU) turns
+# the face crop into a unit vector; YuNet, if present, finds the landmarks
+# to align it first. Enrolled faces are the rows of one float32 matrix,
+# also unit length, so a search is a single matrix-vector product and an
+# argmax - cosine similarity against every face at once. The best score
+# decides:
+#   >= accept   -> match, unlock without a cloud call
+#   <  reject   -> no match, without a cloud call - only for a `complete`
+#                  index, one that holds everybody in the Rekognition
+#                  collection; otherwise a low score may just be someone
+#                  enrolled in the cloud only, and goes to Rekognition
+#   in between  -> unsure, ask Rekognition as before
+# so clear faces are recognised offline too. A person may be enrolled
+# with several images (rows with the same name).
+# The index is a .npz file (names + embeddings) built by the enrolment
+# tool:
+#   python face_index.py enroll <index.npz> <models dir> <images...|dir>
+#   python face_index.py list <index.npz>
+#   python face_index.py bench
+# Images are named after the person (ssg.jpg, ssg_2.jpg) or sit in a
+# folder named after them (ssg/front.jpg).
+
+SFACE_MODEL = "face_recognition_sface_2021dec.onnx"
+YUNET_MODEL = "face_detection_yunet_2023mar.onnx"
+
+# SFace cosine scores; OpenCV's own same-person threshold is 0.363
+ACCEPT = 0.50
+REJECT = 0.30
+
+MATCH, NO_MATCH, UNSURE = "match", "no_match", "unsure"
+Match = namedtuple("Match", ["name", "score", "decision"])
+
+
+class FaceIndex:
+    def __init__(self, names=(), embeddings=None, dim=128):
+        self.names = list(names)
+        self.matrix = np.zeros((0, dim), dtype=np.float32) if embeddings is None \
+            else np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(self.names) != len(self.matrix):
+            raise ValueError(f"{len(self.names)} names for {len(self.matrix)} embeddings")
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, embedding):
+        v = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        self.matrix = np.vstack([self.matrix, v / np.linalg.norm(v)])
+        self.names.append(name)
+
+    def remove(self, name):
+        keep = [i for i, n in enumerate(self.names) if n != name]
+        self.names = [self.names[i] for i in keep]
+        self.matrix = self.matrix[keep]
+        return len(keep)
+
+    def search(self, embedding, k=1):
+        """[(name, cosine score)] of the k closest enrolled faces, best first."""
+        if not self.names:
+            return []
+        scores = self.matrix @ np.asarray(embedding, dtype=np.float32)
+        if k == 1:
+            i = int(scores.argmax())
+            return [(self.names[i], float(scores[i]))]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.names[i], float(scores[i])) for i in top]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["names"].tolist(), data["embeddings"])
+
+    def save(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(prefix=".faces.", suffix=".npz", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, names=np.array(self.names, dtype=str), embeddings=self.matrix)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+class SFaceEmbedder:
+    def __init__(self, model_dir):
+        self.recognizer = None
+        self.detector = None
+        if cv2 is None or not hasattr(cv2, "FaceRecognizerSF"):
+            print("SFaceEmbedder: OpenCV FaceRecognizerSF not available, local face matching off")
+            return
+        model = os.path.join(model_dir, SFACE_MODEL)
+        if not os.path.exists(model):
+            print("SFaceEmbedder: no model at", model)
+            return
+        self.recognizer = cv2.FaceRecognizerSF.create(model, "")
+        yunet = os.path.join(model_dir, YUNET_MODEL)
+        if os.path.exists(yunet):
+            self.detector = cv2.FaceDetectorYN.create(yunet, "", (320, 320))
+
+    @property
+    def enabled(self):
+        return self.recognizer is not None
+
+    def embed(self, image, margin=0.0):
+        """
+        Unit embedding of the face in an RGB image, or None. `margin` is the
+        padding the image was cropped with (see FacePrefilter.crop), used to
+        find the face when YuNet is not available.
+        """
+        bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        h, w = bgr.shape[:2]
+        aligned = None
+        if self.detector is not None:
+            self.detector.setInputSize((w, h))
+            _, faces = self.detector.detect(bgr)
+            if faces is None:
+                return None
+            face = max(faces, key=lambda f: f[2] * f[3])
+            aligned = self.recognizer.alignCrop(bgr, face)
+        else:
+            # Unaligned: the box the crop was padded around, squashed to 112x112
+            mx, my = int(w * margin / (1 + 2 * margin)), int(h * margin / (1 + 2 * margin))
+            aligned = cv2.resize(bgr[my:h - my, mx:w - mx], (112, 112), interpolation=cv2.INTER_AREA)
+        v = self.recognizer.feature(aligned).reshape(-1).astype(np.float32)
+        return v / np.linalg.norm(v)
+
+
+class FaceMatcher:
+    def __init__(self, embedder, index, accept=ACCEPT, reject=REJECT, complete=False):
+        if reject > accept:
+            raise ValueError(f"reject bound {reject} is above accept bound {accept}")
+        self.embedder = embedder
+        self.index = index
+        self.accept = accept
+        self.reject = reject
+        self.complete = complete  # the index holds every enrolled person: low scores may refuse
+        self.counts = {MATCH: 0, NO_MATCH: 0, UNSURE: 0}
+
+    @classmethod
+    def from_files(cls, index_path, model_dir, **bounds):
+        """Matcher for an enrolled index, or None if there is none or no model to use it with."""
+        if not os.path.exists(index_path):
+            return None
+        embedder = SFaceEmbedder(model_dir)
+        if not embedder.enabled:
+            return None
+        index = FaceIndex.load(index_path)
+        matcher = cls(embedder, index, **bounds)
+        print(f"Local face index: {len(index)} faces of {len(set(index.names))} people, "
+              f"{'refusing' if matcher.complete else 'asking Rekognition about'} scores below {matcher.reject}")
+        return matcher
+
+    def decide(self, score):
+        if score >= self.accept:
+            return MATCH
+        if score < self.reject and self.complete:
+            return NO_MATCH
+        return UNSURE
+
+    def match(self, image, margin=0.0, timings=None):
+        """Match for the face in `image`; UNSURE when there is no face or nobody enrolled."""
+        timings = {} if timings is None else timings
+        t0 = time.perf_counter()
+        embedding = self.embedder.embed(image, margin)
+        timings["embed"] = (time.perf_counter() - t0) * 1000
+        best = None
+        if embedding is not None:
+            t0 = time.perf_counter()
+            best = self.index.search(embedding)
+            timings["local"] = (time.perf_counter() - t0) * 1000
+        if not best:
+            result = Match(None, 0.0, UNSURE)
+        else:
+            name, score = best[0]
+            result = Match(name, score, self.decide(score))
+        self.counts[result.decision] += 1
+        timings["score"] = round(result.score, 3)
+        return result
+
+
+# ---------------------------
+# ========== ENROLMENT ==========
+# ---------------------------
+
+IMAGE_TYPES = (".jpg", ".jpeg", ".png")
+
+
+def _person(path, root=None):
+    # ssg/front.jpg -> ssg when enrolling a folder; ssg_2.jpg -> ssg
+    if root is not None and os.path.dirname(os.path.relpath(path, root)):
+        return os.path.basename(os.path.dirname(os.path.abspath(path)))
+    return os.path.splitext(os.path.basename(path))[0].split("_")[0]
+
+
+def _images(args):
+    for arg in args:
+        if os.path.isdir(arg):
+            for folder, _, files in sorted(os.walk(arg)):
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_TYPES):
+                        yield os.path.join(folder, name), _person(os.path.join(folder, name), arg)
+        else:
+            yield arg, _person(arg)
+
+
+def enroll(index_path, model_dir, sources):
+    from PIL import Image
+    from face_prefilter import FacePrefilter
+
+    embedder = SFaceEmbedder(model_dir)
+    if not embedder.enabled:
+        raise SystemExit(f"need {SFACE_MODEL} in {model_dir}")
+    prefilter = FacePrefilter()
+    index = FaceIndex.load(index_path) if os.path.exists(index_path) else FaceIndex()
+    added = 0
+    for path, name in _images(sources):
+        frame = np.asarray(Image.open(path).convert("RGB"))
+        image, margin = frame, 0.0
+        if prefilter.enabled:
+            boxes = prefilter.detect(frame)
+            if boxes:
+                image, margin = prefilter.crop(frame, boxes[0]), prefilter.margin
+        embedding = embedder.embed(image, margin)
+        if embedding is None:
+            print(f"{path}: no face found, skipped")
+            continue
+        if len(index):
+            other, score = index.search(embedding)[0]
+            if other != name and score >= ACCEPT:
+                print(f"{path}: warning, looks like {other} ({score:.2f})")
+        index.add(name, embedding)
+        added += 1
+        print(f"{path}: enrolled as {name}")
+    index.save(index_path)
+    print(f"{index_path}: {added} added, {len(index)} faces of {len(set(index.names))} people")
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+def _search_legacy(index, embedding):
+    # One cosine per enrolled face in a Python loop
+    best, best_score = None, -1.0
+    for name, row in zip(index.names, index.matrix):
+        score = float(np.dot(row, embedding) / (np.linalg.norm(row) * np.linalg.norm(embedding)))
+        if score > best_score:
+            best, best_score = name, score
+    return best, best_score
+
+
+def benchmark(sizes=(10, 1000, 10000), dim=128, queries=200):
+    rng = np.random.default_rng(0)
+    print(f"{'faces':>7}{'vectorised us':>15}{'loop us':>10}{'index MB':>10}")
+    for n in sizes:
+        embeddings = rng.normal(size=(n, dim)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        index = FaceIndex([f"person{i}" for i in range(n)], embeddings)
+        # Queries are noisy copies of enrolled faces
+        targets = rng.integers(0, n, queries)
+        qs = embeddings[targets] + rng.normal(scale=0.05, size=(queries, dim)).astype(np.float32)
+        qs /= np.linalg.norm(qs, axis=1, keepdims=True)
+
+        t0 = time.perf_counter()
+        found = [index.search(q)[0][0] for q in qs]
+        fast = (time.perf_counter() - t0) / queries
+        assert found == [index.names[i] for i in targets]
+
+        m = min(queries, max(5, 20000 // n))
+        t0 = time.perf_counter()
+        legacy = [_search_legacy(index, q)[0] for q in qs[:m]]
+        slow = (time.perf_counter() - t0) / m
+        assert legacy == found[:m]
+        print(f"{n:>7}{fast * 1e6:>15.1f}{slow * 1e6:>10.0f}{index.matrix.nbytes / 1e6:>10.2f}")
+
+    for complete in (False, True):
+        matcher = FaceMatcher(None, index, complete=complete)
+        print(f"decisions ({'complete' if complete else 'partial'} index):",
+              ", ".join(f"{s:.2f}->{matcher.decide(s)}" for s in (0.8, 0.45, 0.1)))
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    if args[:1] == ["enroll"] and len(args) >= 4:
+        enroll(args[1], args[2], args[3:])
+    elif args[:1] == ["list"] and len(args) == 2:
+        index = FaceIndex.load(args[1])
+        for name in sorted(set(index.names)):
+            print(f"{name}: {index.names.count(name)} images")
+    elif args[:1] == ["bench"] or not args:
+        benchmark()
+    else:
+        print("usage: face_index.py enroll <index.npz> <models dir> <images...|dir> | list <index.npz> | bench")
@@ -0,0 +1,260 @@
+import io
+import time
+
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:  # prefilter becomes a pass-through
+    cv2 = None
+
+# CPU-only face-presence check that runs before anything is uploaded to
+# Rekognition. Detection runs on a small grayscale copy of the frame with
+# an OpenCV Haar cascade; frames without a face are rejected locally, and
+# for frames with one only the (padded) face crop is encoded and sent.
+# The payload is then shrunk to at most `max_side` pixels on its longest
+# side (optionally grayscale) and re-encoded at `jpeg_quality`: on the
+# Pi's uplink the upload, not the search, is most of the recognition
+# time, and Rekognition needs far fewer pixels than the sensor gives it.
+# Pick the values with the sweep below (python face_prefilter.py --sweep).
+
+DETECT_WIDTH = 320
+CROP_MARGIN = 0.4  # extra context around the box, as a fraction of its size
+MAX_SIDE = 480     # longest side of the uploaded JPEG (None = as captured)
+JPEG_QUALITY = 80
+
+
+class FacePrefilter:
+    def __init__(self, cascade_path=None, detect_width=DETECT_WIDTH, margin=CROP_MARGIN,
+                 min_face=40, max_side=MAX_SIDE, jpeg_quality=JPEG_QUALITY, grayscale=False):
+        self.detect_width = detect_width
+        self.margin = margin
+        self.min_face = min_face
+        self.max_side = max_side
+        self.jpeg_quality = jpeg_quality
+        self.grayscale = grayscale
+        self.cascade = None
+        if cv2 is None or not hasattr(cv2, "CascadeClassifier"):
+            # Haar cascades are not in the OpenCV 5 main package
+            print("FacePrefilter: OpenCV Haar cascades not available, sending full frames")
+            return
+        if cascade_path is None:
+            cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            print("FacePrefilter: could not load", cascade_path)
+            self.cascade = None
+
+    @property
+    def enabled(self):
+        return self.cascade is not None
+
+    def detect(self, frame):
+        """Face boxes (x, y, w, h) in frame coordinates, largest first."""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.detect_width / w)
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        min_side = max(12, int(self.min_face * scale))
+        boxes = self.cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                              minSize=(min_side, min_side))
+        boxes = [tuple(int(v / scale) for v in box) for box in boxes]
+        return sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)
+
+    def crop(self, frame, box):
+        h, w = frame.shape[:2]
+        x, y, bw, bh = box
+        mx, my = int(bw * self.margin), int(bh * self.margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(w, x + bw + mx), min(h, y + bh + my)
+        return frame[y0:y1, x0:x1]
+
+    def encode(self, array):
+        image = Image.fromarray(array)
+        if self.grayscale:
+            image = image.convert("L")  # before resizing: a third of the pixels to scale
+        if self.max_side and max(image.size) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side), Image.BILINEAR, reducing_gap=2.0)
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=self.jpeg_quality)
+        return buf.getvalue()
+
+    def prepare(self, frame, timings=None):
+        """
+        JPEG bytes to upload, or None if no face is in the frame.
+        Stage times (ms) and the face count are added to `timings`.
+        """
+        timings = {} if timings is None else timings
+        if not self.enabled:
+            t0 = time.perf_counter()
+            data = self.encode(frame)
+            timings["encode"] = (time.perf_counter() - t0) * 1000
+            timings["bytes"] = len(data)
+            return data
+
+        t0 = time.perf_counter()
+        boxes = self.detect(frame)
+        timings["detect"] = (time.perf_counter() - t0) * 1000
+        timings["faces"] = len(boxes)
+        if not boxes:
+            return None
+        timings["box"] = boxes[0]
+
+        t0 = time.perf_counter()
+        data = self.encode(self.crop(frame, boxes[0]))
+        timings["encode"] = (time.perf_counter() - t0) * 1000
+        timings["bytes"] = len(data)
+        return data
+
+
+def format_timings(timings):
+    parts = [f"{k}={v:.1f}ms" for k, v in timings.items() if isinstance(v, float)]
+    parts += [f"{k}={v}" for k, v in timings.items() if not isinstance(v, float)]
+    return " ".join(parts)
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+SWEEP_SIDES = (None, 640, 480, 320, 240, 160)
+SWEEP_QUALITIES = (90, 80, 65, 50)
+
+
+REKOGNITION_MIN_FACE = 40  # px; smaller faces are not detected by Rekognition
+
+
+def local_score(has_face):
+    """
+    Local stand-in for match similarity, for sweeping without AWS: PSNR
+    (dB) of the decoded payload, scaled back up, against the crop - and 0
+    if the crop had a face that the cascade no longer finds at
+    REKOGNITION_MIN_FACE px or more in the payload.
+    """
+    import numpy as np
+    detector = FacePrefilter(detect_width=1 << 16, min_face=REKOGNITION_MIN_FACE) if has_face else None
+
+    def score(reference):
+        ref = np.asarray(Image.fromarray(reference).convert("L"), dtype=np.float64)
+
+        def scorer(data):
+            got = Image.open(io.BytesIO(data))
+            if detector and detector.enabled and not detector.detect(np.asarray(got.convert("RGB"))):
+                return 0.0
+            got = got.convert("L").resize((ref.shape[1], ref.shape[0]), Image.BILINEAR)
+            mse = np.mean((np.asarray(got, dtype=np.float64) - ref) ** 2)
+            return 99.0 if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+        return scorer
+    return score
+
+
+def rekognition_score(client, collection_id):
+    """Similarity of the best match in the collection (0 when nobody matches)."""
+    def score(data):
+        matches = client.search_faces_by_image(CollectionId=collection_id, Image={"Bytes": data},
+                                               MaxFaces=1, FaceMatchThreshold=0).get("FaceMatches", [])
+        return matches[0]["Similarity"] if matches else 0.0
+    return score
+
+
+def sweep(crops, score, threshold, uplink_kbps=1000, sides=SWEEP_SIDES, qualities=SWEEP_QUALITIES):
+    """
+    Encode every crop at every size/quality/colour setting and score it.
+    `score(reference_crop)` returns a function of the JPEG bytes. Prints a
+    table and returns the setting with the smallest mean payload whose
+    worst score still reaches `threshold`.
+    """
+    scorers = [score(crop) for crop in crops]
+    rows = []
+    for grayscale in (False, True):
+        for side in sides:
+            for quality in qualities:
+                prefilter = FacePrefilter(max_side=side, jpeg_quality=quality, grayscale=grayscale)
+                sizes, times, scores = [], [], []
+                for crop, scorer in zip(crops, scorers):
+                    t0 = time.perf_counter()
+                    data = prefilter.encode(crop)
+                    times.append((time.perf_counter() - t0) * 1000)
+                    sizes.append(len(data))
+                    scores.append(scorer(data))
+                rows.append(((side, quality, grayscale), sum(sizes) / len(sizes), sum(times) / len(times),
+                             min(scores)))
+
+    print(f"{'max side':>9}{'quality':>8}{'gray':>6}{'bytes':>9}{'encode ms':>11}{'upload ms':>11}{'min score':>11}")
+    for (side, quality, grayscale), size, encode_ms, worst in rows:
+        upload_ms = size * 8 / uplink_kbps
+        print(f"{side or 'full':>9}{quality:>8}{'y' if grayscale else '':>6}{size:>9.0f}{encode_ms:>11.1f}"
+              f"{upload_ms:>11.1f}{worst:>11.1f}")
+    passing = [row for row in rows if row[3] >= threshold]
+    if not passing:
+        print(f"no setting keeps every image at {threshold}")
+        return None
+    best = min(passing, key=lambda row: row[1])
+    (side, quality, grayscale), size, _, _ = best
+    full = rows[0][1]
+    print(f"smallest payload at score >= {threshold}: max_side={side} jpeg_quality={quality} "
+          f"grayscale={grayscale} ({size:.0f} bytes, 1/{full / size:.0f} of the full-size q90 crop)")
+    return best[0]
+
+
+def synthetic_frame(size=(1640, 1232), seed=0):
+    """Textured stand-in for a still when no images are given (no face in it)."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    w, h = size
+    y, x = np.mgrid[0:h, 0:w]
+    base = 128 + 60 * np.sin(x / 37.0) * np.cos(y / 53.0)
+    frame = np.stack([base + 20 * np.sin(y / 11.0), base, base - 20 * np.cos(x / 17.0)], axis=2)
+    frame += rng.normal(0, 6, frame.shape)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+if __name__ == "__main__":
+    # python face_prefilter.py [images...] [--sweep] [--collection ID] [--uplink-kbps N]
+    # With --collection the sweep scores payloads by real Rekognition
+    # similarity (needs boto3 and AWS credentials in the environment) and
+    # keeps SIMILARITY_THRESHOLD; without it, by PSNR against the crop,
+    # provided the face is still detectable in the payload.
+    import sys
+    import numpy as np
+
+    args = sys.argv[1:]
+    collection = uplink = None
+    if "--collection" in args:
+        i = args.index("--collection")
+        collection = args[i + 1]
+        del args[i:i + 2]
+    if "--uplink-kbps" in args:
+        i = args.index("--uplink-kbps")
+        uplink = float(args[i + 1])
+        del args[i:i + 2]
+    do_sweep = "--sweep" in args
+    paths = [a for a in args if a != "--sweep"]
+
+    prefilter = FacePrefilter()
+    frames = [np.asarray(Image.open(p).convert("RGB")) for p in paths] or [synthetic_frame()]
+    reference = FacePrefilter(max_side=None, jpeg_quality=90)
+    crops = []
+    faces = True
+    for frame in frames:
+        timings = {}
+        data = prefilter.prepare(frame, timings)
+        full = len(reference.encode(frame))
+        sent = len(data) if data else 0
+        print(f"{frame.shape[1]}x{frame.shape[0]}: {format_timings(timings)}  "
+              f"upload {sent} of {full} bytes")
+        box = timings.get("box")
+        crops.append(prefilter.crop(frame, box) if box else frame)
+        faces = faces and bool(box)
+
+    if do_sweep:
+        if collection:
+            import boto3
+            client = boto3.client("rekognition", region_name="ap-south-1")
+            sweep(crops, lambda crop: rekognition_score(client, collection), threshold=75,
+                  uplink_kbps=uplink or 1000)
+        else:
+            if not faces:
+                print("no face found in some images: scoring whole frames by PSNR only")
+            sweep(crops, local_score(faces), threshold=30.0, uplink_kbps=uplink or 1000)
@@ -0,0 +1,149 @@
+import os
+import json
+import threading
+
+# Fingerprint ID <-> user name database.
+#
+# Loaded once into two indexes (id -> name, lower-case name -> id) plus a
+# bitmap of used sensor slots, so a match resolves its name without disk
+# access and the next free ID is a couple of integer operations.
+# Changes are appended to a JSON-lines journal and fsync'd; a torn last
+# line after a power cut is ignored on load. When the journal has grown
+# well past the live entries it is compacted (rewritten to a temp file and
+# renamed over the old one). A legacy "name:id" finger_db.txt is imported
+# the first time.
+
+FIRST_ID = 1
+CAPACITY = 255
+
+
+class FingerprintStore:
+    def __init__(self, journal_path="finger_db.journal", legacy_path="finger_db.txt",
+                 capacity=CAPACITY, compact_slack=64):
+        self.journal_path = journal_path
+        self.legacy_path = legacy_path
+        self.capacity = capacity
+        self.compact_slack = compact_slack
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._by_name = {}
+        self._used = (1 << FIRST_ID) - 1  # bit n set = slot n taken; slot 0 is never used
+        self._records = 0
+        self._journal = None
+        self._load()
+
+    # --- loading ---
+
+    def _load(self):
+        if os.path.exists(self.journal_path):
+            torn = False
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        print("finger_store: ignoring torn journal line")
+                        torn = True
+                        continue
+                    self._replay(rec)
+                    self._records += 1
+            if torn:
+                self.compact()  # rewrite without the broken tail before appending
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, "r") as f:
+                for line in f:
+                    if ':' in line:
+                        # rsplit so names containing ':' survive
+                        name, id_str = line.strip().rsplit(":", 1)
+                        self._set(int(id_str), name)
+            self.compact()
+            print(f"finger_store: imported {len(self._by_id)} users from {self.legacy_path}")
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a")
+
+    def _replay(self, rec):
+        if rec.get("op") == "add":
+            self._set(int(rec["id"]), rec["name"])
+        elif rec.get("op") == "del":
+            self._unset(int(rec["id"]))
+
+    def _set(self, fid, name):
+        self._unset(fid)
+        self._by_id[fid] = name
+        self._by_name[name.lower()] = fid
+        self._used |= 1 << fid
+
+    def _unset(self, fid):
+        name = self._by_id.pop(fid, None)
+        if name is not None:
+            if self._by_name.get(name.lower()) == fid:
+                del self._by_name[name.lower()]
+            self._used &= ~(1 << fid)
+
+    # --- journal ---
+
+    def _append(self, rec):
+        self._journal.write(json.dumps(rec) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._records += 1
+        if self._records > 2 * len(self._by_id) + self.compact_slack:
+            self.compact()
+
+    def compact(self):
+        with self._lock:
+            tmp = self.journal_path + ".tmp"
+            with open(tmp, "w") as f:
+                for fid in sorted(self._by_id):
+                    f.write(json.dumps({"op": "add", "id": fid, "name": self._by_id[fid]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._journal:
+                self._journal.close()
+            os.replace(tmp, self.journal_path)
+            self._journal = open(self.journal_path, "a")
+            self._records = len(self._by_id)
+
+    # --- API ---
+
+    def name_of(self, fid, default=None):
+        return self._by_id.get(fid, default)
+
+    def id_of(self, name):
+        return self._by_name.get(name.lower())
+
+    def __contains__(self, fid):
+        return fid in self._by_id
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def items(self):
+        with self._lock:
+            return sorted(self._by_id.items())
+
+    def next_free_id(self):
+        """Lowest free slot, or -1 when the sensor is full."""
+        with self._lock:
+            used = self._used
+            fid = ((used + 1) & ~used).bit_length() - 1
+            return fid if fid <= self.capacity else -1
+
+    def add(self, name, fid):
+        with self._lock:
+            self._set(fid, name)
+            self._append({"op": "add", "id": fid, "name": name})
+
+    def remove(self, fid):
+        with self._lock:
+            if fid not in self._by_id:
+                return False
+            self._unset(fid)
+            self._append({"op": "del", "id": fid})
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
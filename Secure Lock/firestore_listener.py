@@ -0,0 +1,174 @@
+import time
+import threading
+
+# Push-based watcher for the newest document in a Firestore collection
+# (lockEvents by default).
+#
+# "listen" mode keeps an on_snapshot() stream open, so a change is applied
+# as soon as Firestore pushes it and documents are only read when they
+# change. A supervisor thread re-opens the stream with exponential backoff
+# if it dies; after LISTEN_FAILURES_BEFORE_POLL failed attempts it polls
+# (the old behaviour) until a listener can be opened again.
+# "poll" mode is the old one-query-per-interval loop.
+
+LISTEN_FAILURES_BEFORE_POLL = 3
+
+
+class LockEventWatcher:
+    def __init__(self, db, on_change, collection="lockEvents", field="locked",
+                 order_field="timestamp", mode="listen", poll_interval=1.0,
+                 health_interval=5.0, max_backoff=60.0):
+        self.db = db
+        self.on_change = on_change
+        self.collection = collection
+        self.field = field
+        self.order_field = order_field
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.health_interval = health_interval
+        self.max_backoff = max_backoff
+        self._watch = None
+        self._last_key = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.reconnects = 0
+        self.snapshots = 0
+        self.polls = 0
+
+    def _query(self):
+        return self.db.collection(self.collection) \
+            .order_by(self.order_field, direction="DESCENDING") \
+            .limit(1)
+
+    def _apply(self, docs):
+        # Deduplicate on (doc id, update time) so a re-opened stream or a
+        # poll that sees the same document does not re-fire on_change.
+        doc = docs[0] if docs else None
+        key = (doc.id, getattr(doc, "update_time", None)) if doc else None
+        with self._lock:
+            if key == self._last_key:
+                return
+            self._last_key = key
+        value = doc.to_dict().get(self.field) if doc else None
+        try:
+            self.on_change(value, doc.id if doc else None)
+        except Exception as e:
+            print("LockEventWatcher on_change error:", e)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        self.snapshots += 1
+        self._apply(list(docs))
+
+    # --- listen mode ---
+
+    def _open_listener(self):
+        self._close_listener()
+        self._watch = self._query().on_snapshot(self._on_snapshot)
+
+    def _close_listener(self):
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                pass
+            self._watch = None
+
+    def _listener_alive(self):
+        return self._watch is not None and getattr(self._watch, "is_active", True)
+
+    # --- poll mode ---
+
+    def poll_once(self):
+        self.polls += 1
+        self._apply(list(self._query().stream()))
+
+    def _poll_for(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            try:
+                self.poll_once()
+            except Exception as e:
+                print("LockEventWatcher poll error:", e)
+            self._stop.wait(self.poll_interval)
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            if self.mode == "poll":
+                self._poll_for(self.poll_interval)
+                continue
+
+            if self._listener_alive():
+                failures = 0
+                self._stop.wait(self.health_interval)
+                continue
+
+            try:
+                if self._watch is not None:
+                    self.reconnects += 1
+                    print("LockEventWatcher: listener down, reconnecting")
+                self._open_listener()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                backoff = min(self.max_backoff, 2 ** failures)
+                print(f"LockEventWatcher listen error ({failures}):", e)
+                if failures >= LISTEN_FAILURES_BEFORE_POLL:
+                    # Keep the lock controllable by polling until the
+                    # listener can be opened again
+                    self._poll_for(backoff)
+                else:
+                    self._stop.wait(backoff)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lock-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._close_listener()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+
+# ---------------------------
+# ========== DEMO / BENCHMARK ==========
+# ---------------------------
+
+def benchmark(unlocks=20):
+    """Remote-unlock latency and document reads, listen vs poll, on the in-process fake."""
+    from sim_firestore import FakeFirestore, SERVER_TIMESTAMP
+
+    for mode in ("listen", "poll"):
+        db = FakeFirestore()
+        db.collection("lockEvents").document("e0").set({"locked": True, "timestamp": SERVER_TIMESTAMP})
+        applied = threading.Event()
+        watcher = LockEventWatcher(db, lambda value, doc_id, applied=applied: applied.set(), mode=mode,
+                                   poll_interval=1.0, health_interval=0.5)
+        watcher.start()
+        applied.wait(2)
+        time.sleep(0.2)
+        latencies = []
+        reads0 = db.reads
+        t_start = time.monotonic()
+        for i in range(unlocks):
+            applied.clear()
+            t0 = time.monotonic()
+            db.collection("lockEvents").document(f"e{i + 1}").set({"locked": i % 2 == 0, "timestamp": SERVER_TIMESTAMP})
+            applied.wait(5)
+            latencies.append(time.monotonic() - t0)
+            if i == unlocks // 2 and mode == "listen":
+                db.drop_listeners()  # lost connection half way through
+                time.sleep(0.6)
+        elapsed = time.monotonic() - t_start
+        watcher.stop()
+        latencies.sort()
+        print(f"{mode:6s}: p50={latencies[len(latencies) // 2] * 1e3:8.2f} ms  "
+              f"max={latencies[-1] * 1e3:8.2f} ms  reads={db.reads - reads0} over {elapsed:.1f} s  "
+              f"reconnects={watcher.reconnects}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,169 @@
+import time
+import queue
+import threading
+from collections import namedtuple
+
+# Interrupt-driven GPIO events.
+# Edges are caught by GPIO.add_event_detect, debounced per pin, stamped
+# with time.monotonic_ns() and handed to a dispatcher thread ("lane").
+# Handlers on the same lane run one after another, so a slow handler
+# only holds up its own lane. A lane can instead be bound to an event
+# loop (bind_lane), in which case events are posted straight to it.
+
+PinEvent = namedtuple("PinEvent", ["pin", "level", "timestamp_ns"])
+
+_STOP = object()
+
+
+class _PostLane:
+    # Queue look-alike that hands events to a thread-safe post(fn, *args)
+    def __init__(self, post):
+        self.post = post
+
+    def put_nowait(self, item):
+        if item is not _STOP:
+            handler, event = item
+            self.post(handler, event)
+
+    put = put_nowait
+
+
+class EdgeEventEngine:
+    def __init__(self, gpio, clock=time.monotonic_ns, queue_size=256):
+        self.gpio = gpio
+        self.clock = clock
+        self.queue_size = queue_size
+        self._watches = {}
+        self._lanes = {}
+        self._threads = []
+        self.dispatched = 0
+        self.debounced = 0
+        self.dropped = 0
+
+    def bind_lane(self, lane, post):
+        """Deliver this lane's events through post(handler, event), e.g. LockRuntime.post."""
+        self._lanes[lane] = _PostLane(post)
+        for w in self._watches.values():
+            if w["lane_name"] == lane:
+                w["lane"] = self._lanes[lane]
+
+    def watch(self, pin, edge, handler, debounce_ms=0, lane="main"):
+        if lane not in self._lanes:
+            self._lanes[lane] = queue.Queue(maxsize=self.queue_size)
+        self._watches[pin] = {
+            "handler": handler,
+            "debounce_ns": int(debounce_ms * 1_000_000),
+            "last_ns": None,
+            "lane": self._lanes[lane],
+            "lane_name": lane,
+        }
+        try:
+            self.gpio.remove_event_detect(pin)
+        except RuntimeError:
+            pass  # no event detect previously
+        self.gpio.add_event_detect(pin, edge, callback=self._on_edge)
+
+    def unwatch(self, pin):
+        if self._watches.pop(pin, None) is not None:
+            try:
+                self.gpio.remove_event_detect(pin)
+            except RuntimeError:
+                pass
+
+    def _on_edge(self, pin):
+        # Runs in the GPIO library's callback thread: keep it short.
+        now = self.clock()
+        w = self._watches.get(pin)
+        if w is None:
+            return
+        last = w["last_ns"]
+        if last is not None and now - last < w["debounce_ns"]:
+            self.debounced += 1
+            return
+        w["last_ns"] = now
+        try:
+            w["lane"].put_nowait((w["handler"], PinEvent(pin, self.gpio.input(pin), now)))
+        except queue.Full:
+            self.dropped += 1
+
+    def _dispatch(self, lane_queue):
+        while True:
+            item = lane_queue.get()
+            if item is _STOP:
+                return
+            handler, event = item
+            try:
+                handler(event)
+            except Exception as e:
+                print(f"GPIO event handler error (pin {event.pin}):", e)
+            self.dispatched += 1
+
+    def start(self, foreground_lane=None):
+        """
+        Start a dispatcher thread for every lane except foreground_lane,
+        which the caller then runs itself with run().
+        """
+        for name, lane_queue in self._lanes.items():
+            if name == foreground_lane or isinstance(lane_queue, _PostLane):
+                continue
+            t = threading.Thread(target=self._dispatch, args=(lane_queue,), name=f"gpio-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def run(self, lane="main"):
+        self._dispatch(self._lanes[lane])
+
+    def stop(self):
+        for pin in list(self._watches):
+            self.unwatch(pin)
+        for lane_queue in self._lanes.values():
+            lane_queue.put(_STOP)
+        for t in self._threads:
+            t.join(timeout=1)
+        self._threads = []
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+def benchmark(presses=2000):
+    """Edge-to-handler latency against the simulated pin backend."""
+    from sim_gpio import SimulatedGPIO
+
+    gpio = SimulatedGPIO()
+    gpio.setup(23, gpio.IN, pull_up_down=gpio.PUD_UP)
+    engine = EdgeEventEngine(gpio)
+    latencies = []
+    handled = threading.Semaphore(0)
+
+    def on_press(event):
+        latencies.append(time.monotonic_ns() - event.timestamp_ns)
+        handled.release()
+
+    engine.watch(23, gpio.FALLING, on_press)
+    engine.start()
+    for _ in range(presses):
+        gpio.pulse(23, active=gpio.LOW)
+        handled.acquire()
+    engine.stop()
+
+    latencies.sort()
+
+    def us(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] / 1000
+
+    print(f"{presses} presses  p50={us(0.50):.1f}us  p95={us(0.95):.1f}us  p99={us(0.99):.1f}us  max={latencies[-1] / 1000:.1f}us")
+
+    # Idle cost: with nothing happening the dispatcher is parked on the queue.
+    engine = EdgeEventEngine(gpio)
+    engine.watch(23, gpio.FALLING, on_press)
+    engine.start()
+    cpu0 = time.process_time()
+    time.sleep(1.0)
+    print(f"idle CPU over 1 s: {(time.process_time() - cpu0) * 1000:.2f} ms")
+    engine.stop()
+
+
+if __name__ == "__main__":
+    benchmark()
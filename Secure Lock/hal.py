@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+
+# Hardware abstraction for the lock controller.
+#
+# The controller gets its pins, RFID reader, OLED, R503 serial port,
+# camera, clock and cloud clients from `hw` instead of importing the Pi
+# libraries directly. SECURE_LOCK_HAL selects the backend:
+#   pi  - the real devices (default)
+#   sim - simulated devices on a virtual clock (see sim_harness.py)
+# Setting SECURE_LOCK_RECORD=<path> writes every input the controller sees
+# to a trace file that sim_harness.py can replay.
+
+BACKEND = os.getenv("SECURE_LOCK_HAL", "pi")
+RECORD_PATH = os.getenv("SECURE_LOCK_RECORD")
+
+
+class SystemClock:
+    monotonic = staticmethod(time.monotonic)
+    monotonic_ns = staticmethod(time.monotonic_ns)
+    time = staticmethod(time.time)
+
+
+class TraceRecorder:
+    """Appends "<seconds> <kind> [args]" lines, timed from when recording started."""
+
+    def __init__(self, path, clock):
+        self.clock = clock
+        self.start = clock.monotonic()
+        self._file = open(path, "a", buffering=1)
+
+    def __call__(self, kind, *args):
+        t = self.clock.monotonic() - self.start
+        self._file.write(" ".join([f"{t:.3f}", kind] + [str(a) for a in args]) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class _Hardware:
+    name = None
+    loop_factory = None
+
+    def __init__(self):
+        self.recorder = TraceRecorder(RECORD_PATH, self.clock) if RECORD_PATH else None
+
+    def record(self, kind, *args):
+        if self.recorder:
+            self.recorder(kind, *args)
+
+
+class PiHardware(_Hardware):
+    name = "pi"
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        from botocore.exceptions import ClientError
+        self.GPIO = GPIO
+        self.ClientError = ClientError
+        self.clock = SystemClock()
+        super().__init__()
+
+    def rfid_reader(self, bus=0, cs=0):
+        sys.path.append('/home/techsharks/MFRC522-python')
+        from mfrc522 import MFRC522
+        from mfrc522_fast import FastMFRC522
+        return FastMFRC522.from_reader(MFRC522(bus=bus, device=cs))
+
+    def oled(self, port, address):
+        from luma.core.interface.serial import i2c
+        from luma.oled.device import ssd1306
+        return ssd1306(i2c(port=port, address=address))
+
+    def serial_port(self, port):
+        return port
+
+    def camera_source(self):
+        from camera_service import Picamera2Source
+        return Picamera2Source()
+
+    def firestore(self, service_account_path):
+        sys.path.append('/home/techsharks/firebase_lib')
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        if not os.path.exists(service_account_path):
+            raise FileNotFoundError(f"Firebase service account JSON not found at {service_account_path}")
+        firebase_admin.initialize_app(credentials.Certificate(service_account_path))
+        return firestore.client()
+
+    def rekognition(self, region, access_key, secret_key):
+        import boto3
+        return boto3.client(
+            'rekognition',
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key
+        )
+
+
+class SimHardware(_Hardware):
+    """Simulated devices; the harness drives them through the attributes set here."""
+
+    name = "sim"
+
+    def __init__(self):
+        from sim_clock import VirtualClock, VirtualTimeLoop
+        from sim_gpio import SimulatedGPIO
+        from sim_rekognition import ClientError
+        self.GPIO = SimulatedGPIO()
+        self.ClientError = ClientError
+        self.clock = VirtualClock()
+        self.busy_checks = []  # the harness adds "work in flight" tests here
+        self.loop_factory = lambda: VirtualTimeLoop(self.clock, busy=lambda: any(f() for f in self.busy_checks))
+        self.rfid = self.display = self.fingerprint = self.camera = self.db = self.faces = None
+        self.readers = {}   # (bus, cs) -> FakeMFRC522SPI; rfid is the first one
+        self.displays = {}  # (port, address) -> SimSSD1306; display is the first one
+        super().__init__()
+
+    def rfid_reader(self, bus=0, cs=0):
+        from sim_rfid import FakeMFRC522SPI
+        from mfrc522_fast import FastMFRC522
+        spi = self.readers[(bus, cs)] = FakeMFRC522SPI(self.clock, pace=True)
+        self.rfid = self.rfid or spi
+        return FastMFRC522(spi)
+
+    def oled(self, port, address):
+        from sim_oled import SimSSD1306
+        device = self.displays[(port, address)] = SimSSD1306()
+        self.display = self.display or device
+        return device
+
+    def serial_port(self, port):
+        from sim_r503 import FakeR503
+        self.fingerprint = FakeR503()
+        return self.fingerprint.port
+
+    def camera_source(self):
+        from sim_camera import FakeFrameSource
+        self.camera = FakeFrameSource()
+        return self.camera
+
+    def firestore(self, service_account_path):
+        from datetime import datetime, timezone
+        from sim_firestore import FakeFirestore
+        self.db = FakeFirestore(clock=lambda: datetime.fromtimestamp(self.clock.time(), timezone.utc))
+        return self.db
+
+    def rekognition(self, region, access_key, secret_key):
+        from sim_rekognition import FakeRekognition
+        self.faces = FakeRekognition()
+        return self.faces
+
+
+if BACKEND == "sim":
+    hw = SimHardware()
+elif BACKEND == "pi":
+    hw = PiHardware()
+else:
+    raise ValueError(f"SECURE_LOCK_HAL must be 'pi' or 'sim', not {BACKEND!r}")
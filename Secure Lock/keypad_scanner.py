@@ -0,0 +1,265 @@
+import time
+import threading
+from collections import namedtuple
+
+# Matrix keypad scan engine.
+#
+# While no key is down the scan thread sleeps with every row driven LOW,
+# so a press pulls its column LOW and the column's falling edge wakes it;
+# an idle keypad costs no CPU. Awake, it scans every `period` seconds -
+# one row LOW at a time, the others HIGH - reading the pulled-up columns
+# into a bitmap, one bit per key, and goes back to sleep once every key
+# is up and settled. Each key goes through a time-based debounce: a change is
+# accepted once the raw level has held for `press_s` (press) or
+# `release_s` (release), so nothing ever sleeps inside a scan. Keys are
+# tracked independently, so a key pressed while another is still held is
+# reported too (rollover), in the order they went down. Without diodes,
+# three keys on the corners of a rectangle make the fourth corner read as
+# pressed (ghosting); while the bitmap holds such a rectangle, new presses
+# on it are held back until it is unambiguous again, and then reported
+# with their original press time if they are still down. `ghosted`
+# counts the held-back contacts (the phantom among them), `recovered` the
+# ones reported later. Only when the whole rectangle is let go while still
+# ambiguous is there no telling the real key from the phantom.
+# Presses go to on_key(KeyEvent) from the scan thread, stamped with the
+# time the contact was first seen closed; the consumer queues them, so
+# keys typed while the controller is busy are kept, not lost.
+
+KeyEvent = namedtuple("KeyEvent", ["key", "timestamp"])
+
+SCAN_PERIOD = 0.005
+PRESS_S = 0.010
+RELEASE_S = 0.020
+
+
+class KeypadScanner:
+    def __init__(self, gpio, row_pins, col_pins, keys, on_key, clock=time.monotonic,
+                 period=SCAN_PERIOD, press_s=PRESS_S, release_s=RELEASE_S):
+        self.gpio = gpio
+        self.row_pins = list(row_pins)
+        self.col_pins = list(col_pins)
+        self.keys = [k for row in keys for k in row]
+        self.on_key = on_key
+        self.clock = clock
+        self.period = period
+        self.press_s = press_s
+        self.release_s = release_s
+        self._ncols = len(self.col_pins)
+        self._col_mask = (1 << self._ncols) - 1
+        self._down = 0         # debounced bitmap
+        self._pending = {}     # bit -> time the raw level first differed
+        self._held = set()     # pending presses held back by a ghost rectangle
+        self._stop = threading.Event()
+        self._edge = threading.Event()
+        self._thread = None
+        self.wakeups = 0
+        self.scans = 0
+        self.presses = 0
+        self.ghosted = 0
+        self.recovered = 0
+
+    def busy(self):
+        """A key is down or still settling."""
+        return bool(self._down or self._pending)
+
+    # --- scanning ---
+
+    def read(self):
+        """Raw bitmap of closed contacts, bit r * ncols + c."""
+        gpio = self.gpio
+        raw = 0
+        bit = 0
+        for row_pin in self.row_pins:
+            gpio.output(row_pin, gpio.LOW)
+            for col_pin in self.col_pins:
+                if not gpio.input(col_pin):
+                    raw |= 1 << bit
+                bit += 1
+            gpio.output(row_pin, gpio.HIGH)
+        return raw
+
+    def _ghost_mask(self, raw):
+        # Keys on any rectangle of closed contacts: two rows sharing 2+ columns
+        rows = [(raw >> (r * self._ncols)) & self._col_mask for r in range(len(self.row_pins))]
+        mask = 0
+        for r1 in range(len(rows)):
+            for r2 in range(r1 + 1, len(rows)):
+                common = rows[r1] & rows[r2]
+                if common & (common - 1):
+                    mask |= (common << (r1 * self._ncols)) | (common << (r2 * self._ncols))
+        return mask
+
+    def update(self, raw, now):
+        """Feed one scan; returns the KeyEvents it completed."""
+        self.scans += 1
+        changed = raw ^ self._down
+        pending = self._pending
+        if not changed:
+            if pending:
+                pending.clear()
+                self._held.clear()
+            return ()
+        for bit in [b for b in pending if not changed >> b & 1]:
+            del pending[bit]
+            self._held.discard(bit)
+        ghosts = self._ghost_mask(raw) if bin(raw).count("1") >= 4 else 0
+        events = []
+        bits = changed
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            bit = low.bit_length() - 1
+            since = pending.setdefault(bit, now)
+            pressed = raw & low
+            if now - since < (self.press_s if pressed else self.release_s):
+                continue
+            if pressed and ghosts & low:
+                if bit not in self._held:
+                    self._held.add(bit)
+                    self.ghosted += 1
+                continue
+            del pending[bit]
+            if bit in self._held:
+                self._held.discard(bit)
+                self.recovered += 1
+            self._down ^= low
+            if pressed:
+                events.append(KeyEvent(self.keys[bit], since))
+        events.sort(key=lambda e: e.timestamp)
+        self.presses += len(events)
+        return events
+
+    # --- waiting ---
+
+    def _set_rows(self, level):
+        for row_pin in self.row_pins:
+            self.gpio.output(row_pin, level)
+
+    def _column_low(self):
+        return any(not self.gpio.input(col_pin) for col_pin in self.col_pins)
+
+    def _on_edge(self, pin):
+        # GPIO event thread: a column fell
+        self._edge.set()
+
+    def _scan_until_idle(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            raw = self.read()
+            for event in self.update(raw, self.clock()):
+                try:
+                    self.on_key(event)
+                except Exception as e:
+                    print("Keypad handler error:", e)
+            if not raw and not self.busy():
+                return
+            next_at += self.period
+            delay = next_at - time.monotonic()
+            if delay < 0:
+                next_at = time.monotonic()  # fell behind: skip, do not burst
+            elif self._stop.wait(delay):
+                return
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._set_rows(self.gpio.LOW)
+            self._edge.clear()
+            # A key that went down before the edge was armed still reads LOW
+            if not self._column_low():
+                self._edge.wait()
+                if self._stop.is_set():
+                    break
+            self.wakeups += 1
+            self._set_rows(self.gpio.HIGH)
+            self._scan_until_idle()
+        self._set_rows(self.gpio.LOW)
+
+    def start(self):
+        self._set_rows(self.gpio.LOW)
+        for col_pin in self.col_pins:
+            self.gpio.add_event_detect(col_pin, self.gpio.FALLING, callback=self._on_edge)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="keypad", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._edge.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        for col_pin in self.col_pins:
+            self.gpio.remove_event_detect(col_pin)
+
+
+# ---------------------------
+# ========== DEMO ==========
+# ---------------------------
+
+if __name__ == "__main__":
+    from sim_gpio import SimulatedGPIO, SimKeypadMatrix
+
+    ROWS, COLS = [26, 16, 20, 21], [5, 6, 13, 19]
+    KEYS = [["1", "2", "3", "A"], ["4", "5", "6", "B"], ["7", "8", "9", "C"], ["*", "0", "#", "D"]]
+    gpio = SimulatedGPIO()
+    for pin in ROWS:
+        gpio.setup(pin, gpio.OUT, initial=gpio.LOW)
+    for pin in COLS:
+        gpio.setup(pin, gpio.IN, pull_up_down=gpio.PUD_UP)
+    matrix = SimKeypadMatrix(gpio, ROWS, COLS, KEYS)
+    got = []
+    scanner = KeypadScanner(gpio, ROWS, COLS, KEYS, on_key=got.append)
+
+    t0 = time.perf_counter()
+    for _ in range(2000):
+        scanner.read()
+    print(f"one scan of the idle matrix: {(time.perf_counter() - t0) / 2000 * 1e6:.0f} us (simulated GPIO)")
+
+    def tap(key, hold, gap):
+        matrix.press(key)
+        time.sleep(hold)
+        matrix.release(key)
+        time.sleep(gap)
+
+    scanner.start()
+    time.sleep(0.2)
+    idle_scans = scanner.scans
+    # Bouncy press: contact chatters for 3 ms before it settles
+    for _ in range(3):
+        tap("1", 0.0005, 0.0005)
+    tap("1", 0.04, 0.08)
+    # Rollover: 2 goes down before 3 comes up
+    matrix.press("3")
+    time.sleep(0.03)
+    matrix.press("2")
+    time.sleep(0.03)
+    matrix.release("3")
+    time.sleep(0.03)
+    matrix.release("2")
+    time.sleep(0.08)
+    # Ghosting: 1, 2 and 4 held make 5 read as pressed; 4 is held back
+    # until 1 comes up, then reported
+    matrix.press("1")
+    matrix.press("2")
+    time.sleep(0.03)
+    matrix.press("4")
+    time.sleep(0.05)
+    matrix.release("1")
+    time.sleep(0.04)
+    for k in "24":
+        matrix.release(k)
+    time.sleep(0.05)
+    # Fast typing: 50 ms per key
+    for k in "135790":
+        tap(k, 0.03, 0.02)
+    time.sleep(0.05)
+    busy_scans = scanner.scans - idle_scans
+    # Back to sleep: no scans while nothing is pressed
+    time.sleep(0.2)
+    assert scanner.scans == idle_scans + busy_scans, "scanning while idle"
+    scanner.stop()
+    typed = "".join(e.key for e in got)
+    print("keys:", typed)
+    print(f"scans: {idle_scans} in 0.2 s idle, {busy_scans} while typing, {scanner.wakeups} wakeups; "
+          f"presses={scanner.presses} ghost presses held back={scanner.ghosted} recovered={scanner.recovered}")
+    assert idle_scans == 0, idle_scans
+    assert typed == "1" + "32" + "124" + "135790", typed
@@ -0,0 +1,113 @@
+import signal
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Single asyncio runtime for the lock controller.
+#
+# All controller state lives on the event-loop thread. Subsystems are
+# tasks (spawn), blocking drivers (SPI, I2C, boto3, Firestore, camera)
+# are awaited through a small thread pool (blocking), and callbacks
+# coming from driver threads are marshalled onto the loop with post().
+# SIGINT/SIGTERM trigger an orderly shutdown: tasks are cancelled and
+# awaited, then the registered cleanups run in reverse order.
+
+
+class LockRuntime:
+    def __init__(self, io_workers=4, loop_factory=None):
+        self.io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="lock-io")
+        self.loop_factory = loop_factory
+        self.loop = None
+        self.inflight = 0  # blocking() calls not yet finished
+        self._thread_id = None
+        self._tasks = set()
+        self._cleanups = []
+        self._stopping = None
+
+    # --- scheduling ---
+
+    def spawn(self, coro, name=None):
+        task = self.loop.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Task {task.get_name()} crashed:", repr(task.exception()))
+
+    def post(self, fn, *args):
+        """Run fn(*args) on the loop thread; safe to call from any thread."""
+        if threading.get_ident() == self._thread_id:
+            self._call(fn, args)
+        else:
+            self.loop.call_soon_threadsafe(self._call, fn, args)
+
+    def _call(self, fn, args):
+        result = fn(*args)
+        if asyncio.iscoroutine(result):
+            self.spawn(result, name=getattr(fn, "__name__", None))
+
+    async def blocking(self, fn, *args, **kwargs):
+        """Await a blocking driver call on the I/O pool."""
+        self.inflight += 1
+        try:
+            return await self.loop.run_in_executor(self.io, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.inflight -= 1
+
+    def call_later(self, delay, fn, *args):
+        return self.loop.call_later(delay, fn, *args)
+
+    # --- lifecycle ---
+
+    def on_shutdown(self, fn, *args):
+        self._cleanups.append((fn, args))
+
+    def stop(self):
+        if self.loop is not None and self._stopping is not None:
+            self.loop.call_soon_threadsafe(self._stopping.set)
+
+    async def _main(self, start):
+        self.loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # not on the main thread (e.g. under a test harness)
+        try:
+            await start(self)
+            await self._stopping.wait()
+            print("Exiting, cleaning up...")
+        finally:
+            tasks = list(self._tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for fn, args in reversed(self._cleanups):
+                try:
+                    fn(*args)
+                except Exception as e:
+                    print(f"Shutdown step {getattr(fn, '__qualname__', fn)} failed:", e)
+            self.io.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, start):
+        """Run `await start(runtime)` and then serve until stop() or a signal."""
+        if hasattr(asyncio, "Runner"):
+            with asyncio.Runner(loop_factory=self.loop_factory) as runner:
+                runner.run(self._main(start))
+            return
+        # Python < 3.11 (Raspberry Pi OS bullseye ships 3.9)
+        loop = (self.loop_factory or asyncio.new_event_loop)()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._main(start))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
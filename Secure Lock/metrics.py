@@ -0,0 +1,229 @@
+import os
+import time
+import bisect
+import asyncio
+import functools
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# In-process latency metrics.
+#
+# span() times a block (or, as a decorator, a function or coroutine) and
+# records it in a labelled histogram. Histograms keep Prometheus-style
+# cumulative buckets for export plus the most recent samples, so p50/p95/
+# p99 can be read on the device without a Prometheus server. Export is
+# the Prometheus text format, served on a local HTTP port (serve()) and/or
+# rewritten atomically to a file for node_exporter's textfile collector
+# (write_textfile()).
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT = 1024
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS, recent=RECENT):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=recent)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q):
+        xs = sorted(self.recent)
+        return xs[min(len(xs) - 1, int(q * len(xs)))] if xs else None
+
+
+class _Span:
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = self.registry.clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, self.registry.clock() - self.start, **self.labels)
+        return False
+
+    def __call__(self, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with _Span(self.registry, self.name, self.labels):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Span(self.registry, self.name, self.labels):
+                    return fn(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    def __init__(self, clock=time.perf_counter, buckets=BUCKETS):
+        self.clock = clock
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {label tuple: Histogram}
+        self._counters = {}    # name -> {label tuple: int}
+        self._help = {}
+        self._server = None
+        self._writer = None
+        self._stop = threading.Event()
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    # --- recording ---
+
+    def span(self, name, **labels):
+        """Time a `with` block, or decorate a function/coroutine."""
+        return _Span(self, name, labels)
+
+    def observe(self, name, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = Histogram(self.buckets)
+            h.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    # --- reading ---
+
+    def quantiles(self, name, qs=(0.5, 0.95, 0.99)):
+        """{labels: (count, [quantile seconds...])} over the recent samples."""
+        with self._lock:
+            return {key: (h.count, [h.quantile(q) for q in qs])
+                    for key, h in self._histograms.get(name, {}).items()}
+
+    def summary(self):
+        lines = []
+        for name in sorted(self._histograms):
+            for key, (count, (p50, p95, p99)) in sorted(self.quantiles(name).items()):
+                lines.append(f"{name}{_labels(dict(key))}  n={count}  p50={p50 * 1000:.1f}ms  "
+                             f"p95={p95 * 1000:.1f}ms  p99={p99 * 1000:.1f}ms")
+        return "\n".join(lines)
+
+    def render(self):
+        """Prometheus text exposition format."""
+        out = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    out.append(f"# HELP {name} {self._help[name]}")
+                out.append(f"# TYPE {name} histogram")
+                for key, h in sorted(series.items()):
+                    labels = dict(key)
+                    cumulative = 0
+                    for bound, n in zip(self.buckets, h.counts):
+                        cumulative += n
+                        out.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+                    out.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {h.count}")
+                    out.append(f"{name}_sum{_labels(labels)} {h.sum:.6f}")
+                    out.append(f"{name}_count{_labels(labels)} {h.count}")
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    out.append(f"# HELP {name} {self._help[name]}")
+                out.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    out.append(f"{name}{_labels(dict(key))} {value}")
+        return "\n".join(out) + "\n"
+
+    # --- export ---
+
+    def serve(self, port, address="127.0.0.1"):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((address, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+    def write_textfile(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def start_textfile(self, path, interval=15.0):
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.write_textfile(path)
+                except OSError as e:
+                    print("Metrics textfile error:", e)
+
+        self._writer = threading.Thread(target=run, name="metrics-textfile", daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# ---------------------------
+# ========== DEMO ==========
+# ---------------------------
+
+if __name__ == "__main__":
+    import random
+    import urllib.request
+
+    metrics = Registry()
+
+    @metrics.span("demo_stage_seconds", stage="work")
+    def work():
+        time.sleep(random.uniform(0.001, 0.004))
+
+    for _ in range(200):
+        work()
+        metrics.observe("demo_unlock_seconds", random.lognormvariate(-3.5, 0.5), method="pin")
+    t0 = time.perf_counter()
+    for _ in range(100000):
+        with metrics.span("demo_overhead_seconds"):
+            pass
+    print(f"span overhead: {(time.perf_counter() - t0) * 10:.2f} us")
+    port = metrics.serve(0)
+    body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+    print(body.splitlines()[-3:])
+    print(metrics.summary())
+    metrics.stop()
@@ -0,0 +1,252 @@
+import time
+
+# Fast-poll layer for the MFRC522 over spidev.
+#
+# The stock MFRC522-python driver does a read-modify-write for every bit
+# it touches and, on an empty poll, reads CommIrqReg up to 2000 times
+# because its wait loop never sees the timer interrupt. This layer sets
+# the chip up once (1 ms auto-started timeout timer, 100% ASK, antenna on)
+# and then runs each Transceive as a fixed list of prebuilt SPI frames:
+# plain writes instead of read-modify-write, the whole FIFO payload in one
+# frame, a short sleep for the card's reply instead of spinning, and the
+# IRQ/error/FIFO-level/control registers fetched together in a single
+# multi-register read. read_uid() does REQA + anticollision and returns
+# the 32-bit UID as an int; MFRC522_Request/MFRC522_Anticoll are kept
+# for code written against the stock driver.
+
+CommandReg = 0x01
+CommIrqReg = 0x04
+ErrorReg = 0x06
+FIFODataReg = 0x09
+FIFOLevelReg = 0x0A
+ControlReg = 0x0C
+BitFramingReg = 0x0D
+ModeReg = 0x11
+TxControlReg = 0x14
+TxASKReg = 0x15
+TModeReg = 0x2A
+TPrescalerReg = 0x2B
+TReloadRegH = 0x2C
+TReloadRegL = 0x2D
+
+PCD_IDLE = 0x00
+PCD_TRANSCEIVE = 0x0C
+PICC_REQIDL = 0x26
+PICC_REQALL = 0x52
+PICC_ANTICOLL = 0x93
+
+MI_OK = 0
+MI_NOTAGERR = 1
+MI_ERR = 2
+
+RX_IRQ = 0x20
+ERR_IRQ = 0x02
+TIMER_IRQ = 0x01
+
+# Sleep before the first status read: roughly the RF round trip at 106 kbit/s
+REQA_WAIT = 0.0003
+ANTICOLL_WAIT = 0.0007
+POLL_WAIT = 0.0001  # between further status reads
+
+
+def _w(reg):
+    return (reg << 1) & 0x7E
+
+
+def _r(reg):
+    return ((reg << 1) & 0x7E) | 0x80
+
+
+class FastMFRC522:
+    MI_OK, MI_NOTAGERR, MI_ERR = MI_OK, MI_NOTAGERR, MI_ERR
+    PICC_REQIDL, PICC_REQALL = PICC_REQIDL, PICC_REQALL
+
+    def __init__(self, spi, timeout_ms=1.0):
+        self.spi = spi
+        self.xfer = spi.xfer2
+        self.reader = None
+        self._idle = [_w(CommandReg), PCD_IDLE]
+        self._clear_irqs = [_w(CommIrqReg), 0x7F]
+        self._flush = [_w(FIFOLevelReg), 0x80]
+        self._transceive = [_w(CommandReg), PCD_TRANSCEIVE]
+        self._send_7 = [_w(BitFramingReg), 0x87]  # StartSend, 7 bits in the last byte
+        self._send_8 = [_w(BitFramingReg), 0x80]
+        self._reqa = [_w(FIFODataReg), PICC_REQIDL]
+        self._anticoll = [_w(FIFODataReg), PICC_ANTICOLL, 0x20]
+        self._status = [_r(CommIrqReg), _r(ErrorReg), _r(FIFOLevelReg), _r(ControlReg), 0]
+        self._fifo_reads = [[_r(FIFODataReg)] * n + [0] for n in range(65)]
+        self.configure(timeout_ms)
+
+    @classmethod
+    def from_reader(cls, reader, **kwargs):
+        """Wrap a stock MFRC522 (which has reset and initialised the chip)."""
+        fast = cls(reader.spi, **kwargs)
+        fast.reader = reader
+        return fast
+
+    def configure(self, timeout_ms):
+        # Timer at 13.56 MHz / (2 * 169 + 1) = 40 kHz, started by every transmission
+        ticks = max(1, int(timeout_ms * 40))
+        self.timeout = timeout_ms / 1000
+        for reg, value in ((TModeReg, 0x80), (TPrescalerReg, 0xA9), (TReloadRegH, ticks >> 8),
+                           (TReloadRegL, ticks & 0xFF), (TxASKReg, 0x40), (ModeReg, 0x3D)):
+            self.xfer([_w(reg), value])
+        tx = self.xfer([_r(TxControlReg), 0])[1]
+        if tx & 0x03 != 0x03:
+            self.xfer([_w(TxControlReg), tx | 0x03])  # antenna on, and left on
+
+    def transceive(self, fifo_frame, send_frame, wait=REQA_WAIT):
+        """(data, last_bits) of the card's reply, or None on timeout/error."""
+        xfer = self.xfer
+        xfer(self._idle)
+        xfer(self._clear_irqs)
+        xfer(self._flush)
+        xfer(fifo_frame)
+        xfer(self._transceive)
+        xfer(send_frame)
+        deadline = time.monotonic() + self.timeout + 0.002
+        while True:
+            time.sleep(wait)
+            wait = POLL_WAIT
+            _, irq, error, level, control = xfer(self._status)
+            if irq & (RX_IRQ | ERR_IRQ | TIMER_IRQ):
+                break
+            if time.monotonic() > deadline:
+                return None
+        if not irq & RX_IRQ or error & 0x1B or level == 0:
+            return None
+        return xfer(self._fifo_reads[min(level, 64)])[1:], control & 0x07
+
+    def read_uid(self):
+        """32-bit UID of a card in the field, or None."""
+        reply = self.transceive(self._reqa, self._send_7)
+        if reply is None or len(reply[0]) != 2:
+            return None
+        reply = self.transceive(self._anticoll, self._send_8, ANTICOLL_WAIT)
+        if reply is None:
+            return None
+        uid = reply[0]
+        if len(uid) != 5 or uid[0] ^ uid[1] ^ uid[2] ^ uid[3] != uid[4]:
+            return None
+        return (uid[0] << 24) | (uid[1] << 16) | (uid[2] << 8) | uid[3]
+
+    # --- stock driver API ---
+
+    def MFRC522_Request(self, req_mode):
+        frame = self._reqa if req_mode == PICC_REQIDL else [_w(FIFODataReg), req_mode]
+        reply = self.transceive(frame, self._send_7)
+        if reply is None:
+            return MI_ERR, 0
+        data, last_bits = reply
+        bits = (len(data) - 1) * 8 + last_bits if last_bits else len(data) * 8
+        return (MI_OK if bits == 0x10 else MI_ERR), bits
+
+    def MFRC522_Anticoll(self):
+        reply = self.transceive(self._anticoll, self._send_8, ANTICOLL_WAIT)
+        if reply is None:
+            return MI_ERR, []
+        uid = reply[0]
+        if len(uid) != 5 or uid[0] ^ uid[1] ^ uid[2] ^ uid[3] != uid[4]:
+            return MI_ERR, uid
+        return MI_OK, uid
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+class _StockMFRC522:
+    # The calls MFRC522-python makes for Request + Anticoll, register for register
+    def __init__(self, spi):
+        self.spi = spi
+
+        def w(reg, val):
+            spi.xfer2([_w(reg), val])
+
+        w(CommandReg, 0x0F)
+        w(TModeReg, 0x8D)
+        w(TPrescalerReg, 0x3E)
+        w(TReloadRegL, 30)
+        w(TReloadRegH, 0)
+        w(TxASKReg, 0x40)
+        w(ModeReg, 0x3D)
+        self.set_bits(TxControlReg, 0x03)
+
+    def write(self, reg, val):
+        self.spi.xfer2([_w(reg), val])
+
+    def read(self, reg):
+        return self.spi.xfer2([_r(reg), 0])[1]
+
+    def set_bits(self, reg, mask):
+        self.write(reg, self.read(reg) | mask)
+
+    def clear_bits(self, reg, mask):
+        self.write(reg, self.read(reg) & ~mask)
+
+    def to_card(self, send):
+        irq_en, wait_irq = 0x77, 0x30
+        self.write(0x02, irq_en | 0x80)
+        self.clear_bits(CommIrqReg, 0x80)
+        self.set_bits(FIFOLevelReg, 0x80)
+        self.write(CommandReg, PCD_IDLE)
+        for b in send:
+            self.write(FIFODataReg, b)
+        self.write(CommandReg, PCD_TRANSCEIVE)
+        self.set_bits(BitFramingReg, 0x80)
+        i = 2000
+        while True:
+            n = self.read(CommIrqReg)
+            i -= 1
+            # as written upstream: ~(n & 0x01) is never 0, so the timer IRQ is ignored
+            if ~((i != 0) and ~(n & 0x01) and ~(n & wait_irq)):
+                break
+        self.clear_bits(BitFramingReg, 0x80)
+        back = []
+        status = MI_ERR
+        if i != 0 and self.read(ErrorReg) & 0x1B == 0:
+            status = MI_NOTAGERR if n & irq_en & 0x01 else MI_OK
+            n = self.read(FIFOLevelReg)
+            last_bits = self.read(ControlReg) & 0x07
+            back_bits = (n - 1) * 8 + last_bits if last_bits else n * 8
+            for _ in range(min(max(n, 1), 16)):
+                back.append(self.read(FIFODataReg))
+            return status, back, back_bits
+        return status, back, 0
+
+    def read_uid(self):
+        self.write(BitFramingReg, 0x07)
+        status, _, bits = self.to_card([PICC_REQIDL])
+        if status != MI_OK or bits != 0x10:
+            return None
+        self.write(BitFramingReg, 0x00)
+        status, uid, _ = self.to_card([PICC_ANTICOLL, 0x20])
+        if status != MI_OK or len(uid) != 5 or uid[0] ^ uid[1] ^ uid[2] ^ uid[3] != uid[4]:
+            return None
+        return (uid[0] << 24) | (uid[1] << 16) | (uid[2] << 8) | uid[3]
+
+
+def benchmark(polls=200):
+    from sim_rfid import FakeMFRC522SPI
+
+    card = 3555744237
+    print(f"{'driver':<8}{'case':<7}{'SPI xfers':>10}{'bus ms':>9}{'device ms':>11}{'CPU ms':>9}")
+    for name, make in (("stock", _StockMFRC522), ("fast", FastMFRC522)):
+        for case in ("empty", "card"):
+            spi = FakeMFRC522SPI()
+            driver = make(spi)
+            xfers, bus = spi.transfers, spi.bus_time
+            if case == "card":
+                spi.tap(card, duration=3600)
+            cpu0, dev0 = time.process_time(), spi.now()
+            for _ in range(polls):
+                uid = driver.read_uid()
+                assert uid == (card if case == "card" else None)
+            cpu = (time.process_time() - cpu0) / polls * 1000
+            device = (spi.now() - dev0) / polls * 1000
+            print(f"{name:<8}{case:<7}{(spi.transfers - xfers) / polls:>10.0f}"
+                  f"{(spi.bus_time - bus) / polls * 1000:>9.2f}{device:>11.2f}{cpu:>9.3f}")
+
+
+if __name__ == "__main__":
+    benchmark()
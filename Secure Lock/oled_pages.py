@@ -0,0 +1,118 @@
+import time
+
+from PIL import Image
+
+# Dirty-page writer for the SSD1306.
+#
+# luma's ssd1306.display() converts the frame pixel by pixel in Python and
+# pushes all 1 KiB of GRAM over I2C on every call, even when the frame is
+# the one already on the panel. PageDisplay keeps the eight 128-byte pages
+# it last sent and, for a new frame, sends only the pages that differ,
+# one address window per run of adjacent dirty pages. Frames are packed
+# into page order by PIL in C (rotate, then slice every eighth byte). An
+# identical frame costs nothing; the same image object (the renderer's
+# cache hands those out) is skipped before packing. invalidate() forces
+# the next frame to be sent in full, e.g. after the panel was reset.
+
+SET_COL_ADDR = 0x21
+SET_PAGE_ADDR = 0x22
+
+
+def to_pages(image, pages):
+    """SSD1306 GRAM pages (bit 0 = top row) for a 1-bit image."""
+    raw = image.transpose(Image.ROTATE_270).tobytes()
+    return [raw[pages - 1 - p::pages] for p in range(pages)]
+
+
+class PageDisplay:
+    def __init__(self, device):
+        self.device = device
+        self.size = device.size
+        self.width, self.height = device.size
+        self.pages = self.height // 8
+        self._sent = None          # page bytes on the panel
+        self._last_image = None
+        self.frames = 0
+        self.skipped = 0
+        self.pages_sent = 0
+
+    def invalidate(self):
+        self._sent = None
+        self._last_image = None
+
+    def display(self, image):
+        if image is self._last_image:
+            self.skipped += 1
+            return
+        if image.size != self.size:
+            raise ValueError(f"image size {image.size} does not match device {self.size}")
+        if getattr(self.device, "rotate", 0):
+            image = self.device.preprocess(image)
+        pages = to_pages(image.convert("1"), self.pages)
+        sent = self._sent
+        dirty = [p for p in range(self.pages) if sent is None or pages[p] != sent[p]]
+        if not dirty:
+            self._last_image = image
+            self.skipped += 1
+            return
+        # Drop the cache first: if a write fails, the next frame goes out in full
+        self._sent = self._last_image = None
+        device = self.device
+        start = prev = dirty[0]
+        for p in dirty[1:] + [None]:
+            if p == prev + 1:
+                prev = p
+                continue
+            device.command(SET_COL_ADDR, 0, self.width - 1, SET_PAGE_ADDR, start, prev)
+            device.data(list(b"".join(pages[start:prev + 1])))
+            start = prev = p
+        self._sent = pages
+        self._last_image = image
+        self.frames += 1
+        self.pages_sent += len(dirty)
+
+    def clear(self):
+        self.device.clear()
+        self.invalidate()
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+def benchmark(font_path="/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", rounds=5):
+    from display_cache import DisplayRenderer
+    from sim_oled import SimSSD1306
+
+    # A PIN typed, wrong, retyped, welcome, back to idle, with the idle
+    # loop's 8 s redraw in between
+    session = ["Hello..", "Hello.."] + ["*" * n for n in range(1, 7)] + ["Incorrect", "Hello..", "Hello.."] \
+        + ["*" * n for n in range(1, 5)] + ["Welcome\nAdmin", "Hello..", "Hello.."]
+    renderer = DisplayRenderer((128, 64), font_path)
+    renderer.preload(session)
+    calls = len(session) * rounds
+
+    print(f"{'writer':<8}{'frames sent':>12}{'I2C bytes':>11}{'bus ms':>9}{'CPU ms/call':>13}")
+    for name in ("full", "pages"):
+        device = SimSSD1306(pace=False)
+        screen = device if name == "full" else PageDisplay(device)
+        t0 = time.process_time()
+        for _ in range(rounds):
+            for message in session:
+                screen.display(renderer.render(message))
+        cpu = (time.process_time() - t0) / calls * 1000
+        frames = device.frames if name == "full" else screen.frames
+        print(f"{name:<8}{frames:>12}{device.bytes / calls:>11.0f}{device.bus_time / calls * 1000:>9.2f}{cpu:>13.3f}")
+
+    # What ends up in GRAM must be the frame asked for
+    device = SimSSD1306(pace=False)
+    screen = PageDisplay(device)
+    for message in session:
+        screen.display(renderer.render(message))
+        assert device.shown().tobytes() == renderer.render(message).tobytes(), message
+    print(f"page writer matches the frame on the panel for all {len(session)} screens; "
+          f"{screen.skipped} skipped, {screen.pages_sent} of {screen.frames * 8} pages sent")
+
+
+if __name__ == "__main__":
+    benchmark()
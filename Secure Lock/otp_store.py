@@ -0,0 +1,241 @@
+import time
+import heapq
+import threading
+from datetime import datetime, timezone, timedelta
+
+# Local OTP cache fed from the Firestore "otps" collection.
+#
+# A background listener (on_snapshot, with a polling fallback) keeps every
+# OTP created in the last max_minutes indexed by code, so checking a PIN is
+# a dict lookup with no network call and several guests can hold valid
+# OTPs at the same time. An expiry heap drops codes once they are past
+# their TTL plus a grace period; during the grace period they still
+# answer "expired" so the keypad can say "OTP Expired".
+
+OTP_VALID = "valid"
+OTP_EXPIRED = "expired"
+
+
+def to_epoch(created_at):
+    """Firestore timestamp / datetime -> POSIX seconds (naive = UTC)."""
+    if created_at is None:
+        return None
+    if hasattr(created_at, "to_datetime"):
+        created_at = created_at.to_datetime()
+    if isinstance(created_at, (int, float)):
+        return float(created_at)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.timestamp()
+
+
+class OtpStore:
+    def __init__(self, db, max_minutes=10, collection="otps", clock=time.time,
+                 health_interval=5.0, poll_interval=5.0):
+        self.db = db
+        self.ttl = max_minutes * 60
+        self.collection = collection
+        self.clock = clock
+        self.health_interval = health_interval
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._expiry_by_code = {}
+        self._doc_codes = {}
+        self._heap = []
+        self._watch = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.updates = 0
+        self.reconnects = 0
+
+    # --- index maintenance ---
+
+    def add(self, doc_id, code, created_at):
+        created = to_epoch(created_at)
+        if code is None or created is None:
+            return
+        code = str(code)
+        expires_at = created + self.ttl
+        with self._lock:
+            old = self._doc_codes.get(doc_id)
+            self._doc_codes[doc_id] = code
+            if old is not None and old != code:
+                self._forget(old)  # an edited OTP: the old code stops working
+            if expires_at > self._expiry_by_code.get(code, float("-inf")):
+                self._expiry_by_code[code] = expires_at
+                heapq.heappush(self._heap, (expires_at, code))
+            self.updates += 1
+
+    def remove(self, doc_id):
+        with self._lock:
+            code = self._doc_codes.pop(doc_id, None)
+            if code is not None:
+                self._forget(code)
+
+    def _forget(self, code):
+        if code not in self._doc_codes.values():
+            self._expiry_by_code.pop(code, None)
+
+    def _purge(self, now):
+        # Keep expired codes for one extra TTL so they report "expired"
+        while self._heap and self._heap[0][0] + self.ttl < now:
+            expires_at, code = heapq.heappop(self._heap)
+            if self._expiry_by_code.get(code) == expires_at:
+                del self._expiry_by_code[code]
+                for doc_id in [d for d, c in self._doc_codes.items() if c == code]:
+                    del self._doc_codes[doc_id]
+
+    # --- lookups ---
+
+    def check(self, code):
+        """OTP_VALID, OTP_EXPIRED, or None if the code is unknown."""
+        now = self.clock()
+        with self._lock:
+            self._purge(now)
+            expires_at = self._expiry_by_code.get(str(code))
+        if expires_at is None:
+            self.misses += 1
+            return None
+        if now <= expires_at:
+            self.hits += 1
+            return OTP_VALID
+        self.expired += 1
+        return OTP_EXPIRED
+
+    def is_valid(self, code):
+        return self.check(code) == OTP_VALID
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for e in self._expiry_by_code.values() if e >= self.clock())
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "expired": self.expired,
+                "updates": self.updates, "reconnects": self.reconnects, "active": len(self)}
+
+    # --- Firestore feed ---
+
+    def _query(self):
+        # Include the grace period so recently expired codes are known too
+        cutoff = datetime.fromtimestamp(self.clock() - 2 * self.ttl, tz=timezone.utc)
+        return self.db.collection(self.collection).where("createdAt", ">=", cutoff)
+
+    def _ingest(self, doc):
+        data = doc.to_dict() or {}
+        self.add(doc.id, data.get("code"), data.get("createdAt"))
+
+    def _on_snapshot(self, docs, changes, read_time):
+        for change in changes:
+            change_type = getattr(change.type, "name", change.type)
+            if change_type == "REMOVED":
+                self.remove(change.document.id)
+            else:
+                self._ingest(change.document)
+
+    def refresh(self):
+        """One-shot full load (also the polling fallback); drops deleted docs."""
+        seen = set()
+        for doc in self._query().stream():
+            seen.add(doc.id)
+            self._ingest(doc)
+        with self._lock:
+            gone = [doc_id for doc_id in self._doc_codes if doc_id not in seen]
+        for doc_id in gone:
+            self.remove(doc_id)
+
+    def _subscribe(self):
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                pass
+            self._watch = None
+        self._watch = self._query().on_snapshot(self._on_snapshot)
+
+    def _listener_alive(self):
+        return self._watch is not None and getattr(self._watch, "is_active", True)
+
+    def _run(self):
+        # One listener for as long as it stays up: re-opening it re-reads
+        # every document in the window. Its cutoff stays where it was when
+        # opened; docs that fall out of the window are purged locally.
+        while not self._stop.is_set():
+            if self._listener_alive():
+                self._stop.wait(self.health_interval)
+                continue
+            try:
+                if self._watch is not None:
+                    self.reconnects += 1
+                    print("OtpStore listener closed, reopening")
+                self._subscribe()
+                continue
+            except Exception as e:
+                print("OtpStore listen error, polling instead:", e)
+            try:
+                self.refresh()
+            except Exception as e:
+                print("OtpStore refresh error:", e)
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="otp-store", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=2)
+
+
+# ---------------------------
+# ========== DEMO ==========
+# ---------------------------
+
+if __name__ == "__main__":
+    from sim_firestore import FakeFirestore
+
+    db = FakeFirestore()
+    now = datetime.now(timezone.utc)
+    otps = db.collection("otps")
+    otps.document("a").set({"code": "482913", "createdAt": now - timedelta(minutes=2)})
+    otps.document("b").set({"code": 551200, "createdAt": now - timedelta(minutes=1)})
+    otps.document("c").set({"code": "777777", "createdAt": now - timedelta(minutes=12)})
+
+    store = OtpStore(db, max_minutes=10)
+    store.start()
+    time.sleep(0.2)
+    otps.document("d").set({"code": "100200", "createdAt": now})
+    time.sleep(0.1)
+
+    for code in ["482913", "551200", "100200", "777777", "000000"]:
+        print(code, store.check(code))
+    reads = db.reads
+    t0 = time.perf_counter()
+    for _ in range(100_000):
+        store.check("482913")
+    print(f"check(): {(time.perf_counter() - t0) * 10:.2f} us/call, Firestore reads during checks: {db.reads - reads}")
+    print(store.stats())
+
+    # An edited OTP: only the new code opens
+    otps.document("a").set({"code": "482914", "createdAt": now - timedelta(minutes=2)})
+    time.sleep(0.1)
+    print("after edit:", store.check("482913"), store.check("482914"))
+    assert store.check("482913") is None and store.check("482914") == OTP_VALID
+    store.stop()
+
+    # The polling fallback forgets deleted OTPs too
+    poller = OtpStore(db, max_minutes=10)
+    poller.refresh()
+    otps.document("b").delete()
+    poller.refresh()
+    print("after delete:", poller.check("551200"), poller.check("100200"))
+    assert poller.check("551200") is None and poller.check("100200") == OTP_VALID
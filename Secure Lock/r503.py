@@ -0,0 +1,251 @@
+import time
+import queue
+import asyncio
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+
+# Driver for the R503 fingerprint sensor (UART, 57600 8N1).
+#
+# Packet: EF 01 | address (4) | PID (1) | length (2) | payload | checksum (2)
+# where length counts payload + checksum and checksum is the 16-bit sum of
+# PID, length and payload.
+#
+# Incoming bytes go through an incremental FrameParser, so replies of any
+# length are recognised as soon as their last byte arrives and junk or
+# corrupt frames are skipped instead of shifting every later reply. The
+# sensor answers one command at a time, so commands are queued and a
+# single I/O thread sends each one and matches the next acknowledge packet
+# to it. Callers get a Future (or await acommand()); every command has its
+# own timeout.
+
+HEADER = b"\xEF\x01"
+DEFAULT_ADDRESS = 0xFFFFFFFF
+
+PID_COMMAND = 0x01
+PID_DATA = 0x02
+PID_ACK = 0x07
+PID_END_DATA = 0x08
+
+MAX_PAYLOAD = 256
+
+# Confirmation codes used by the lock
+OK = 0x00
+NO_FINGER = 0x02
+NOT_FOUND = 0x09
+
+READ_SLICE = 0.02  # serial read timeout while waiting for a reply
+
+Packet = namedtuple("Packet", ["address", "pid", "payload", "raw"])
+
+
+class Response(namedtuple("Response", ["code", "params", "raw", "elapsed"])):
+    @property
+    def ok(self):
+        return self.code == OK
+
+
+def build_packet(pid, payload, address=DEFAULT_ADDRESS):
+    body = bytes([pid]) + (len(payload) + 2).to_bytes(2, "big") + payload
+    checksum = sum(body) & 0xFFFF
+    return HEADER + address.to_bytes(4, "big") + body + checksum.to_bytes(2, "big")
+
+
+class FrameParser:
+    def __init__(self):
+        self.buf = bytearray()
+        self.skipped = 0
+        self.bad_checksum = 0
+
+    def reset(self):
+        self.skipped += len(self.buf)
+        self.buf.clear()
+
+    def feed(self, data):
+        """Add bytes; return every complete, valid Packet found."""
+        buf = self.buf
+        buf += data
+        packets = []
+        while True:
+            start = buf.find(HEADER)
+            if start < 0:
+                keep = 1 if buf[-1:] == HEADER[:1] else 0
+                self.skipped += len(buf) - keep
+                del buf[:len(buf) - keep]
+                break
+            if start:
+                self.skipped += start
+                del buf[:start]
+            if len(buf) < 9:
+                break
+            length = int.from_bytes(buf[7:9], "big")
+            if length < 2 or length > MAX_PAYLOAD + 2:
+                # Not a real header; resync on the next EF 01
+                self.skipped += 2
+                del buf[:2]
+                continue
+            total = 9 + length
+            if len(buf) < total:
+                break
+            frame = bytes(buf[:total])
+            if sum(frame[6:total - 2]) & 0xFFFF != int.from_bytes(frame[total - 2:total], "big"):
+                self.bad_checksum += 1
+                del buf[:2]
+                continue
+            del buf[:total]
+            packets.append(Packet(int.from_bytes(frame[2:6], "big"), frame[6], frame[9:total - 2], frame))
+        return packets
+
+
+class R503:
+    def __init__(self, port="/dev/serial0", baudrate=57600, address=DEFAULT_ADDRESS,
+                 timeout=1.0, ser=None):
+        if ser is None:
+            import serial
+            ser = serial.Serial(port, baudrate=baudrate, timeout=READ_SLICE)
+        self.ser = ser
+        self.address = address
+        self.timeout = timeout
+        self.parser = FrameParser()
+        self._requests = queue.Queue()
+        self._closed = False
+        self.timeouts = 0
+        self.stray = 0
+        self._thread = threading.Thread(target=self._io_loop, name="r503", daemon=True)
+        self._thread.start()
+
+    # --- public API ---
+
+    def command(self, payload, timeout=None):
+        """Queue a command; the Future resolves to a Response or raises TimeoutError."""
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("R503 driver closed"))
+            return future
+        self._requests.put((payload, self.timeout if timeout is None else timeout, future))
+        return future
+
+    def call(self, payload, timeout=None):
+        return self.command(payload, timeout).result()
+
+    async def acommand(self, payload, timeout=None):
+        return await asyncio.wrap_future(self.command(payload, timeout))
+
+    def send(self, payload, timeout=None):
+        """Raw acknowledge packet (confirmation code at [9]), or b'' on timeout/error."""
+        try:
+            return self.call(payload, timeout).raw
+        except Exception:
+            return b""
+
+    def close(self):
+        self._closed = True
+        self._requests.put(None)
+        self._thread.join(timeout=2)
+        self.ser.close()
+
+    # --- commands used by the lock ---
+
+    def set_led(self, mode, speed, color, count, timeout=None):
+        return self.command(b"\x35" + bytes([mode, speed, color, count]), timeout)
+
+    def get_image(self, timeout=None):
+        return self.command(b"\x01", timeout)
+
+    def image_to_tz(self, buffer_id=1, timeout=None):
+        return self.command(b"\x02" + bytes([buffer_id]), timeout)
+
+    def create_model(self, timeout=None):
+        return self.command(b"\x05", timeout)
+
+    def store(self, fid, buffer_id=1, timeout=None):
+        return self.command(b"\x06" + bytes([buffer_id]) + fid.to_bytes(2, "big"), timeout)
+
+    def search(self, buffer_id=1, start=0, count=0x100, timeout=None):
+        return self.command(b"\x04" + bytes([buffer_id]) + start.to_bytes(2, "big") + count.to_bytes(2, "big"), timeout)
+
+    def delete(self, fid, count=1, timeout=None):
+        return self.command(b"\x0C" + fid.to_bytes(2, "big") + count.to_bytes(2, "big"), timeout)
+
+    @staticmethod
+    def match_of(response):
+        """(page id, score) from a search Response."""
+        p = response.params
+        return (p[0] << 8) | p[1], (p[2] << 8) | p[3]
+
+    # --- I/O thread ---
+
+    def _drain(self):
+        # Anything already waiting belongs to no request (e.g. a reply that
+        # arrived after its command timed out)
+        waiting = self.ser.in_waiting
+        if waiting:
+            self.stray += len(self.parser.feed(self.ser.read(waiting)))
+        self.parser.reset()
+
+    def _io_loop(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            payload, timeout, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._transact(payload, timeout))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _transact(self, payload, timeout):
+        self._drain()
+        t0 = time.monotonic()
+        deadline = t0 + timeout
+        self.ser.write(build_packet(PID_COMMAND, payload, self.address))
+        while True:
+            chunk = self.ser.read(max(1, self.ser.in_waiting))
+            if chunk:
+                for packet in self.parser.feed(chunk):
+                    if packet.pid == PID_ACK and packet.payload:
+                        return Response(packet.payload[0], packet.payload[1:], packet.raw,
+                                        time.monotonic() - t0)
+                    self.stray += 1
+            if time.monotonic() >= deadline:
+                self.timeouts += 1
+                raise TimeoutError(f"R503: no reply to command 0x{payload[0]:02X} within {timeout:.2f} s")
+
+
+# ---------------------------
+# ========== BENCHMARK ==========
+# ---------------------------
+
+if __name__ == "__main__":
+    from sim_r503 import FakeR503
+
+    fake = FakeR503(reply_delay=0.005)
+    fake.finger = True
+    sensor = R503(fake.port)
+
+    for name, fn in [("set_led", lambda: sensor.set_led(0x02, 0x03, 0x01, 0x00)),
+                     ("get_image", sensor.get_image),
+                     ("search", sensor.search)]:
+        times = []
+        for _ in range(50):
+            t0 = time.perf_counter()
+            fn().result()
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        print(f"{name:10s} round trip p50={times[25] * 1e3:6.2f} ms  max={times[-1] * 1e3:6.2f} ms")
+
+    # Garbage on the line and a sensor that stays silent
+    fake.inject(b"\x00\xEF\x01\x12")
+    print("after junk, get_image ok:", sensor.get_image().result().ok)
+    fake.silent = True
+    t0 = time.perf_counter()
+    try:
+        sensor.get_image(timeout=0.1).result()
+    except TimeoutError as e:
+        print(f"{e} ({(time.perf_counter() - t0) * 1e3:.0f} ms)")
+    fake.silent = False
+    print("recovered:", sensor.get_image().result().ok, " parser skipped", sensor.parser.skipped, "bytes")
+    sensor.close()
+    fake.close()
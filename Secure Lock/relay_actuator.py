@@ -0,0 +1,156 @@
+import time
+import threading
+
+# Single owner of the relay pin.
+#
+# Every unlock source (keypad, RFID, face, button, Firestore) posts a hold
+# instead of driving the pin and sleeping. A hold is either timed (an
+# unlock window) or open until its source releases it (remote unlock).
+# Re-authenticating extends the window; the relay stays energised while
+# any hold is active. Callers return immediately; the actuator thread
+# switches the pin when the state changes and when windows expire.
+#
+# Priorities only matter for lock(): it cancels every hold at or below
+# its priority, so a normal remote "locked" release cannot cut a local
+# unlock short, but a higher-priority lockdown can.
+
+PRIORITY_LOCAL = 10
+PRIORITY_REMOTE = 20
+PRIORITY_LOCKDOWN = 100
+
+
+class RelayActuator:
+    def __init__(self, gpio, pin, active_level=None, clock=time.monotonic, on_change=None):
+        self.gpio = gpio
+        self.pin = pin
+        self.active_level = gpio.HIGH if active_level is None else active_level
+        self.idle_level = gpio.LOW if self.active_level == gpio.HIGH else gpio.HIGH
+        self.clock = clock
+        self.on_change = on_change
+        self._holds = {}
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+        self.energised = False
+        self.switches = 0
+
+    # --- commands (never block) ---
+
+    def unlock(self, source, duration=None, priority=PRIORITY_LOCAL):
+        """Open for `duration` seconds, or until release(source) if None."""
+        until = None if duration is None else self.clock() + duration
+        with self._cond:
+            current = self._holds.get(source)
+            if current is not None and until is not None:
+                cur_until, cur_priority = current
+                if cur_until is None:
+                    until = None
+                else:
+                    until = max(until, cur_until)
+                priority = max(priority, cur_priority)
+            self._holds[source] = (until, priority)
+            self._cond.notify()
+
+    def release(self, source):
+        with self._cond:
+            if self._holds.pop(source, None) is not None:
+                self._cond.notify()
+
+    def lock(self, priority=PRIORITY_LOCKDOWN):
+        """Cancel every hold at or below `priority`."""
+        with self._cond:
+            for source, (_, p) in list(self._holds.items()):
+                if p <= priority:
+                    del self._holds[source]
+            self._cond.notify()
+
+    def recheck(self):
+        """Re-evaluate the windows now, e.g. after a simulated clock jumped ahead."""
+        with self._cond:
+            self._cond.notify()
+
+    def is_unlocked(self):
+        with self._cond:
+            return self._active(self.clock())
+
+    def holds(self):
+        with self._cond:
+            now = self.clock()
+            return {s: (None if u is None else max(0.0, u - now), p) for s, (u, p) in self._holds.items()}
+
+    # --- actuator thread ---
+
+    def _active(self, now):
+        for source, (until, _) in list(self._holds.items()):
+            if until is not None and until <= now:
+                del self._holds[source]
+        return bool(self._holds)
+
+    def _next_expiry(self):
+        ends = [u for u, _ in self._holds.values() if u is not None]
+        return min(ends) if ends else None
+
+    def _apply(self, energised):
+        if energised == self.energised:
+            return
+        self.gpio.output(self.pin, self.active_level if energised else self.idle_level)
+        self.energised = energised
+        self.switches += 1
+        print("Relay ON" if energised else "Relay OFF")
+        if self.on_change:
+            try:
+                self.on_change(energised)
+            except Exception as e:
+                print("Relay on_change error:", e)
+
+    def _run(self):
+        with self._cond:
+            while not self._stop:
+                now = self.clock()
+                self._apply(self._active(now))
+                expiry = self._next_expiry()
+                self._cond.wait(None if expiry is None else max(0.0, expiry - now))
+            self._holds.clear()
+            self._apply(False)
+
+    def start(self):
+        self.gpio.output(self.pin, self.idle_level)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="relay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+
+# ---------------------------
+# ========== DEMO ==========
+# ---------------------------
+
+if __name__ == "__main__":
+    from sim_gpio import SimulatedGPIO
+
+    gpio = SimulatedGPIO()
+    gpio.setup(27, gpio.OUT, initial=gpio.LOW)
+    relay = RelayActuator(gpio, 27)
+    relay.start()
+
+    t0 = time.perf_counter()
+    relay.unlock("keypad", 0.5)
+    print(f"unlock() returned after {(time.perf_counter() - t0) * 1e6:.0f} us")
+    time.sleep(0.3)
+    relay.unlock("rfid", 0.5)       # re-auth extends the window
+    relay.release("remote")          # remote "locked" does not cut it short
+    time.sleep(0.4)
+    print("after 0.7 s, unlocked:", relay.is_unlocked())
+    time.sleep(0.2)
+    print("after 0.9 s, unlocked:", relay.is_unlocked())
+    relay.unlock("remote", None, PRIORITY_REMOTE)
+    relay.lock(PRIORITY_LOCKDOWN)
+    time.sleep(0.05)
+    print("after lockdown, unlocked:", relay.is_unlocked(), "switches:", relay.switches)
+    relay.stop()
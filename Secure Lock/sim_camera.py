@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+
+# Fake frame source with the same start/capture_array/stop shape as
+# Picamera2Source in camera_service.py. Frames are paced at `fps` like a
+# real sensor and carry a moving bar so consecutive frames differ.
+
+
+class FakeFrameSource:
+    def __init__(self, size=(640, 480), fps=30, frames=None):
+        self.size = size
+        self.interval = 1.0 / fps
+        self.frames = list(frames) if frames else None
+        self.count = 0
+        self._next = 0.0
+        w, h = size
+        x = np.linspace(0, 255, w, dtype=np.uint8)
+        self._base = np.repeat(np.tile(x, (h, 1))[:, :, None], 3, axis=2)
+
+    def start(self):
+        self._next = time.monotonic()
+
+    def capture_array(self):
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.interval, time.monotonic())
+        self.count += 1
+        if self.frames:
+            return self.frames[(self.count - 1) % len(self.frames)]
+        frame = self._base.copy()
+        col = (self.count * 8) % self.size[0]
+        frame[:, col:col + 8] = 255
+        return frame
+
+    def stop(self):
+        pass
@@ -0,0 +1,90 @@
+import time
+import asyncio
+import selectors
+import threading
+
+# Virtual time for the simulation harness.
+#
+# VirtualClock runs at real speed while something is working and jumps
+# over idle gaps, so a trace covering minutes of door activity replays in
+# seconds while the time spent in controller code still counts.
+# VirtualTimeLoop is an asyncio loop on that clock: when it would sleep
+# until its next timer and nothing is busy (no blocking call in flight,
+# nothing arriving from other threads within `grace`), it advances the
+# clock to the timer instead of waiting for it.
+
+
+class VirtualClock:
+    def __init__(self, epoch=None):
+        self._base = time.monotonic()
+        self._epoch = time.time() if epoch is None else epoch
+        self._offset = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.skipped = 0.0
+
+    def monotonic(self):
+        """Seconds since the clock was created, including skipped time."""
+        return time.monotonic() - self._base + self._offset
+
+    def monotonic_ns(self):
+        return int(self.monotonic() * 1e9)
+
+    def time(self):
+        return self._epoch + self.monotonic()
+
+    def advance(self, seconds):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._offset += seconds
+            self.skipped += seconds
+            listeners = list(self._listeners)
+        for fn in listeners:
+            fn()
+
+    def on_advance(self, fn):
+        """Call fn() after every jump, e.g. to wake threads waiting on this clock."""
+        self._listeners.append(fn)
+
+
+class _SkipAheadSelector(selectors.BaseSelector):
+    def __init__(self, clock, busy, grace):
+        self._selector = selectors.DefaultSelector()
+        self.clock = clock
+        self.busy = busy
+        self.grace = grace
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+    def select(self, timeout=None):
+        if timeout is None or timeout <= self.grace:
+            return self._selector.select(timeout)
+        start = self.clock.monotonic()
+        ready = self._selector.select(self.grace)
+        if ready or self.busy():
+            return ready
+        self.clock.advance(timeout - (self.clock.monotonic() - start))
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock, busy=None, grace=0.002):
+        super().__init__(_SkipAheadSelector(clock, busy or (lambda: False), grace))
+        self.clock = clock
+
+    def time(self):
+        return self.clock.monotonic()
@@ -0,0 +1,255 @@
+import queue
+import threading
+import itertools
+from datetime import datetime, timezone
+
+# In-process fake of the small part of the Firestore client the lock uses:
+# collection/document set/get, order_by/where/limit/stream, on_snapshot
+# listeners and write batches. It counts document reads the way Firestore
+# bills them, and can drop every listener to simulate a lost connection.
+
+SERVER_TIMESTAMP = object()
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data, update_time, reference=None):
+        self.id = doc_id
+        self._data = dict(data) if data is not None else None
+        self.update_time = update_time
+        self.reference = reference
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field) if self._data else None
+
+
+class FakeChange:
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, db, query, callback):
+        self._db = db
+        self._query = query
+        self._callback = callback
+        self._seen = {}
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        self._db._unwatch(self)
+
+    def _refresh(self, initial=False):
+        docs = self._query._run(count_reads=False)
+        current = {d.id: d for d in docs}
+        changes = []
+        for doc_id, doc in current.items():
+            if doc_id not in self._seen:
+                changes.append(FakeChange("ADDED", doc))
+            elif self._seen[doc_id].update_time != doc.update_time:
+                changes.append(FakeChange("MODIFIED", doc))
+        for doc_id, doc in self._seen.items():
+            if doc_id not in current:
+                changes.append(FakeChange("REMOVED", doc))
+        self._seen = current
+        if changes or initial:
+            # Billed per document delivered, minimum one read per snapshot
+            self._db.reads += max(1, len([c for c in changes if c.type != "REMOVED"]))
+            self._db._deliver(self, docs, changes)
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), orders=(), limit_n=None):
+        self._collection = collection
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit_n
+
+    def _copy(self, **kw):
+        q = FakeQuery(self._collection, self._filters, self._orders, self._limit)
+        for k, v in kw.items():
+            setattr(q, k, v)
+        return q
+
+    def where(self, field, op=None, value=None, filter=None):
+        if filter is not None:
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(_filters=self._filters + [(field, _OPS[op], value)])
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(_orders=self._orders + [(field, direction == "DESCENDING")])
+
+    def limit(self, n):
+        return self._copy(_limit=n)
+
+    def _run(self, count_reads=True):
+        col = self._collection
+        with col._db._lock:
+            docs = [FakeSnapshot(i, d, t, col.document(i)) for i, (d, t) in col._docs.items()]
+        for field, op, value in self._filters:
+            docs = [d for d in docs if field in d._data and op(d._data[field], value)]
+        for field, descending in reversed(self._orders):
+            docs = [d for d in docs if field in d._data]
+            docs.sort(key=lambda d: d._data[field], reverse=descending)
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        if count_reads:
+            col._db.reads += max(1, len(docs))
+        return docs
+
+    def stream(self):
+        return iter(self._run())
+
+    def get(self):
+        return self._run()
+
+    def on_snapshot(self, callback):
+        return self._collection._db._watch(self, callback)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+        self.path = f"{collection.id}/{doc_id}"
+
+    def set(self, data, merge=False):
+        self._collection._db._write(self._collection, self.id, data, merge)
+
+    def update(self, data):
+        self._collection._db._write(self._collection, self.id, data, True)
+
+    def delete(self):
+        self._collection._db._write(self._collection, self.id, None, False)
+
+    def get(self):
+        db = self._collection._db
+        db.reads += 1
+        with db._lock:
+            data, t = self._collection._docs.get(self.id, (None, None))
+        return FakeSnapshot(self.id, data, t, self)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(self)
+        self._db = db
+        self.id = name
+        self._docs = {}
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self, doc_id or f"auto{next(self._db._ids):08d}")
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append((ref, data, merge))
+
+    def commit(self):
+        if self._db.fail_writes:
+            raise ConnectionError("simulated network outage")
+        for ref, data, merge in self._writes:
+            ref.set(data, merge=merge)
+        self._db.batches += 1
+        return []
+
+
+class FakeFirestore:
+    SERVER_TIMESTAMP = SERVER_TIMESTAMP
+
+    def __init__(self, clock=None):
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._watches = []
+        self._ids = itertools.count(1)
+        self._versions = itertools.count(1)
+        self._clock = clock or (lambda: datetime.now(timezone.utc))
+        self._deliveries = queue.Queue()
+        self.reads = 0
+        self.writes = 0
+        self.batches = 0
+        self.fail_writes = False
+        threading.Thread(target=self._delivery_loop, daemon=True).start()
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def _write(self, collection, doc_id, data, merge):
+        if self.fail_writes:
+            raise ConnectionError("simulated network outage")
+        with self._lock:
+            if data is None:
+                collection._docs.pop(doc_id, None)
+            else:
+                data = {k: (self._clock() if v is SERVER_TIMESTAMP else v) for k, v in data.items()}
+                if merge and doc_id in collection._docs:
+                    data = {**collection._docs[doc_id][0], **data}
+                collection._docs[doc_id] = (data, next(self._versions))
+            self.writes += 1
+            watches = [w for w in self._watches if w._query._collection is collection]
+        for w in watches:
+            w._refresh()
+
+    def _watch(self, query, callback):
+        w = FakeWatch(self, query, callback)
+        with self._lock:
+            self._watches.append(w)
+        w._refresh(initial=True)
+        return w
+
+    def _unwatch(self, w):
+        with self._lock:
+            if w in self._watches:
+                self._watches.remove(w)
+
+    def _deliver(self, w, docs, changes):
+        self._deliveries.put((w, docs, changes, self._clock()))
+
+    def _delivery_loop(self):
+        # Listener callbacks arrive on a background thread, as with the real client
+        while True:
+            w, docs, changes, read_time = self._deliveries.get()
+            if w.is_active:
+                try:
+                    w._callback(docs, changes, read_time)
+                except Exception as e:
+                    print("FakeFirestore listener error:", e)
+
+    def drop_listeners(self):
+        """Simulate the network dropping every open listen stream."""
+        with self._lock:
+            watches, self._watches = self._watches, []
+        for w in watches:
+            w.is_active = False
@@ -0,0 +1,185 @@
+import threading
+
+# Simulated stand-in for RPi.GPIO so the lock logic can run (and be timed)
+# on a plain Linux box. Constants match the values used by RPi.GPIO.
+
+BCM = 11
+BOARD = 10
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+
+class SimulatedPWM:
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.running = True
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+
+
+class SimulatedGPIO:
+    """
+    Minimal RPi.GPIO replacement.
+    Inputs are driven with set_input(); edge callbacks fire synchronously
+    in the caller's thread, the way RPi.GPIO fires them from its own
+    event thread.
+    """
+
+    BCM, BOARD, OUT, IN, LOW, HIGH = BCM, BOARD, OUT, IN, LOW, HIGH
+    PUD_OFF, PUD_DOWN, PUD_UP = PUD_OFF, PUD_DOWN, PUD_UP
+    RISING, FALLING, BOTH = RISING, FALLING, BOTH
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.mode = None
+        self.directions = {}
+        self.levels = {}
+        self.detects = {}
+        self.output_log = []
+        self.record_outputs = False
+        self.on_output = None
+        self._output_listeners = []
+
+    # --- RPi.GPIO API ---
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, pin, direction, pull_up_down=PUD_OFF, initial=None):
+        with self._lock:
+            self.directions[pin] = direction
+            if direction == OUT:
+                self.levels[pin] = LOW if initial is None else initial
+            elif pull_up_down == PUD_UP:
+                self.levels[pin] = HIGH
+            else:
+                self.levels.setdefault(pin, LOW)
+
+    def input(self, pin):
+        return self.levels.get(pin, LOW)
+
+    def output(self, pin, level):
+        with self._lock:
+            self.levels[pin] = level
+            if self.record_outputs:
+                self.output_log.append((pin, level))
+        if self.on_output:
+            self.on_output(pin, level)
+        for fn in self._output_listeners:
+            fn(pin, level)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self._lock:
+            if pin in self.detects:
+                raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+            self.detects[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        with self._lock:
+            self.detects.pop(pin, None)
+
+    def PWM(self, pin, frequency):
+        return SimulatedPWM(self, pin, frequency)
+
+    def cleanup(self, pins=None):
+        with self._lock:
+            if pins is None:
+                self.detects.clear()
+                self.directions.clear()
+                self.levels.clear()
+            else:
+                for pin in ([pins] if isinstance(pins, int) else pins):
+                    self.detects.pop(pin, None)
+                    self.directions.pop(pin, None)
+                    self.levels.pop(pin, None)
+
+    # --- simulation side ---
+
+    def add_output_listener(self, fn):
+        """Call fn(pin, level) on every output(), after on_output."""
+        self._output_listeners.append(fn)
+
+    def set_input(self, pin, level):
+        with self._lock:
+            previous = self.levels.get(pin, LOW)
+            self.levels[pin] = level
+            edge, callback = self.detects.get(pin, (None, None))
+        if callback is None or previous == level:
+            return
+        if edge == BOTH or (edge == RISING and level == HIGH) or (edge == FALLING and level == LOW):
+            callback(pin)
+
+    def pulse(self, pin, active=HIGH):
+        idle = LOW if active == HIGH else HIGH
+        self.set_input(pin, active)
+        self.set_input(pin, idle)
+
+
+class SimKeypadMatrix:
+    """
+    Matrix keypad wired to a SimulatedGPIO. Columns are pulled-up inputs;
+    a held key connects its column to its row, so the column reads LOW
+    while that row is driven LOW. There are no diodes: a column also
+    reads LOW when held keys chain it to a LOW row through other rows
+    and columns, which is how ghost keys appear.
+    """
+
+    def __init__(self, gpio, row_pins, col_pins, keys):
+        self.gpio = gpio
+        self.row_pins = list(row_pins)
+        self.col_pins = list(col_pins)
+        self.positions = {k: (r, c) for r, row in enumerate(keys) for c, k in enumerate(row)}
+        self.held = set()
+        gpio.add_output_listener(self._output)
+
+    def press(self, key):
+        self.held.add(self.positions[key])
+        self._update()
+
+    def release(self, key):
+        self.held.discard(self.positions[key])
+        self._update()
+
+    def _output(self, pin, level):
+        if pin in self.row_pins:
+            self._update()
+
+    def _update(self):
+        held = tuple(self.held)
+        low_rows = {r for r, pin in enumerate(self.row_pins) if self.gpio.input(pin) == LOW}
+        low_cols = set()
+        grew = bool(low_rows)
+        while grew:
+            grew = False
+            for r, c in held:
+                if (r in low_rows) != (c in low_cols):
+                    low_rows.add(r)
+                    low_cols.add(c)
+                    grew = True
+        for c, col_pin in enumerate(self.col_pins):
+            self.gpio.set_input(col_pin, LOW if c in low_cols else HIGH)
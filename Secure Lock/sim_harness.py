@@ -0,0 +1,364 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+import contextlib
+import importlib.util
+from collections import defaultdict, deque
+
+# End-to-end simulation of the lock controller.
+#
+# Loads "Final Code without Fingerprint.py" unchanged on the simulated
+# hardware backend (hal.py, SECURE_LOCK_HAL=sim), replays a trace of
+# door activity through the simulated keypad, RFID field, button,
+# vibration sensor, camera and Firestore, and reports auth-to-unlock
+# latency per path: from the input that completes an authentication
+# (the submit key, a card tap, ...) to the relay pin being energised.
+# Idle time is skipped on the virtual clock, time spent working is not.
+#
+# Trace lines are "<seconds> <event> [args]"; '#' starts a comment.
+#   key <k>              press and release one keypad key
+#   pin <digits>         type a PIN and submit it (D)
+#   otp <digits>         publish an OTP in Firestore, then type and submit it
+#   face <name>|none     put someone in front of the camera and press B
+#   card <id> [door]     hold a card (decimal ID) to a door's reader
+#   button               press the exit button
+#   vib <0|1>            set the vibration sensor output
+#   knock                one knock: a few ms of sensor chatter
+#   remote unlock|lock [door]   write a lockEvents document
+# Keypad, face and button events act on the first door. Traces recorded
+# on the Pi with SECURE_LOCK_RECORD=<path> use the same format
+# (key/card/button/vib lines).
+# --doors N runs the controller with N doors (a generated SECURE_LOCK_DOORS
+# file); the demo trace then taps cards and unlocks remotely at all of
+# them at once.
+#
+#   python sim_harness.py [trace] [--doors N] [-v]
+
+os.environ["SECURE_LOCK_HAL"] = "sim"
+os.environ.setdefault("SECURE_LOCK_METRICS_PORT", "0")
+os.environ.setdefault("SECURE_LOCK_HISTORY_PORT", "0")
+
+CONTROLLER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Final Code without Fingerprint.py")
+
+KEY_HOLD = 0.08       # how long a key stays down
+KEY_GAP = 0.3         # between keys when typing
+BUTTON_HOLD = 0.1
+CARD_HOLD = 0.5       # time a tapped card stays in the field
+AUTH_TIMEOUT = 10.0   # an auth without an unlock by then counts as refused
+SETTLE = 10.0         # run on after the last event
+
+# Relay pins for generated multi-door configs (clear of the fixed pins
+# and of the SPI0/I2C1 buses)
+SPARE_RELAY_PINS = [27, 12, 24, 25, 18, 4]
+
+# Relay hold source each path unlocks with
+PATH_SOURCE = {
+    "pin": "keypad",
+    "otp": "keypad",
+    "keypad": "keypad",
+    "face": "face",
+    "card": "rfid",
+    "button": "button",
+    "remote": "remote",
+}
+
+
+def load_trace(path):
+    trace = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].split()
+            if line:
+                trace.append((float(line[0]), line[1], line[2:]))
+    return sorted(trace, key=lambda e: e[0])
+
+
+def load_controller():
+    spec = importlib.util.spec_from_file_location("lock_controller", CONTROLLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["lock_controller"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def doors_config(n):
+    if n > len(SPARE_RELAY_PINS):
+        raise ValueError(f"at most {len(SPARE_RELAY_PINS)} doors, one per spare relay pin")
+    doors = []
+    for i in range(n):
+        name = "main" if i == 0 else f"door{i + 1}"
+        doors.append({"name": name, "relay_pin": SPARE_RELAY_PINS[i], "reader_cs": i,
+                      "display_port": 1 + i // 2, "display_address": 0x3C + i % 2,
+                      "lock_events": "lockEvents" if i == 0 else f"doors/{name}/lockEvents"})
+    return doors
+
+
+class LockSimulation:
+    def __init__(self, trace, doors=1):
+        self.trace = trace
+        self.data_dir = tempfile.mkdtemp(prefix="lock-sim-")
+        os.environ["SECURE_LOCK_DATA_DIR"] = self.data_dir
+        os.environ.pop("SECURE_LOCK_DOORS", None)
+        if doors > 1:
+            path = os.path.join(self.data_dir, "doors.json")
+            with open(path, "w") as f:
+                json.dump(doors_config(doors), f)
+            os.environ["SECURE_LOCK_DOORS"] = path
+        self.lock = load_controller()
+        from hal import hw
+        self.hw = hw
+        self.clock = hw.clock
+        self.gpio = hw.GPIO
+
+        from sim_gpio import SimKeypadMatrix
+        lock = self.lock
+        self.keypad = SimKeypadMatrix(self.gpio, lock.ROW_PINS, lock.COL_PINS, lock.KEYPAD)
+        self.gpio.add_output_listener(self._pin_changed)
+        self.doors = {door.name: door for door in lock.doors}
+        self.primary = lock.primary.name
+        self.relay_pins = {door.config.relay_pin: door for door in lock.doors}
+        hw.busy_checks.append(lambda: lock.runtime.inflight > 0 or any(d.display.busy() for d in lock.doors))
+        # The scanner only sees a key while real time passes
+        hw.busy_checks.append(lambda: bool(self.keypad.held) or lock.keypad.busy())
+        for door in lock.doors:
+            hw.clock.on_advance(door.relay.recheck)
+            hw.clock.on_advance(door.display.recheck)
+            self._trace_unlocks(door)
+        # Synthetic camera frames contain no real face; let them all through
+        # and let the fake Rekognition decide who it is
+        lock.face_prefilter.cascade = None
+
+        self._lock = threading.Lock()
+        self.pending = defaultdict(deque)   # (door, relay source) -> (path, t0)
+        self.awaiting = defaultdict(list)   # door -> (path, t0) waiting for its relay pin
+        self.energised_at = {}              # door -> time its relay pin went active
+        self.latencies = defaultdict(list)
+        self.door_latencies = defaultdict(list)
+        self.attempts = defaultdict(int)
+        self.refused = defaultdict(int)
+        self.events = 0
+
+    # --- measurement ---
+
+    def _trace_unlocks(self, door):
+        unlock = door.relay.unlock
+
+        def traced_unlock(source, *args, **kwargs):
+            unlock(source, *args, **kwargs)
+            self._unlock_commanded(door.name, source)
+
+        door.relay.unlock = traced_unlock
+
+    def _open(self, path, door=None):
+        with self._lock:
+            self.attempts[path] += 1
+            self.pending[(door or self.primary, PATH_SOURCE[path])].append((path, self.clock.monotonic()))
+
+    def _expire(self, now):
+        for queue in self.pending.values():
+            while queue and now - queue[0][1] > AUTH_TIMEOUT:
+                self.refused[queue.popleft()[0]] += 1
+
+    def _record(self, door, path, latency):
+        self.latencies[path].append(latency)
+        self.door_latencies[door].append(latency)
+
+    def _unlock_commanded(self, door, source):
+        now = self.clock.monotonic()
+        with self._lock:
+            self._expire(now)
+            queue = self.pending[(door, source)]
+            if not queue:
+                return
+            path, t0 = queue.popleft()
+            energised_at = self.energised_at.get(door)
+            if energised_at is None:
+                self.awaiting[door].append((path, t0))
+            else:
+                # Already open (another hold, or the relay thread beat us here)
+                self._record(door, path, max(0.0, max(energised_at, t0) - t0))
+
+    def _pin_changed(self, pin, level):
+        door = self.relay_pins.get(pin)
+        if door is None:
+            return
+        now = self.clock.monotonic()
+        with self._lock:
+            if level == door.relay.active_level:
+                self.energised_at[door.name] = now
+                for path, t0 in self.awaiting.pop(door.name, []):
+                    self._record(door.name, path, now - t0)
+            else:
+                self.energised_at.pop(door.name, None)
+
+    # --- inputs ---
+
+    def _press(self, key, path=None):
+        # The pending auth is opened before the input reaches the controller
+        if path is None:
+            path = {"D": "keypad", "B": "face"}.get(key)
+        if path:
+            self._open(path)
+        self.keypad.press(key)
+        self.lock.runtime.call_later(KEY_HOLD, self.keypad.release, key)
+
+    async def _type(self, keys, path):
+        for i, key in enumerate(keys):
+            if i:
+                await asyncio.sleep(KEY_GAP)
+            self._press(key, path if i == len(keys) - 1 else False)
+
+    def _set_pin(self, pin, level):
+        self.gpio.set_input(pin, level)
+
+    def _inject(self, kind, args):
+        lock, hw = self.lock, self.hw
+        later = lock.runtime.call_later
+        self.events += 1
+        if kind == "key":
+            self._press(args[0])
+        elif kind == "pin":
+            lock.runtime.spawn(self._type(args[0] + "D", "pin"))
+        elif kind == "otp":
+            hw.db.collection("otps").add({"code": args[0], "createdAt": hw.db.SERVER_TIMESTAMP})
+            lock.runtime.spawn(self._type(args[0] + "D", "otp"))
+        elif kind == "face":
+            hw.faces.person = None if args[0] == "none" else args[0]
+            self._press("B")
+        elif kind == "card":
+            door = self.doors[args[1] if len(args) > 1 else self.primary]
+            self._open("card", door.name)
+            hw.readers[(door.config.reader_bus, door.config.reader_cs)].tap(int(args[0]), CARD_HOLD)
+        elif kind == "button":
+            self._open("button")
+            self._set_pin(lock.BUTTON_PIN, self.gpio.LOW)
+            later(BUTTON_HOLD, self._set_pin, lock.BUTTON_PIN, self.gpio.HIGH)
+        elif kind == "vib":
+            self._set_pin(lock.VIBRATION_PIN, int(args[0]))
+        elif kind == "knock":
+            for k in range(4):
+                later(k * 0.004, self._set_pin, lock.VIBRATION_PIN, 1)
+                later(k * 0.004 + 0.002, self._set_pin, lock.VIBRATION_PIN, 0)
+        elif kind == "remote":
+            door = self.doors[args[1] if len(args) > 1 else self.primary]
+            locked = args[0] != "unlock"
+            if not locked:
+                self._open("remote", door.name)
+            hw.db.collection(door.config.lock_events).add({"locked": locked, "timestamp": hw.db.SERVER_TIMESTAMP})
+        else:
+            raise ValueError(f"unknown trace event {kind!r}")
+
+    async def _play(self, rt):
+        lock = self.lock
+        await rt.blocking(lock.camera.capture_frame)  # camera warm-up, once
+        start = self.clock.monotonic()
+        for t, kind, args in self.trace:
+            delay = start + t - self.clock.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._inject(kind, args)
+        await asyncio.sleep(SETTLE)
+        self.duration = self.clock.monotonic() - start
+        rt.stop()
+
+    async def _start(self, rt):
+        await self.lock.start(rt)
+        rt.spawn(self._play(rt), name="trace")
+
+    def run(self, verbose=False):
+        t0 = time.perf_counter()
+        cpu0 = time.process_time()
+        out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        with out:
+            self.lock.runtime.run(self._start)
+        self.real_time = time.perf_counter() - t0
+        self.cpu_time = time.process_time() - cpu0
+        with self._lock:
+            self._expire(float("inf"))
+            for waiting in self.awaiting.values():
+                for path, _ in waiting:
+                    self.refused[path] += 1
+        if self.hw.fingerprint:
+            self.hw.fingerprint.close()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+        return self
+
+    # --- report ---
+
+    def report(self):
+        def ms(xs, q):
+            return xs[min(len(xs) - 1, int(q * len(xs)))] * 1000
+
+        print(f"replayed {self.events} events, {self.duration:.1f} s of door time in {self.real_time:.1f} s")
+        print(f"{'path':<8}{'tries':>7}{'opened':>8}{'refused':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for path in sorted(self.attempts):
+            xs = sorted(self.latencies[path])
+            row = f"{path:<8}{self.attempts[path]:>7}{len(xs):>8}{self.refused[path]:>9}"
+            if xs:
+                row += f"{ms(xs, 0.5):>9.1f}{ms(xs, 0.95):>9.1f}{ms(xs, 0.99):>9.1f}{xs[-1] * 1000:>9.1f}"
+            print(row)
+        hw = self.hw
+        doors = self.lock.doors
+        if len(doors) > 1:
+            print(f"{'door':<8}{'opened':>15}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+            for name in self.doors:
+                xs = sorted(self.door_latencies[name])
+                if xs:
+                    print(f"{name:<8}{len(xs):>15}{ms(xs, 0.5):>9.1f}{ms(xs, 0.95):>9.1f}{xs[-1] * 1000:>9.1f}")
+        print(f"doors: {len(doors)}  alerts sent: {self.lock.alert_pipeline.sent}  "
+              f"relay switches: {sum(d.relay.switches for d in doors)}  "
+              f"OLED frames: {sum(d.screen.frames for d in doors)} ({sum(d.screen.skipped for d in doors)} skipped, "
+              f"{sum(d.display.dropped for d in doors)} coalesced, "
+              f"{sum(x.bytes for x in hw.displays.values())} I2C bytes)  "
+              f"RFID polls: {sum(r.requests for r in hw.readers.values())}  Rekognition calls: {hw.faces.calls} "
+              f"({hw.faces.bytes_sent // max(1, hw.faces.calls)} bytes each)")
+        access = self.lock.access_log
+        print(f"access log: {access.written} decisions in {access.batches} transactions, "
+              f"{access.spilled} spilled, {access.retries} retries, {access.dropped} dropped")
+        print(f"CPU: {self.cpu_time:.1f} s for {self.duration:.0f} s of door time "
+              f"({self.cpu_time / self.duration * 100:.1f}% of one core)")
+        print("controller metrics:")
+        print(self.lock.metrics.summary())
+
+
+def demo_trace(rounds=10, doors=("main",)):
+    """Every unlock path `rounds` times, plus refusals, remote control and a tamper attempt.
+
+    Cards and remote unlocks happen at every door in `doors` at the same moment.
+    """
+    trace = []
+    t = 3.0
+    for i in range(rounds):
+        for kind, args in (("pin", ["1234"]), ("card", ["3555744237"]), ("face", ["SSG"]),
+                           ("button", []), ("otp", [f"{482900 + i}"])):
+            if kind == "card":
+                trace.extend((t, kind, args + [door]) for door in doors)
+            else:
+                trace.append((t, kind, args))
+            t += 8.0  # past the 5 s unlock window
+        trace.extend((t, "remote", ["unlock", door]) for door in doors)
+        trace.extend((t + 6.0, "remote", ["lock", door]) for door in doors)
+        t += 10.0
+    trace.append((t, "pin", ["9999"]))
+    trace.append((t + 6.0, "face", ["none"]))
+    t += 12.0
+    for k in range(6):
+        trace.append((t + k * 0.4, "knock", []))
+    return trace
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "-v"]
+    n_doors = 1
+    if "--doors" in args:
+        i = args.index("--doors")
+        n_doors = int(args[i + 1])
+        del args[i:i + 2]
+    names = [d["name"] for d in doors_config(n_doors)]
+    trace = load_trace(args[0]) if args else demo_trace(doors=names)
+    LockSimulation(trace, doors=n_doors).run(verbose="-v" in sys.argv).report()
@@ -0,0 +1,110 @@
+import time
+
+# Stand-in for luma.oled's ssd1306 device on I2C. command()/data() go
+# into a GRAM model with the column/page address window, and every I2C
+# transaction is counted (address byte + control byte + payload, 9 clocks
+# a byte at 400 kHz) and, with pace=True, slept off. display() does what
+# luma's ssd1306.display() does: build the whole 1 KiB buffer pixel by
+# pixel and send it, window and all, every time.
+
+I2C_HZ = 400_000
+
+SET_COL_ADDR = 0x21
+SET_PAGE_ADDR = 0x22
+
+
+class SimSSD1306:
+    def __init__(self, width=128, height=64, i2c_hz=I2C_HZ, pace=True):
+        self.size = (width, height)
+        self.width = width
+        self.height = height
+        self.mode = "1"
+        self.rotate = 0
+        self.pages = height // 8
+        self.i2c_hz = i2c_hz
+        self.pace = pace
+        self.gram = bytearray(width * self.pages)
+        self._cols = (0, width - 1)
+        self._rows = (0, self.pages - 1)
+        self._col, self._page = 0, 0
+        self.image = None
+        self.frames = 0          # full frames sent through display()
+        self.transactions = 0
+        self.bytes = 0
+        self.bus_time = 0.0
+
+    def _bus(self, payload):
+        n = payload + 2
+        self.transactions += 1
+        self.bytes += n
+        t = n * 9 / self.i2c_hz
+        self.bus_time += t
+        if self.pace:
+            time.sleep(t)
+
+    def command(self, *cmd):
+        self._bus(len(cmd))
+        i = 0
+        while i < len(cmd):
+            if cmd[i] == SET_COL_ADDR:
+                self._cols = (cmd[i + 1], cmd[i + 2])
+                self._col = cmd[i + 1]
+                i += 3
+            elif cmd[i] == SET_PAGE_ADDR:
+                self._rows = (cmd[i + 1], cmd[i + 2])
+                self._page = cmd[i + 1]
+                i += 3
+            else:
+                i += 1
+
+    def data(self, values):
+        # Horizontal addressing: the pointer walks the window column by column,
+        # wrapping to the next page and back to the first
+        self._bus(len(values))
+        c0, c1 = self._cols
+        p0, p1 = self._rows
+        for value in values:
+            self.gram[self._page * self.width + self._col] = value
+            if self._col < c1:
+                self._col += 1
+            else:
+                self._col = c0
+                self._page = self._page + 1 if self._page < p1 else p0
+
+    def preprocess(self, image):
+        return image
+
+    def display(self, image):
+        if image.size != self.size:
+            raise ValueError(f"image size {image.size} does not match device {self.size}")
+        w = self.width
+        buf = bytearray(w * self.pages)
+        for idx, pix in enumerate(image.convert("L").tobytes()):
+            if pix:
+                y = idx // w
+                buf[idx % w + (y >> 3) * w] |= 1 << (y & 7)
+        self.command(SET_COL_ADDR, 0, w - 1, SET_PAGE_ADDR, 0, self.pages - 1)
+        self.data(list(buf))
+        self.image = image
+        self.frames += 1
+
+    def shown(self):
+        """The GRAM contents as a 1-bit image, for checking what a driver really sent."""
+        from PIL import Image
+        img = Image.new("1", self.size)
+        px = img.load()
+        for page in range(self.pages):
+            for x in range(self.width):
+                byte = self.gram[page * self.width + x]
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        px[x, page * 8 + bit] = 255
+        return img
+
+    def clear(self):
+        self.command(SET_COL_ADDR, 0, self.width - 1, SET_PAGE_ADDR, 0, self.pages - 1)
+        self.data([0] * len(self.gram))
+        self.image = None
+
+    def cleanup(self):
+        pass
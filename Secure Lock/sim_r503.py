@@ -0,0 +1,93 @@
+import os
+import tty
+import time
+import select
+import threading
+
+from r503 import FrameParser, build_packet, PID_COMMAND, PID_ACK, OK, NO_FINGER, NOT_FOUND
+
+# Fake R503 on a pseudo-terminal. Open `FakeR503().port` with pyserial
+# like the real /dev/serial0. It answers the commands the lock uses, and
+# keeps templates so enrol/search/delete behave realistically.
+#
+#   finger       - whether a finger is on the sensor (GetImage result)
+#   finger_id    - which enrolled ID the current finger matches (or None)
+#   reply_delay  - sensor processing time before each reply
+#   silent       - stop answering (to exercise timeouts)
+
+
+class FakeR503:
+    def __init__(self, reply_delay=0.0, capacity=255):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self.reply_delay = reply_delay
+        self.capacity = capacity
+        self.finger = False
+        self.finger_id = None
+        self.silent = False
+        self.templates = {}
+        self.led = None
+        self.commands = []
+        self._parser = FrameParser()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="fake-r503", daemon=True)
+        self._thread.start()
+
+    def inject(self, data):
+        """Write raw bytes to the host, e.g. line noise."""
+        os.write(self.master, data)
+
+    def _reply(self, code, params=b""):
+        if self.reply_delay:
+            time.sleep(self.reply_delay)
+        os.write(self.master, build_packet(PID_ACK, bytes([code]) + params))
+
+    def _handle(self, payload):
+        cmd = payload[0]
+        self.commands.append(cmd)
+        if cmd == 0x01:  # GetImage
+            self._reply(OK if self.finger else NO_FINGER)
+        elif cmd in (0x02, 0x05):  # Img2Tz, RegModel
+            self._reply(OK if self.finger else 0x01)
+        elif cmd == 0x06:  # Store
+            fid = int.from_bytes(payload[2:4], "big")
+            self.templates[fid] = True
+            self.finger_id = fid
+            self._reply(OK)
+        elif cmd == 0x04:  # Search
+            fid = self.finger_id
+            if self.finger and fid in self.templates:
+                self._reply(OK, fid.to_bytes(2, "big") + (180).to_bytes(2, "big"))
+            else:
+                self._reply(NOT_FOUND, b"\x00\x00\x00\x00")
+        elif cmd == 0x0C:  # DeleteChar
+            start = int.from_bytes(payload[1:3], "big")
+            for fid in range(start, start + int.from_bytes(payload[3:5], "big")):
+                self.templates.pop(fid, None)
+            self._reply(OK)
+        elif cmd == 0x35:  # AuraLedConfig
+            self.led = tuple(payload[1:5])
+            self._reply(OK)
+        else:
+            self._reply(0x01)
+
+    def _loop(self):
+        while self._running:
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master, 512)
+            except OSError:
+                return
+            for packet in self._parser.feed(data):
+                if packet.pid == PID_COMMAND and packet.payload and not self.silent:
+                    self._handle(packet.payload)
+
+    def close(self):
+        self._running = False
+        self._thread.join(timeout=1)
+        os.close(self.master)
+        os.close(self._slave)
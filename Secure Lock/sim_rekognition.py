@@ -0,0 +1,48 @@
+import time
+import uuid
+
+# Fake Rekognition client: search_faces_by_image() answers after a
+# network-like delay with whoever the simulation has put in front of the
+# camera (`person`, None for a stranger). The delay is the service time
+# plus the upload of the image at `uplink_kbps`.
+
+
+class ClientError(Exception):
+    """Same constructor as botocore.exceptions.ClientError."""
+
+    def __init__(self, error_response, operation_name):
+        self.response = error_response
+        self.operation_name = operation_name
+        code = error_response.get("Error", {}).get("Code", "Unknown")
+        super().__init__(f"An error occurred ({code}) when calling the {operation_name} operation")
+
+
+class FakeRekognition:
+    def __init__(self, latency=0.2, similarity=98.5, uplink_kbps=2000):
+        self.latency = latency
+        self.uplink_kbps = uplink_kbps
+        self.similarity = similarity
+        self.person = None
+        self.fail = False
+        self.calls = 0
+        self.bytes_sent = 0
+
+    def search_faces_by_image(self, CollectionId, Image, MaxFaces=1, FaceMatchThreshold=80):
+        self.calls += 1
+        self.bytes_sent += len(Image["Bytes"])
+        delay = self.latency
+        if self.uplink_kbps:
+            delay += len(Image["Bytes"]) * 8 / (self.uplink_kbps * 1000)
+        if delay:
+            time.sleep(delay)
+        if self.fail:
+            raise ClientError({"Error": {"Code": "ThrottlingException"}}, "SearchFacesByImage")
+        if self.person is None or self.similarity < FaceMatchThreshold:
+            return {"FaceMatches": [], "SearchedFaceConfidence": 99.0}
+        return {
+            "SearchedFaceConfidence": 99.0,
+            "FaceMatches": [{
+                "Similarity": self.similarity,
+                "Face": {"FaceId": str(uuid.uuid4()), "ExternalImageId": self.person, "Confidence": 99.9},
+            }],
+        }
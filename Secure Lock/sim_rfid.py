@@ -0,0 +1,190 @@
+import time
+
+# Simulated MFRC522 with the method names of the MFRC522-python library
+# the lock uses. tap() puts a card in the field for a while; every
+# MFRC522_Request() costs roughly what a REQA round trip over SPI does on
+# a Pi, so polling loops burn realistic time.
+
+MI_OK = 0
+MI_NOTAGERR = 1
+MI_ERR = 2
+PICC_REQIDL = 0x26
+PICC_REQALL = 0x52
+
+REQUEST_TIME = 0.002
+
+
+def uid_bytes(card_id):
+    """5-byte anticollision answer for a 4-byte card ID: UID + BCC."""
+    uid = list(card_id.to_bytes(4, "big"))
+    return uid + [uid[0] ^ uid[1] ^ uid[2] ^ uid[3]]
+
+
+class SimMFRC522:
+    MI_OK, MI_NOTAGERR, MI_ERR = MI_OK, MI_NOTAGERR, MI_ERR
+    PICC_REQIDL, PICC_REQALL = PICC_REQIDL, PICC_REQALL
+
+    def __init__(self, clock=time, request_time=REQUEST_TIME):
+        self.clock = clock
+        self.request_time = request_time
+        self.card = None
+        self.card_until = 0.0
+        self.requests = 0
+
+    def tap(self, card_id, duration=0.5):
+        self.card = uid_bytes(card_id)
+        self.card_until = self.clock.monotonic() + duration
+
+    def _present(self):
+        return self.card is not None and self.clock.monotonic() < self.card_until
+
+    def MFRC522_Request(self, req_mode):
+        self.requests += 1
+        if self.request_time:
+            time.sleep(self.request_time)
+        if self._present():
+            return MI_OK, 0x10
+        return MI_NOTAGERR, None
+
+    def MFRC522_Anticoll(self):
+        if self._present():
+            return MI_OK, list(self.card)
+        return MI_ERR, []
+
+
+class FakeMFRC522SPI:
+    """
+    Register-level MFRC522 behind a spidev-style xfer2(), for benchmarking
+    drivers. Models the FIFO, CommIrqReg, the Transceive command, the
+    auto-started timer and a card answering REQA/WUPA and anticollision.
+    Each transfer is charged `xfer_overhead` plus 8 bits per byte at
+    `spi_hz` of bus time; device time is the clock plus that charge, and
+    with pace=True the charge is also slept off so callers see it.
+    Card states (IDLE/READY/HALT) are not modelled: a card in the field
+    answers every REQA.
+    """
+
+    def __init__(self, clock=time, spi_hz=1_000_000, xfer_overhead=20e-6,
+                 reqa_time=0.0003, anticoll_time=0.0007, pace=False):
+        self.clock = clock
+        self.spi_hz = spi_hz
+        self.xfer_overhead = xfer_overhead
+        self.reqa_time = reqa_time
+        self.anticoll_time = anticoll_time
+        self.pace = pace
+        self.regs = bytearray(0x40)
+        self.regs[0x37] = 0x92  # VersionReg: MFRC522 v2.0
+        self.fifo = bytearray()
+        self.command = 0
+        self.card = None
+        self.card_until = 0.0
+        self._rx = None          # (ready_at, data)
+        self._timer_end = None
+        self._debt = 0.0
+        self.transfers = 0
+        self.bytes = 0
+        self.bus_time = 0.0
+        self.requests = 0
+
+    def tap(self, card_id, duration=0.5):
+        self.card = uid_bytes(card_id)
+        self.card_until = self.clock.monotonic() + duration
+
+    def now(self):
+        return self.clock.monotonic() + self._debt
+
+    # --- SPI ---
+
+    def xfer2(self, data):
+        cost = self.xfer_overhead + len(data) * 8 / self.spi_hz
+        self.transfers += 1
+        self.bytes += len(data)
+        self.bus_time += cost
+        self._debt += cost
+        if self.pace and self._debt >= 0.001:
+            time.sleep(self._debt)
+            self._debt = 0.0
+        first = data[0]
+        if first & 0x80:
+            # Each byte clocks out the register addressed by the byte before it
+            return [0] + [self._read((b >> 1) & 0x3F) for b in data[:-1]]
+        addr = (first >> 1) & 0x3F
+        for value in data[1:]:
+            self._write(addr, value)
+        return [0] * len(data)
+
+    xfer = xfer2
+
+    # --- registers ---
+
+    def _update(self):
+        now = self.now()
+        if self._rx and now >= self._rx[0]:
+            self.fifo += self._rx[1]
+            self._rx = None
+            self.regs[0x0C] &= ~0x07        # ControlReg RxLastBits: whole bytes
+            self.regs[0x04] |= 0x20 | 0x04  # RxIRq, LoAlertIRq
+        if self._timer_end is not None and now >= self._timer_end:
+            self._timer_end = None
+            self.regs[0x04] |= 0x01         # TimerIRq
+
+    def _read(self, addr):
+        self._update()
+        if addr == 0x09:  # FIFODataReg
+            if not self.fifo:
+                return 0
+            value = self.fifo[0]
+            del self.fifo[0]
+            return value
+        if addr == 0x0A:  # FIFOLevelReg
+            return len(self.fifo)
+        return self.regs[addr]
+
+    def _write(self, addr, value):
+        if addr == 0x01:  # CommandReg
+            self.command = value & 0x0F
+            if self.command == 0x0F:  # SoftReset
+                self.regs[:] = bytes(0x40)
+                self.regs[0x37] = 0x92
+                self.fifo.clear()
+                self.command = 0
+            if self.command == 0x00:
+                self._rx = None
+                self._timer_end = None
+            self.regs[addr] = self.command
+        elif addr == 0x04:  # CommIrqReg: bit 7 selects set or clear
+            if value & 0x80:
+                self.regs[addr] |= value & 0x7F
+            else:
+                self.regs[addr] &= ~value & 0x7F
+        elif addr == 0x09:
+            self.fifo.append(value)
+        elif addr == 0x0A:
+            if value & 0x80:
+                self.fifo.clear()
+        else:
+            self.regs[addr] = value
+            if addr == 0x0D and value & 0x80 and self.command == 0x0C:
+                self._transmit(value & 0x07)
+
+    def _timer_period(self):
+        prescaler = ((self.regs[0x2A] & 0x0F) << 8) | self.regs[0x2B]
+        reload = (self.regs[0x2C] << 8) | self.regs[0x2D]
+        return (2 * prescaler + 1) * (reload + 1) / 13.56e6
+
+    def _transmit(self, last_bits):
+        frame = bytes(self.fifo)
+        self.fifo.clear()
+        now = self.now()
+        if self.regs[0x2A] & 0x80:  # TAuto
+            self._timer_end = now + self._timer_period()
+        in_field = self.card is not None and self.clock.monotonic() < self.card_until \
+            and self.regs[0x14] & 0x03 == 0x03  # antenna on
+        if last_bits == 7 and frame[:1] in (b"\x26", b"\x52"):
+            self.requests += 1
+            if in_field:
+                self._rx = (now + self.reqa_time, b"\x04\x00")
+        elif frame[:2] == b"\x93\x20" and in_field:
+            self._rx = (now + self.anticoll_time, bytes(self.card))
+        if self._rx:
+            self._timer_end = None  # the timer stops when the reply starts